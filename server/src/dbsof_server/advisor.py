@@ -0,0 +1,405 @@
+from __future__ import annotations
+
+import math
+import re
+import sqlite3
+import time
+from typing import Any, Dict, List, Sequence, Tuple
+
+from .core import WORKLOAD, WORKLOAD_LOCK, shadow_tables, submit_write
+
+WORKLOAD_LIMIT = 500
+SAMPLE_ROWS = 10_000
+MAX_CANDIDATE_COLUMNS = 3
+
+STRING_RE = re.compile(r"'(?:[^']|'')*'")
+# SQLite accepts 'name' as an identifier after FROM and friends; keep it out of literal folding
+QUOTED_SOURCE_RE = re.compile(r"\b(FROM|JOIN|UPDATE|INTO)\s+'(\w+)'", re.IGNORECASE)
+NUMBER_RE = re.compile(r"(?<![\w.])-?\d+(?:\.\d+)?(?![\w.])")
+IN_LIST_RE = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+SPACE_RE = re.compile(r"\s+")
+RECORDED_RE = re.compile(r"^\s*(?:select|with|update|delete)\b", re.IGNORECASE)
+
+IDENT = r"[\"`\[]?(\w+)[\"`\]]?"
+SOURCE_RE = re.compile(rf"\b(?:FROM|JOIN|UPDATE)\s+['\"`\[]?(\w+)['\"`\]]?(?:\s+(?:AS\s+)?(\w+))?", re.IGNORECASE)
+COMPARISON = r"(?:==?|<>|!=|<=|>=|<|>|\bIN\b|\bNOT\s+IN\b|\bBETWEEN\b|\bLIKE\b|\bGLOB\b|\bIS\b)"
+LEFT_PREDICATE_RE = re.compile(rf"(?:{IDENT}\.)?{IDENT}\s*{COMPARISON}", re.IGNORECASE)
+RIGHT_PREDICATE_RE = re.compile(rf"(?:==?|<=|>=|<|>)\s*(?:{IDENT}\.)?{IDENT}", re.IGNORECASE)
+ORDER_RE = re.compile(r"\bORDER\s+BY\s+(.+?)(?:\bLIMIT\b|\bOFFSET\b|\)|;|$)", re.IGNORECASE | re.DOTALL)
+RANGE_RE = re.compile(rf"(?:{IDENT}\.)?{IDENT}\s*(?:<=|>=|<|>|\bBETWEEN\b|\bLIKE\b|\bGLOB\b)", re.IGNORECASE)
+PLAN_RE = re.compile(r"^(SCAN|SEARCH) (\w+)(?: USING (?:COVERING |INTEGER PRIMARY KEY)?(?:INDEX (\w+))?)?(?: \((.*)\))?")
+
+# identifiers that can follow a table name without being its alias
+NOT_ALIAS = {
+    "where", "join", "inner", "left", "right", "full", "cross", "natural", "on", "using", "group", "order",
+    "limit", "offset", "set", "union", "except", "intersect", "window", "having", "as", "outer", "values",
+}
+
+
+def normalize(sql: str) -> str:
+    """Collapse literals so queries that differ only in constants share one workload entry."""
+    shape = QUOTED_SOURCE_RE.sub(r'\1 "\2"', sql)
+    shape = STRING_RE.sub("?", shape)
+    shape = NUMBER_RE.sub("?", shape)
+    shape = IN_LIST_RE.sub("(?)", shape)
+    return SPACE_RE.sub(" ", shape).strip().rstrip(";")
+
+
+def record_query(db: str, sql: str, params: Any, source: str, duration_ms: float):
+    """Add an executed read/update/delete statement to the per-database workload."""
+    if not RECORDED_RE.match(sql):
+        return
+    shape = normalize(sql)
+    now = time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
+    with WORKLOAD_LOCK:
+        workload = WORKLOAD.setdefault(db, {})
+        entry = workload.get(shape)
+        if entry is None:
+            if len(workload) >= WORKLOAD_LIMIT:
+                # forget the least used shape to make room
+                del workload[min(workload, key=lambda k: workload[k]["count"])]
+            entry = workload[shape] = {"shape": shape, "count": 0, "totalMs": 0.0, "source": source}
+        entry["count"] += 1
+        entry["totalMs"] += duration_ms
+        entry["lastSeen"] = now
+        # keep the latest concrete statement: EXPLAIN needs real parameters
+        entry["sql"] = sql
+        entry["params"] = params
+
+
+def get_workload(db: str) -> List[Dict[str, Any]]:
+    with WORKLOAD_LOCK:
+        entries = [dict(e) for e in WORKLOAD.get(db, {}).values()]
+    return sorted(entries, key=lambda e: e["count"], reverse=True)
+
+
+def clear_workload(db: str):
+    with WORKLOAD_LOCK:
+        WORKLOAD.pop(db, None)
+
+
+def _sources(sql: str, tables: Dict[str, str]) -> Dict[str, str]:
+    """Map every table name and alias used in ``sql`` to its real table."""
+    names: Dict[str, str] = {}
+    for table, alias in SOURCE_RE.findall(sql):
+        real = tables.get(table.lower())
+        if real is None:
+            continue
+        names[table.lower()] = real
+        if alias and alias.lower() not in NOT_ALIAS:
+            names[alias.lower()] = real
+    return names
+
+
+def _predicates(sql: str, sources: Dict[str, str], columns: Dict[str, set]) -> Dict[str, Dict[str, List[str]]]:
+    """Columns each table is filtered, ranged and sorted on, in order of appearance."""
+    text = STRING_RE.sub("?", QUOTED_SOURCE_RE.sub(r'\1 "\2"', sql))
+    found: Dict[str, Dict[str, List[str]]] = {}
+    distinct_tables = set(sources.values())
+
+    def owner(qualifier: str, column: str) -> str | None:
+        if qualifier:
+            table = sources.get(qualifier.lower())
+            return table if table and column in columns[table] else None
+        matches = [t for t in distinct_tables if column in columns[t]]
+        return matches[0] if len(matches) == 1 else None
+
+    def add(kind: str, qualifier: str, column: str):
+        table = owner(qualifier, column)
+        if table is None:
+            return
+        bucket = found.setdefault(table, {"eq": [], "range": [], "order": []})[kind]
+        if column not in bucket:
+            bucket.append(column)
+
+    ranges = {(q.lower(), c) for q, c in RANGE_RE.findall(text)}
+    for qualifier, column in LEFT_PREDICATE_RE.findall(text):
+        add("range" if (qualifier.lower(), column) in ranges else "eq", qualifier, column)
+    for qualifier, column in RIGHT_PREDICATE_RE.findall(text):
+        add("eq", qualifier, column)
+    for clause in ORDER_RE.findall(text):
+        for term in clause.split(","):
+            match = re.match(rf"\s*(?:{IDENT}\.)?{IDENT}", term)
+            if match:
+                add("order", match.group(1) or "", match.group(2))
+    for preds in found.values():
+        preds["range"] = [c for c in preds["range"] if c not in preds["eq"]]
+    return found
+
+
+def _candidates(preds: Dict[str, List[str]]) -> List[Tuple[str, ...]]:
+    eq, rng, order = preds["eq"], preds["range"], preds["order"]
+    shapes = [
+        tuple(eq[:MAX_CANDIDATE_COLUMNS]),
+        tuple((eq + rng[:1])[:MAX_CANDIDATE_COLUMNS]),
+        tuple((eq + order)[:MAX_CANDIDATE_COLUMNS]),
+        tuple(order[:MAX_CANDIDATE_COLUMNS]),
+        *((c,) for c in eq + rng),
+    ]
+    out: List[Tuple[str, ...]] = []
+    for shape in shapes:
+        if shape and shape not in out:
+            out.append(shape)
+    return out
+
+
+def _new_stats(conn: sqlite3.Connection) -> Dict[str, Any]:
+    """Lazily filled row counts and sampled distinct counts from the real database."""
+    return {"conn": conn, "rows": {}, "ndv": {}}
+
+
+def _rows(stats: Dict[str, Any], table: str) -> int:
+    if table not in stats["rows"]:
+        stats["rows"][table] = stats["conn"].execute(f'SELECT COUNT(*) FROM "{table}"').fetchone()[0]
+    return stats["rows"][table]
+
+
+def _ndv(stats: Dict[str, Any], table: str, column: str) -> int:
+    key = (table, column)
+    if key not in stats["ndv"]:
+        total = _rows(stats, table)
+        distinct, sampled = stats["conn"].execute(
+            f'SELECT COUNT(DISTINCT "{column}"), COUNT(*) FROM (SELECT "{column}" FROM "{table}" LIMIT ?)',
+            (SAMPLE_ROWS,),
+        ).fetchone()
+        if sampled and sampled < total and distinct > 0.9 * sampled:
+            # nearly unique in the sample: assume it stays that way
+            distinct = total
+        stats["ndv"][key] = max(1, distinct)
+    return stats["ndv"][key]
+
+
+def _stat_line(stats: Dict[str, Any], table: str, columns: Sequence[str], unique: bool = False) -> str:
+    """An ``sqlite_stat1`` line: row count then average rows per key prefix."""
+    rows = max(1, _rows(stats, table))
+    parts = [str(rows)]
+    distinct = 1
+    for i, column in enumerate(columns):
+        distinct = min(rows, distinct * _ndv(stats, table, column))
+        parts.append("1" if unique and i == len(columns) - 1 else str(max(1, rows // distinct)))
+    return " ".join(parts)
+
+
+def _schema_clone(conn: sqlite3.Connection, stats: Dict[str, Any]) -> sqlite3.Connection:
+    """An empty in-memory copy of the schema whose planner statistics mirror the real data."""
+    hidden = shadow_tables(conn)
+    objects = conn.execute(
+        """
+        SELECT type, name, tbl_name, sql FROM sqlite_master
+        WHERE sql IS NOT NULL AND name NOT LIKE 'sqlite_%' AND type IN ('table', 'index', 'view')
+        ORDER BY CASE type WHEN 'table' THEN 0 WHEN 'index' THEN 1 ELSE 2 END, rowid
+        """
+    ).fetchall()
+    clone = sqlite3.connect(":memory:")
+    for obj_type, name, _, sql in objects:
+        if name in hidden or sql.upper().startswith("CREATE VIRTUAL TABLE"):
+            continue
+        try:
+            clone.execute(sql)
+        except sqlite3.OperationalError:
+            continue
+    clone.execute("ANALYZE")
+    clone.execute("DELETE FROM sqlite_stat1")
+    rows = []
+    for (table,) in clone.execute("SELECT name FROM sqlite_master WHERE type='table' AND name NOT LIKE 'sqlite_%'"):
+        rows.append((table, None, str(max(1, _rows(stats, table)))))
+        for index in clone.execute(f"PRAGMA index_list('{table}')").fetchall():
+            cols = [c[2] for c in clone.execute(f"PRAGMA index_info('{index[1]}')").fetchall() if c[2]]
+            if cols:
+                rows.append((table, index[1], _stat_line(stats, table, cols, unique=bool(index[2]))))
+    clone.executemany("INSERT INTO sqlite_stat1 (tbl, idx, stat) VALUES (?, ?, ?)", rows)
+    clone.execute("ANALYZE sqlite_master")
+    return clone
+
+
+def _plan(clone: sqlite3.Connection, sql: str, params: Any) -> List[str] | None:
+    try:
+        return [row[3] for row in clone.execute(f"EXPLAIN QUERY PLAN {sql}", params or ()).fetchall()]
+    except (sqlite3.Error, ValueError, TypeError):
+        return None
+
+
+def _plan_cost(plan: Sequence[str], sources: Dict[str, str], stats: Dict[str, Any], index_columns: Dict[str, List[str]]) -> float:
+    """Estimated rows visited per execution, plus the sort when a temp b-tree is needed."""
+    cost = 0.0
+    for line in plan:
+        match = PLAN_RE.match(line)
+        if not match:
+            continue
+        op, name, index, constraints = match.groups()
+        table = sources.get(name.lower())
+        if table is None:
+            continue
+        rows = max(1, _rows(stats, table))
+        if op == "SCAN" or not constraints:
+            cost += rows
+            continue
+        if "rowid" in constraints and index is None:
+            cost += 1
+            continue
+        estimate = float(rows)
+        for column in index_columns.get(index or "", []):
+            if f"{column}=" in constraints:
+                estimate /= _ndv(stats, table, column)
+            elif f"{column}>" in constraints or f"{column}<" in constraints:
+                estimate /= 4
+                break
+            else:
+                break
+        cost += max(1.0, estimate)
+    if any(line.startswith("USE TEMP B-TREE FOR ORDER BY") for line in plan):
+        cost += cost * math.log2(max(cost, 2.0))
+    return cost
+
+
+def _index_columns(clone: sqlite3.Connection) -> Dict[str, List[str]]:
+    out: Dict[str, List[str]] = {}
+    for (name,) in clone.execute("SELECT name FROM sqlite_master WHERE type='index'").fetchall():
+        out[name] = [c[2] for c in clone.execute(f"PRAGMA index_info('{name}')").fetchall()]
+    return out
+
+
+def _existing_prefixes(conn: sqlite3.Connection, table: str) -> List[Tuple[str, ...]]:
+    prefixes = []
+    for index in conn.execute(f"PRAGMA index_list('{table}')").fetchall():
+        prefixes.append(tuple(c[2] for c in conn.execute(f"PRAGMA index_info('{index[1]}')").fetchall()))
+    return prefixes
+
+
+def _unindexed_foreign_keys(conn: sqlite3.Connection, tables: Sequence[str], stats: Dict[str, Any]) -> List[Dict[str, Any]]:
+    out = []
+    for table in tables:
+        prefixes = _existing_prefixes(conn, table)
+        for fk in conn.execute(f"PRAGMA foreign_key_list('{table}')").fetchall():
+            column = fk[3]
+            if any(p[:1] == (column,) for p in prefixes):
+                continue
+            out.append(
+                {
+                    "table": table,
+                    "column": column,
+                    "references": f"{fk[2]}.{fk[4] or 'rowid'}",
+                    "rows": _rows(stats, table),
+                    "sql": f'CREATE INDEX IF NOT EXISTS "{table}_{column}" ON "{table}" ("{column}")',
+                }
+            )
+    return sorted(out, key=lambda e: e["rows"], reverse=True)
+
+
+def recommend(conn: sqlite3.Connection, db: str) -> Dict[str, Any]:
+    """Rank candidate indexes by the estimated rows they save across the recorded workload.
+
+    Each candidate is created in an empty in-memory copy of the schema whose
+    ``sqlite_stat1`` mirrors the real row counts and sampled distinct counts,
+    and kept only if ``EXPLAIN QUERY PLAN`` actually switches to it.
+    """
+    start = time.perf_counter()
+    workload = get_workload(db)
+    hidden = shadow_tables(conn)
+    tables = {
+        r[0].lower(): r[0]
+        for r in conn.execute(
+            "SELECT name FROM sqlite_master WHERE type='table' AND name NOT LIKE 'sqlite_%' AND name != '__meta__'"
+        ).fetchall()
+        if r[0] not in hidden
+    }
+    columns = {t: {c[1] for c in conn.execute(f"PRAGMA table_info('{t}')").fetchall()} for t in tables.values()}
+    stats = _new_stats(conn)
+    clone = _schema_clone(conn, stats)
+    try:
+        baseline_indexes = _index_columns(clone)
+        analysed = []
+        candidates: Dict[Tuple[str, Tuple[str, ...]], List[int]] = {}
+        for entry in workload:
+            sources = _sources(entry["sql"], tables)
+            plan = _plan(clone, entry["sql"], entry["params"])
+            if plan is None or not sources:
+                continue
+            idx = len(analysed)
+            analysed.append(
+                {
+                    "entry": entry,
+                    "sources": sources,
+                    "cost": _plan_cost(plan, sources, stats, baseline_indexes),
+                }
+            )
+            for table, preds in _predicates(entry["sql"], sources, columns).items():
+                existing = _existing_prefixes(conn, table)
+                for shape in _candidates(preds):
+                    if any(p[: len(shape)] == shape for p in existing):
+                        continue
+                    candidates.setdefault((table, shape), []).append(idx)
+
+        recommendations = []
+        for (table, shape), query_ids in candidates.items():
+            name = f"{table}_{'_'.join(shape)}"
+            col_sql = ", ".join(f'"{c}"' for c in shape)
+            ddl = f'CREATE INDEX IF NOT EXISTS "{name}" ON "{table}" ({col_sql})'
+            clone.execute(f'CREATE INDEX "__candidate" ON "{table}" ({col_sql})')
+            clone.execute(
+                "INSERT INTO sqlite_stat1 (tbl, idx, stat) VALUES (?, '__candidate', ?)", (table, _stat_line(stats, table, shape))
+            )
+            clone.execute("ANALYZE sqlite_master")
+            index_columns = {**baseline_indexes, "__candidate": list(shape)}
+            benefit = 0.0
+            improved = []
+            for qid in query_ids:
+                item = analysed[qid]
+                plan = _plan(clone, item["entry"]["sql"], item["entry"]["params"]) or []
+                if not any("__candidate" in line for line in plan):
+                    continue
+                saved = item["cost"] - _plan_cost(plan, item["sources"], stats, index_columns)
+                if saved <= 0:
+                    continue
+                benefit += saved * item["entry"]["count"]
+                improved.append(item["entry"])
+            clone.execute('DROP INDEX "__candidate"')
+            clone.execute("DELETE FROM sqlite_stat1 WHERE idx = '__candidate'")
+            clone.execute("ANALYZE sqlite_master")
+            if not improved:
+                continue
+            recommendations.append(
+                {
+                    "name": name,
+                    "table": table,
+                    "columns": list(shape),
+                    "sql": ddl,
+                    "estimatedBenefit": round(benefit, 1),
+                    "queries": len(improved),
+                    "executions": sum(e["count"] for e in improved),
+                    "examples": [e["shape"] for e in improved[:3]],
+                }
+            )
+    finally:
+        clone.close()
+
+    # a wider index that helps the same queries makes its prefix redundant
+    recommendations.sort(key=lambda r: (-r["estimatedBenefit"], -len(r["columns"])))
+    kept: List[Dict[str, Any]] = []
+    for rec in recommendations:
+        if any(
+            k["table"] == rec["table"] and k["columns"][: len(rec["columns"])] == rec["columns"]
+            and k["estimatedBenefit"] >= rec["estimatedBenefit"]
+            for k in kept
+        ):
+            continue
+        kept.append(rec)
+    return {
+        "queries": len(workload),
+        "analysed": len(analysed),
+        "recommendations": kept,
+        "unindexedForeignKeys": _unindexed_foreign_keys(conn, list(tables.values()), stats),
+        "durationMs": (time.perf_counter() - start) * 1000,
+    }
+
+
+def apply_indexes(db: str, statements: Sequence[Tuple[str, str]]) -> List[Dict[str, Any]]:
+    """Create indexes through the database's writer, one unit each so other writes interleave."""
+    created = []
+    for name, ddl in statements:
+        start = time.perf_counter()
+        submit_write(db, lambda writer: writer.execute(ddl).rowcount)
+        created.append({"name": name, "sql": ddl, "durationMs": (time.perf_counter() - start) * 1000})
+    if created:
+        submit_write(db, lambda writer: writer.execute("PRAGMA optimize").fetchall(), transactional=False)
+    return created
@@ -3,28 +3,59 @@ from __future__ import annotations
 from flask import Flask
 from flask_cors import CORS
 
+from .core import build_lineage_index, ontology_template
+from .encoding import FastJSONProvider, compress_response
+from .maintenance import init_app as init_maintenance
+from .metrics import init_app as init_metrics
+from .profiling import PROFILE_HEADER, init_app as init_profiling
+
 from .blueprints.instances import bp as instances_bp
 from .blueprints.sql import bp as sql_bp
 from .blueprints.schema import bp as schema_bp
 from .blueprints.ai import bp as ai_bp
 from .blueprints.imports import bp as imports_bp
 from .blueprints.users import bp as users_bp
+from .blueprints.meters import bp as meters_bp
+from .blueprints.search import bp as search_bp
+from .blueprints.advisor import bp as advisor_bp
+from .blueprints.batch import bp as batch_bp
+from .blueprints.metrics import bp as metrics_bp
+from .blueprints.profiles import bp as profiles_bp
+from .blueprints.storage import bp as storage_bp
 
 def create_app() -> Flask:
     app = Flask(__name__)
-    CORS(app)
+    app.json = FastJSONProvider(app)
+    # DBSOF_PROFILE_TOKEN, DBSOF_PROFILE_EVERY, DBSOF_MAINTENANCE_INTERVAL, ...
+    app.config.from_prefixed_env("DBSOF")
+    CORS(app, expose_headers=["ETag", "Server-Timing", PROFILE_HEADER])
+    init_metrics(app)
+    init_profiling(app)
+    init_maintenance(app)
+    app.after_request(compress_response)
     app.register_blueprint(instances_bp)
     app.register_blueprint(sql_bp)
     app.register_blueprint(schema_bp)
     app.register_blueprint(ai_bp)
     app.register_blueprint(imports_bp)
     app.register_blueprint(users_bp)
+    app.register_blueprint(meters_bp)
+    app.register_blueprint(search_bp)
+    app.register_blueprint(advisor_bp)
+    app.register_blueprint(batch_bp)
+    app.register_blueprint(metrics_bp)
+    app.register_blueprint(profiles_bp)
+    app.register_blueprint(storage_bp)
+    build_lineage_index()
+    ontology_template()
     return app
 
 
 def main():
-    app = create_app()
-    app.run(host="0.0.0.0", port=5757, debug=True)
+    # production server by default; ``dbsof-server --debug`` for the reloader
+    from .serve import main as serve
+
+    serve()
 
 
 if __name__ == "__main__":
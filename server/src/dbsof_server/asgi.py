@@ -0,0 +1,303 @@
+from __future__ import annotations
+
+import asyncio
+import contextvars
+import hashlib
+import io
+import re
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Tuple
+from urllib.parse import parse_qsl, urlencode
+
+from .app import create_app
+
+EXECUTOR_THREADS = 16
+# polled resources that can be long-polled (``?wait=``) or streamed as server-sent events
+WATCH_PATH_RE = re.compile(
+    r"^/instances/[^/]+/databases/[^/]+/(?:imports|ai/tasks|ai/programs|sql/history)(?:/[^/]+)?$"
+)
+WATCH_INTERVAL = 1.0
+MAX_WAIT = 60.0
+SSE_HEARTBEAT = 15.0
+STREAM_BUFFER = 16
+# a watch is shared by every subscriber of its URL, so it renders without the headers
+# that make a response specific to one client: compression, conditionals, profiling
+WATCH_DROPPED_HEADERS = (
+    "HTTP_ACCEPT_ENCODING",
+    "HTTP_IF_NONE_MATCH",
+    "HTTP_IF_MODIFIED_SINCE",
+    "HTTP_LAST_EVENT_ID",
+    "HTTP_X_DBSOF_PROFILE",
+    "HTTP_X_DBSOF_ADMIN_TOKEN",
+)
+WATCH_DROPPED_PARAMS = ("wait", "profile")
+
+Headers = List[Tuple[bytes, bytes]]
+
+
+def _environ(scope: Dict[str, Any], body: bytes) -> Dict[str, Any]:
+    server = scope.get("server") or ("localhost", 80)
+    client = scope.get("client") or ("", 0)
+    environ: Dict[str, Any] = {
+        "REQUEST_METHOD": scope["method"],
+        "SCRIPT_NAME": scope.get("root_path", "").encode().decode("latin1"),
+        "PATH_INFO": scope["path"].encode().decode("latin1"),
+        "QUERY_STRING": scope["query_string"].decode("latin1"),
+        "SERVER_NAME": server[0],
+        "SERVER_PORT": str(server[1]),
+        "REMOTE_ADDR": client[0],
+        "SERVER_PROTOCOL": f"HTTP/{scope.get('http_version', '1.1')}",
+        "wsgi.version": (1, 0),
+        "wsgi.url_scheme": scope.get("scheme", "http"),
+        "wsgi.input": io.BytesIO(body),
+        "wsgi.errors": sys.stderr,
+        "wsgi.multithread": True,
+        "wsgi.multiprocess": False,
+        "wsgi.run_once": False,
+    }
+    for raw_name, raw_value in scope.get("headers", []):
+        name = raw_name.decode("latin1").upper().replace("-", "_")
+        value = raw_value.decode("latin1")
+        if name not in ("CONTENT_TYPE", "CONTENT_LENGTH"):
+            name = f"HTTP_{name}"
+        environ[name] = f"{environ[name]},{value}" if name in environ else value
+    return environ
+
+
+async def _read_body(receive) -> bytes:
+    chunks = []
+    while True:
+        message = await receive()
+        if message["type"] == "http.disconnect":
+            break
+        chunks.append(message.get("body", b""))
+        if not message.get("more_body"):
+            break
+    return b"".join(chunks)
+
+
+def _header(scope: Dict[str, Any], name: bytes) -> str | None:
+    return next((v.decode("latin1") for k, v in scope.get("headers", []) if k == name), None)
+
+
+def create_asgi_app(threads: int = EXECUTOR_THREADS):
+    """Serve the Flask app's routes over ASGI.
+
+    Ordinary requests run the WSGI app on a bounded thread pool, so SQLite
+    work never blocks the event loop and excess requests queue instead of
+    spawning threads. GETs on the polled resources in ``WATCH_PATH_RE``
+    additionally support long-polling (``?wait=<seconds>`` with
+    ``If-None-Match``) and server-sent events (``Accept: text/event-stream``).
+    Waiting clients hold no thread: each distinct URL has one watcher that
+    re-renders it every ``WATCH_INTERVAL`` seconds and wakes its subscribers
+    when the body changes.
+    """
+    flask_app = create_app()
+    pool = ThreadPoolExecutor(max_workers=threads, thread_name_prefix="dbsof-asgi")
+    watches: Dict[str, Dict[str, Any]] = {}
+
+    async def run_wsgi(environ: Dict[str, Any]) -> Tuple[int, Headers, Any]:
+        loop = asyncio.get_running_loop()
+        started: Dict[str, Any] = {}
+
+        def start_response(status, headers, exc_info=None):
+            started["status"] = int(status.split(" ", 1)[0])
+            started["headers"] = [(k.lower().encode("latin1"), v.encode("latin1")) for k, v in headers]
+
+        # one context for the whole response so streamed generators keep their app context
+        ctx = contextvars.copy_context()
+        result = await loop.run_in_executor(pool, ctx.run, flask_app, environ, start_response)
+        return started["status"], started["headers"], (ctx, result)
+
+    async def render(environ: Dict[str, Any]) -> Tuple[int, Headers, bytes]:
+        loop = asyncio.get_running_loop()
+        status, headers, (ctx, result) = await run_wsgi(environ)
+
+        def collect():
+            try:
+                return b"".join(result)
+            finally:
+                if hasattr(result, "close"):
+                    result.close()
+
+        return status, headers, await loop.run_in_executor(pool, ctx.run, collect)
+
+    async def proxy(scope, receive, send) -> None:
+        loop = asyncio.get_running_loop()
+        status, headers, (ctx, result) = await run_wsgi(_environ(scope, await _read_body(receive)))
+        await send({"type": "http.response.start", "status": status, "headers": headers})
+        if isinstance(result, (list, tuple)):
+            for chunk in result:
+                await send({"type": "http.response.body", "body": chunk, "more_body": True})
+            await send({"type": "http.response.body", "body": b""})
+            return
+        # streamed bodies often hold a SQLite connection, which must stay on one thread,
+        # so a single pool thread drains the iterator into a bounded hand-off queue
+        queue: asyncio.Queue = asyncio.Queue()
+        credit = threading.Semaphore(STREAM_BUFFER)
+        stopped = threading.Event()
+
+        def pump():
+            try:
+                for chunk in result:
+                    credit.acquire()
+                    if stopped.is_set():
+                        break
+                    loop.call_soon_threadsafe(queue.put_nowait, chunk)
+            except Exception as exc:
+                loop.call_soon_threadsafe(queue.put_nowait, exc)
+            finally:
+                if hasattr(result, "close"):
+                    result.close()
+                loop.call_soon_threadsafe(queue.put_nowait, None)
+
+        pumping = loop.run_in_executor(pool, ctx.run, pump)
+        try:
+            while (chunk := await queue.get()) is not None:
+                credit.release()
+                if isinstance(chunk, Exception):
+                    raise chunk
+                await send({"type": "http.response.body", "body": chunk, "more_body": True})
+        finally:
+            stopped.set()
+            credit.release(STREAM_BUFFER + 1)
+            await pumping
+        await send({"type": "http.response.body", "body": b""})
+
+    async def watch_loop(key: str, watch: Dict[str, Any]) -> None:
+        while watch["subscribers"]:
+            try:
+                status, headers, body = await render(dict(watch["environ"], **{"wsgi.input": io.BytesIO()}))
+            except Exception as exc:  # keep serving subscribers; report the failure as the state
+                status, headers, body = 500, [(b"content-type", b"text/plain")], str(exc).encode()
+            etag = hashlib.blake2b(body, digest_size=8).hexdigest() + f"-{status}"
+            if etag != watch["etag"]:
+                watch.update(etag=etag, status=status, headers=headers, body=body)
+                changed, watch["changed"] = watch["changed"], asyncio.Event()
+                changed.set()
+            await asyncio.sleep(WATCH_INTERVAL)
+        # no await between the check and the removal, so no subscriber can slip in
+        del watches[key]
+
+    def subscribe(scope: Dict[str, Any]) -> Dict[str, Any]:
+        query = [(k, v) for k, v in parse_qsl(scope["query_string"].decode("latin1")) if k not in WATCH_DROPPED_PARAMS]
+        key = f"{scope['path']}?{urlencode(sorted(query))}"
+        watch = watches.get(key)
+        if watch is None:
+            environ = _environ(dict(scope, method="GET", query_string=urlencode(query).encode()), b"")
+            for name in WATCH_DROPPED_HEADERS:
+                environ.pop(name, None)
+            watch = {"environ": environ, "subscribers": 0, "etag": None, "changed": asyncio.Event()}
+            watches[key] = watch
+            watch["task"] = asyncio.ensure_future(watch_loop(key, watch))
+        watch["subscribers"] += 1
+        return watch
+
+    async def next_change(watch: Dict[str, Any], seen: str | None, timeout: float, disconnected: asyncio.Event) -> bool:
+        """Wait until the watch's etag differs from ``seen``; False on timeout or disconnect."""
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        while watch["etag"] is None or watch["etag"] == seen:
+            remaining = deadline - loop.time()
+            if remaining <= 0 or disconnected.is_set():
+                return False
+            changed = asyncio.ensure_future(watch["changed"].wait())
+            gone = asyncio.ensure_future(disconnected.wait())
+            await asyncio.wait((changed, gone), timeout=remaining, return_when=asyncio.FIRST_COMPLETED)
+            changed.cancel()
+            gone.cancel()
+        return True
+
+    async def watch_disconnect(receive, disconnected: asyncio.Event) -> None:
+        while (await receive())["type"] != "http.disconnect":
+            pass
+        disconnected.set()
+
+    async def long_poll(scope, receive, send, wait: float) -> None:
+        disconnected = asyncio.Event()
+        listener = asyncio.ensure_future(watch_disconnect(receive, disconnected))
+        watch = subscribe(scope)
+        try:
+            seen = (_header(scope, b"if-none-match") or "").strip('"') or None
+            if not await next_change(watch, seen, min(wait, MAX_WAIT), disconnected):
+                if disconnected.is_set():
+                    return
+                if seen is None:
+                    body = b'{"error":"timed out waiting for the first snapshot"}'
+                    await send({"type": "http.response.start", "status": 504, "headers": [(b"content-type", b"application/json")]})
+                    await send({"type": "http.response.body", "body": body})
+                    return
+                await send({"type": "http.response.start", "status": 304, "headers": [(b"etag", f'"{seen}"'.encode())]})
+                await send({"type": "http.response.body", "body": b""})
+                return
+            headers = [h for h in watch["headers"] if h[0] not in (b"etag", b"content-length")]
+            headers += [(b"etag", f'"{watch["etag"]}"'.encode()), (b"content-length", str(len(watch["body"])).encode())]
+            await send({"type": "http.response.start", "status": watch["status"], "headers": headers})
+            await send({"type": "http.response.body", "body": watch["body"]})
+        finally:
+            watch["subscribers"] -= 1
+            listener.cancel()
+
+    async def event_stream(scope, receive, send) -> None:
+        disconnected = asyncio.Event()
+        listener = asyncio.ensure_future(watch_disconnect(receive, disconnected))
+        watch = subscribe(scope)
+        seen = _header(scope, b"last-event-id")
+        try:
+            await send(
+                {
+                    "type": "http.response.start",
+                    "status": 200,
+                    "headers": [(b"content-type", b"text/event-stream"), (b"cache-control", b"no-cache")],
+                }
+            )
+            while not disconnected.is_set():
+                if await next_change(watch, seen, SSE_HEARTBEAT, disconnected):
+                    seen = watch["etag"]
+                    data = "".join(f"data: {line}\n" for line in watch["body"].decode("utf-8", "replace").splitlines())
+                    event = "update" if watch["status"] < 400 else "error"
+                    message = f"id: {seen}\nevent: {event}\n{data}\n"
+                elif disconnected.is_set():
+                    break
+                else:
+                    message = ": keep-alive\n\n"
+                await send({"type": "http.response.body", "body": message.encode(), "more_body": True})
+        finally:
+            watch["subscribers"] -= 1
+            listener.cancel()
+
+    async def lifespan(receive, send) -> None:
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                for watch in list(watches.values()):
+                    watch["task"].cancel()
+                pool.shutdown(wait=False, cancel_futures=True)
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    async def app(scope, receive, send) -> None:
+        if scope["type"] == "lifespan":
+            await lifespan(receive, send)
+            return
+        if scope["type"] != "http":
+            raise ValueError(f"unsupported ASGI scope: {scope['type']}")
+        if scope["method"] == "GET" and WATCH_PATH_RE.match(scope["path"]):
+            if "text/event-stream" in (_header(scope, b"accept") or ""):
+                await event_stream(scope, receive, send)
+                return
+            wait = dict(parse_qsl(scope["query_string"].decode("latin1"))).get("wait")
+            try:
+                seconds = float(wait) if wait else None
+            except ValueError:
+                seconds = None
+            if seconds is not None:
+                await long_poll(scope, receive, send, seconds)
+                return
+        await proxy(scope, receive, send)
+
+    return app
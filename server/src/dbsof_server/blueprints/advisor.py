@@ -0,0 +1,76 @@
+from __future__ import annotations
+
+import sqlite3
+
+from flask import Blueprint, jsonify, request
+
+from ..advisor import apply_indexes, clear_workload, get_workload, recommend
+from ..core import connect_reader, resolve_instance_id
+from ..metrics import record_sqlite_error
+
+bp = Blueprint(
+    "advisor",
+    __name__,
+    url_prefix="/instances/<instance_id>/databases/<db>/advisor",
+)
+
+
+@bp.get("/indexes")
+def index_recommendations(instance_id: str, db: str):
+    resolved = resolve_instance_id(instance_id)
+    if resolved is None:
+        return jsonify({"error": "instance not found"}), 404
+    conn = connect_reader(db)
+    try:
+        return jsonify(recommend(conn, db))
+    finally:
+        conn.close()
+
+
+@bp.post("/indexes/apply")
+def apply_recommendations(instance_id: str, db: str):
+    resolved = resolve_instance_id(instance_id)
+    if resolved is None:
+        return jsonify({"error": "instance not found"}), 404
+    payload = request.get_json(force=True, silent=True) or {}
+    names = payload.get("names")
+    if names is not None and not isinstance(names, list):
+        return jsonify({"error": "names must be a list of recommendation names"}), 400
+    include_fks = bool(payload.get("foreignKeys", False))
+
+    conn = connect_reader(db)
+    try:
+        advice = recommend(conn, db)
+        statements = [(r["name"], r["sql"]) for r in advice["recommendations"]]
+        if include_fks:
+            statements += [(f"{fk['table']}_{fk['column']}", fk["sql"]) for fk in advice["unindexedForeignKeys"]]
+        if names is not None:
+            unknown = set(names) - {name for name, _ in statements}
+            if unknown:
+                return jsonify({"error": f"not a current recommendation: {sorted(unknown)[0]}"}), 400
+            statements = [(name, sql) for name, sql in statements if name in names]
+        return jsonify({"created": apply_indexes(db, statements)})
+    except sqlite3.OperationalError as exc:
+        record_sqlite_error(exc)
+        return jsonify({"error": str(exc)}), 400
+    finally:
+        conn.close()
+
+
+@bp.get("/workload")
+def workload(instance_id: str, db: str):
+    resolved = resolve_instance_id(instance_id)
+    if resolved is None:
+        return jsonify({"error": "instance not found"}), 404
+    return jsonify(
+        [{k: v for k, v in entry.items() if k not in ("sql", "params")} for entry in get_workload(db)]
+    )
+
+
+@bp.delete("/workload")
+def reset_workload(instance_id: str, db: str):
+    resolved = resolve_instance_id(instance_id)
+    if resolved is None:
+        return jsonify({"error": "instance not found"}), 404
+    clear_workload(db)
+    return "", 204
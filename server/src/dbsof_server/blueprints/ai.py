@@ -1,12 +1,23 @@
 from __future__ import annotations
 
+import bisect
+import copy
+import threading
 import time
 import uuid
-from typing import Dict, Any
+from typing import Dict, Any, List, Tuple
 
 from flask import Blueprint, jsonify, request
 
-from ..core import AI_TASKS, AI_TASK_LOCK, AI_PROGRAMS, resolve_instance_id
+from ..core import (
+    AI_TASKS,
+    AI_TASK_LOCK,
+    AI_PROGRAMS,
+    AI_PROGRAM_STATE,
+    AI_RUNNING_TASKS,
+    resolve_instance_id,
+)
+from ..executor import run_graph
 
 bp = Blueprint(
     "ai",
@@ -19,12 +30,67 @@ def _now_iso() -> str:
     return time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
 
 
+def _edge_key(edge: Dict[str, Any]) -> Tuple[str, str, str]:
+    return (edge["from"], edge["to"], edge.get("label", ""))
+
+
+def _init_program_state(program: Dict[str, Any], task_id: str) -> Dict[str, Any]:
+    """Build the set-indexed bookkeeping used to progress a program and serve deltas."""
+    template = program.get("_template") or {"nodes": [], "edges": []}
+    edges_by_node: Dict[str, List[Dict[str, Any]]] = {}
+    for edge in template["edges"]:
+        edges_by_node.setdefault(edge["from"], []).append(edge)
+        edges_by_node.setdefault(edge["to"], []).append(edge)
+    state = {
+        "taskId": task_id,
+        "version": 1,
+        "changeVersions": [],
+        "changes": [],
+        "nodeIds": set(),
+        "edgeKeys": set(),
+        "edgesByNode": edges_by_node,
+        "settled": 0,
+    }
+    for node in program["graph"]["nodes"]:
+        state["nodeIds"].add(node["id"])
+        _record_change(state, "node", node["id"])
+    program["version"] = state["version"]
+    return state
+
+
+def _record_change(state: Dict[str, Any], kind: str, key: Any):
+    state["changeVersions"].append(state["version"])
+    state["changes"].append((kind, key))
+
+
+def _set_node_status(state: Dict[str, Any], node: Dict[str, Any], status: str):
+    if node.get("status") != status:
+        node["status"] = status
+        _record_change(state, "node", node["id"])
+
+
+def _add_node(state: Dict[str, Any], graph: Dict[str, Any], node: Dict[str, Any]):
+    graph["nodes"].append(node)
+    state["nodeIds"].add(node["id"])
+    _record_change(state, "node", node["id"])
+    for edge in state["edgesByNode"].get(node["id"], []):
+        key = _edge_key(edge)
+        if key in state["edgeKeys"]:
+            continue
+        if edge["from"] in state["nodeIds"] and edge["to"] in state["nodeIds"]:
+            state["edgeKeys"].add(key)
+            graph["edges"].append(edge)
+            _record_change(state, "edge", key)
+
+
 def _progress_program(task: Dict[str, Any]):
     """Incrementally add nodes over time, then mark done after expected duration."""
     if task["status"] != "running":
+        AI_RUNNING_TASKS.discard(task["id"])
         return
     program = AI_PROGRAMS.get(task["programId"])
-    if not program:
+    state = AI_PROGRAM_STATE.get(task["programId"])
+    if not program or state is None:
         return
     elapsed = time.time() - task.get("started_ts", time.time())
     expected = float(task.get("expected_seconds", 20.0))
@@ -34,6 +100,10 @@ def _progress_program(task: Dict[str, Any]):
     if total_nodes == 0:
         return
 
+    # stage changes under the next version; only publish it if something changed
+    state["version"] += 1
+    changes_before = len(state["changes"])
+
     # desired count: spread nodes across timeline; last node only near completion
     progress = max(0.0, min(1.0, elapsed / max(expected, 0.1)))
     target_count = max(1, min(total_nodes, int(progress * (total_nodes - 1)) + 1))
@@ -41,34 +111,133 @@ def _progress_program(task: Dict[str, Any]):
     target_count = min(target_count, len(graph["nodes"]) + 1)
 
     if len(graph["nodes"]) < target_count:
-        new_nodes = template["nodes"][len(graph["nodes"]) : target_count]
-        graph["nodes"].extend(new_nodes)
-        present_ids = {n["id"] for n in graph["nodes"]}
-        for edge in template["edges"]:
-            if (
-                edge["from"] in present_ids
-                and edge["to"] in present_ids
-                and edge not in graph["edges"]
-            ):
-                graph["edges"].append(edge)
+        for node in template["nodes"][len(graph["nodes"]) : target_count]:
+            _add_node(state, graph, node)
         program["updatedAt"] = _now_iso()
 
-    # update node statuses
-    for idx, node in enumerate(graph["nodes"]):
-        node["status"] = "in-progress" if idx == len(graph["nodes"]) - 1 else "done"
+    # nodes before the last are settled once; only the tail can change status
+    if graph["nodes"]:
+        for node in graph["nodes"][state["settled"] : -1]:
+            _set_node_status(state, node, "done")
+        state["settled"] = len(graph["nodes"]) - 1
+        _set_node_status(state, graph["nodes"][-1], "in-progress")
 
     if elapsed >= expected or len(graph["nodes"]) >= total_nodes:
         task["status"] = "completed"
         task["completedAt"] = _now_iso()
+        AI_RUNNING_TASKS.discard(task["id"])
         program["status"] = "ready"
         program["updatedAt"] = task["completedAt"]
-        for n in graph["nodes"]:
-            n["status"] = "done"
         # ensure all nodes/edges are present at completion
-        if len(graph["nodes"]) < total_nodes:
-            graph["nodes"] = template["nodes"][:]
-        if len(graph["edges"]) < len(template["edges"]):
-            graph["edges"] = template["edges"][:]
+        for node in template["nodes"]:
+            if node["id"] not in state["nodeIds"]:
+                _add_node(state, graph, node)
+        for node in graph["nodes"][state["settled"] :]:
+            _set_node_status(state, node, "done")
+        state["settled"] = len(graph["nodes"])
+
+    if len(state["changes"]) == changes_before:
+        state["version"] -= 1
+    program["version"] = state["version"]
+
+
+def _progress_running():
+    """Advance only the tasks that are still running."""
+    for task_id in list(AI_RUNNING_TASKS):
+        task = AI_TASKS.get(task_id)
+        if task is None:
+            AI_RUNNING_TASKS.discard(task_id)
+            continue
+        _progress_program(task)
+
+
+def _program_delta(program: Dict[str, Any], since: int) -> Dict[str, Any]:
+    """Return the nodes and edges added or changed after version ``since``."""
+    state = AI_PROGRAM_STATE[program["id"]]
+    start = bisect.bisect_right(state["changeVersions"], since)
+    node_ids: set[str] = set()
+    edge_keys: set[Tuple[str, str, str]] = set()
+    for kind, key in state["changes"][start:]:
+        (node_ids if kind == "node" else edge_keys).add(key)
+    return {
+        "id": program["id"],
+        "status": program["status"],
+        "updatedAt": program["updatedAt"],
+        "version": state["version"],
+        "since": since,
+        "run": program.get("run"),
+        "nodes": [n for n in program["graph"]["nodes"] if n["id"] in node_ids],
+        "edges": [e for e in program["graph"]["edges"] if _edge_key(e) in edge_keys],
+    }
+
+
+def _prepare_run(program: Dict[str, Any], state: Dict[str, Any]):
+    """Materialise the whole graph with pending nodes ahead of an execution run."""
+    task = AI_TASKS.get(state["taskId"])
+    if task and task["status"] == "running":
+        # a real run supersedes the timed build animation
+        task["status"] = "completed"
+        task["completedAt"] = _now_iso()
+        AI_RUNNING_TASKS.discard(task["id"])
+    state["version"] += 1
+    template = program.get("_template") or {"nodes": [], "edges": []}
+    graph = program["graph"]
+    for node in template["nodes"]:
+        if node["id"] not in state["nodeIds"]:
+            _add_node(state, graph, node)
+    for node in graph["nodes"]:
+        node.pop("durationMs", None)
+        node.pop("error", None)
+        _set_node_status(state, node, "pending")
+    state["settled"] = len(graph["nodes"])
+    program["status"] = "ready"
+    program["run"] = {"status": "running", "startedAt": _now_iso(), "completedAt": None, "durationMs": None}
+    program["updatedAt"] = program["run"]["startedAt"]
+    program["version"] = state["version"]
+
+
+def _on_node_update(program_id: str, node_id: str, status: str, duration_ms: float | None, error: str | None):
+    with AI_TASK_LOCK:
+        program = AI_PROGRAMS.get(program_id)
+        state = AI_PROGRAM_STATE.get(program_id)
+        if not program or state is None:
+            return
+        node = next((n for n in program["graph"]["nodes"] if n["id"] == node_id), None)
+        if node is None:
+            return
+        state["version"] += 1
+        node["status"] = status
+        if duration_ms is not None:
+            node["durationMs"] = duration_ms
+        if error is not None:
+            node["error"] = error
+        _record_change(state, "node", node_id)
+        program["version"] = state["version"]
+        program["updatedAt"] = _now_iso()
+
+
+def _execute_program(db: str, program_id: str, nodes: List[Dict[str, Any]], edges: List[Dict[str, Any]]):
+    def on_update(node_id: str, status: str, duration_ms: float | None, error: str | None):
+        _on_node_update(program_id, node_id, status, duration_ms, error)
+
+    try:
+        outcome = run_graph(db, nodes, edges, on_update)
+        run_update = {
+            "status": outcome["status"],
+            "durationMs": outcome["durationMs"],
+            "result": outcome["results"].get("Finalize"),
+        }
+    except Exception as exc:
+        run_update = {"status": "failed", "error": str(exc)}
+    with AI_TASK_LOCK:
+        program = AI_PROGRAMS.get(program_id)
+        state = AI_PROGRAM_STATE.get(program_id)
+        if not program or state is None:
+            return
+        state["version"] += 1
+        program["run"].update(run_update, completedAt=_now_iso())
+        program["updatedAt"] = program["run"]["completedAt"]
+        program["version"] = state["version"]
 
 
 def _cfg_for_feature(feature: str) -> Dict[str, Any]:
@@ -95,9 +264,12 @@ def _cfg_for_feature(feature: str) -> Dict[str, Any]:
         {"id": "final", "label": "Finalize", "status": "pending"},
     ]
     edges = [
+        # the three loaders are independent and fan back in at the baseline
         {"from": "start", "to": "load_cycle", "label": ""},
-        {"from": "load_cycle", "to": "load_rules", "label": ""},
-        {"from": "load_rules", "to": "load_history", "label": ""},
+        {"from": "start", "to": "load_rules", "label": ""},
+        {"from": "start", "to": "load_history", "label": ""},
+        {"from": "load_cycle", "to": "baseline", "label": ""},
+        {"from": "load_rules", "to": "baseline", "label": ""},
         {"from": "load_history", "to": "baseline", "label": ""},
         {"from": "baseline", "to": "detect_spike", "label": ""},
         {"from": "detect_spike", "to": "classify_cause", "label": "spike"},
@@ -126,7 +298,8 @@ def _cfg_for_feature(feature: str) -> Dict[str, Any]:
         ]
         edges = [
             {"from": "start", "to": "load_complaints", "label": ""},
-            {"from": "load_complaints", "to": "load_exceptions", "label": ""},
+            {"from": "start", "to": "load_exceptions", "label": ""},
+            {"from": "load_complaints", "to": "for_complaint", "label": ""},
             {"from": "load_exceptions", "to": "for_complaint", "label": ""},
             {"from": "for_complaint", "to": "if_linked", "label": ""},
             {"from": "if_linked", "to": "attach_workflow", "label": "yes"},
@@ -171,9 +344,12 @@ def create_program(instance_id: str, db: str):
         "step": 0,
     }
     with AI_TASK_LOCK:
+        AI_PROGRAM_STATE[program_id] = _init_program_state(program, task_id)
         AI_PROGRAMS[program_id] = program
         AI_TASKS[task_id] = task
-    return jsonify({"task": task, "program": program}), 202
+        AI_RUNNING_TASKS.add(task_id)
+        snapshot = jsonify({"task": task, "program": program})
+    return snapshot, 202
 
 
 @bp.get("/programs")
@@ -182,9 +358,9 @@ def list_programs(instance_id: str, db: str):
     if resolved is None:
         return jsonify([]), 404
     with AI_TASK_LOCK:
-        for t in AI_TASKS.values():
-            _progress_program(t)
-        programs = list(AI_PROGRAMS.values())
+        _progress_running()
+        # the executor thread updates node dicts in place; serialize a copy taken under the lock
+        programs = copy.deepcopy(list(AI_PROGRAMS.values()))
     return jsonify(programs)
 
 
@@ -193,15 +369,42 @@ def get_program(instance_id: str, db: str, program_id: str):
     resolved = resolve_instance_id(instance_id)
     if resolved is None:
         return jsonify({"error": "instance not found"}), 404
+    since = request.args.get("since", type=int)
     with AI_TASK_LOCK:
-        for t in AI_TASKS.values():
-            _progress_program(t)
+        state = AI_PROGRAM_STATE.get(program_id)
+        task = AI_TASKS.get(state["taskId"]) if state else None
+        if task:
+            _progress_program(task)
         program = AI_PROGRAMS.get(program_id)
+        if program and state is not None and since is not None:
+            return jsonify(_program_delta(program, since))
+        program = copy.deepcopy(program)
     if not program:
         return jsonify({"error": "program not found"}), 404
     return jsonify(program)
 
 
+@bp.post("/programs/<program_id>/run")
+def run_program(instance_id: str, db: str, program_id: str):
+    resolved = resolve_instance_id(instance_id)
+    if resolved is None:
+        return jsonify({"error": "instance not found"}), 404
+    with AI_TASK_LOCK:
+        program = AI_PROGRAMS.get(program_id)
+        state = AI_PROGRAM_STATE.get(program_id)
+        if not program or state is None:
+            return jsonify({"error": "program not found"}), 404
+        if (program.get("run") or {}).get("status") == "running":
+            return jsonify({"error": "program is already running"}), 409
+        _prepare_run(program, state)
+        template = program["_template"]
+        nodes = [{"id": n["id"], "label": n["label"]} for n in template["nodes"]]
+        edges = [dict(e) for e in template["edges"]]
+        snapshot = jsonify(program)
+    threading.Thread(target=_execute_program, args=(db, program_id, nodes, edges), daemon=True).start()
+    return snapshot, 202
+
+
 @bp.post("/tasks")
 def create_task(instance_id: str, db: str):
     # redirect to program creation for backwards compatibility
@@ -215,9 +418,8 @@ def list_tasks(instance_id: str, db: str):
         return jsonify([]), 404
     status = request.args.get("status")
     with AI_TASK_LOCK:
-        for t in AI_TASKS.values():
-            _progress_program(t)
-        tasks = list(AI_TASKS.values())
+        _progress_running()
+        tasks = copy.deepcopy(list(AI_TASKS.values()))
     if status:
         tasks = [t for t in tasks if t["status"] == status]
     return jsonify(tasks)
@@ -232,7 +434,8 @@ def get_task(instance_id: str, db: str, task_id: str):
         task = AI_TASKS.get(task_id)
         if task:
             _progress_program(task)
-            program = AI_PROGRAMS.get(task["programId"])
+            program = copy.deepcopy(AI_PROGRAMS.get(task["programId"]))
+            task = dict(task)
         else:
             program = None
     if not task:
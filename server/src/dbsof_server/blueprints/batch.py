@@ -0,0 +1,131 @@
+from __future__ import annotations
+
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List
+
+from flask import Blueprint, current_app, jsonify, request
+
+from ..core import SHARED_CONNECTIONS, close_shared
+from ..metrics import record_sqlite_error
+
+bp = Blueprint("batch", __name__)
+
+MAX_REQUESTS = 32
+BATCH_THREADS = 4
+READ_METHODS = ("GET", "HEAD")
+METHODS = ("GET", "HEAD", "POST", "PUT", "PATCH", "DELETE")
+FORWARDED_HEADERS = ("Content-Type", "ETag", "Server-Timing")
+
+_POOL = ThreadPoolExecutor(max_workers=BATCH_THREADS, thread_name_prefix="dbsof-batch")
+
+
+def _validate(items: Any) -> List[Dict[str, Any]]:
+    if not isinstance(items, list) or not items:
+        raise ValueError("requests must be a non-empty list")
+    if len(items) > MAX_REQUESTS:
+        raise ValueError(f"at most {MAX_REQUESTS} requests per batch")
+    subs = []
+    for index, item in enumerate(items):
+        if not isinstance(item, dict):
+            raise ValueError(f"request {index} must be an object")
+        path = item.get("path")
+        method = str(item.get("method", "GET")).upper()
+        if not isinstance(path, str) or not path.startswith("/"):
+            raise ValueError(f"request {index} needs an absolute path")
+        if path.split("?", 1)[0].rstrip("/") == "/batch":
+            raise ValueError("batches cannot be nested")
+        if method not in METHODS:
+            raise ValueError(f"request {index} has unsupported method {method}")
+        headers = item.get("headers") or {}
+        if not isinstance(headers, dict):
+            raise ValueError(f"request {index} headers must be an object")
+        subs.append({**item, "id": item.get("id", index), "method": method, "headers": headers})
+    return subs
+
+
+def _dispatch(app, sub: Dict[str, Any]) -> Dict[str, Any]:
+    """Run one sub-request through the app's normal request handling."""
+    start = time.perf_counter()
+    options: Dict[str, Any] = {"method": sub["method"], "headers": sub["headers"]}
+    if "body" in sub:
+        options["json"] = sub["body"]
+    # a fresh app context too, so sub-requests never share ``g`` with the batch
+    with app.app_context(), app.test_request_context(sub["path"], **options):
+        try:
+            response = app.full_dispatch_request()
+        except Exception as exc:
+            # handled here, so the teardown that would count it sees no exception
+            record_sqlite_error(exc)
+            response = app.make_response(app.handle_exception(exc))
+        data = response.get_data()
+        response.close()
+    headers = {k: response.headers[k] for k in FORWARDED_HEADERS if k in response.headers}
+    if response.status_code == 304 or not data:
+        body = None
+        headers.pop("Content-Type", None)
+    elif response.is_json:
+        body = json.loads(data)
+    else:
+        body = data.decode("utf-8", "replace")
+    return {
+        "id": sub["id"],
+        "status": response.status_code,
+        "headers": headers,
+        "body": body,
+        "durationMs": round((time.perf_counter() - start) * 1000, 3),
+    }
+
+
+def _run_shared(app, subs: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Run sub-requests one after another, reusing one connection per database."""
+    shared: Dict[str, Any] = {}
+    token = SHARED_CONNECTIONS.set(shared)
+    try:
+        return [_dispatch(app, sub) for sub in subs]
+    finally:
+        SHARED_CONNECTIONS.reset(token)
+        close_shared(shared)
+
+
+def _run_reads(app, subs: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Spread read-only sub-requests over the pool, keeping their original order in the result."""
+    lanes = min(BATCH_THREADS, len(subs))
+    if lanes == 1:
+        return _run_shared(app, subs)
+    futures = [_POOL.submit(_run_shared, app, subs[lane::lanes]) for lane in range(lanes)]
+    results = [future.result() for future in futures]
+    return [results[index % lanes][index // lanes] for index in range(len(subs))]
+
+
+@bp.post("/batch")
+def batch():
+    """Execute several API requests in one round trip.
+
+    Consecutive read-only sub-requests run in parallel on shared
+    connections; any other method runs alone, in order, so writes are
+    seen by the reads that follow them.
+    """
+    payload = request.get_json(silent=True)
+    items = payload.get("requests") if isinstance(payload, dict) else payload
+    try:
+        subs = _validate(items)
+    except ValueError as exc:
+        return jsonify({"error": str(exc)}), 400
+
+    app = current_app._get_current_object()
+    start = time.perf_counter()
+    responses: List[Dict[str, Any]] = []
+    reads: List[Dict[str, Any]] = []
+    for sub in subs:
+        if sub["method"] in READ_METHODS:
+            reads.append(sub)
+            continue
+        if reads:
+            responses.extend(_run_reads(app, reads))
+            reads = []
+        responses.append(_dispatch(app, sub))
+    if reads:
+        responses.extend(_run_reads(app, reads))
+    return jsonify({"responses": responses, "durationMs": round((time.perf_counter() - start) * 1000, 3)})
@@ -1,17 +1,21 @@
 from __future__ import annotations
 
+import sqlite3
+import threading
 import time
 import uuid
 from typing import Dict, Any, List, Tuple
 
 from flask import Blueprint, jsonify, request
 
+from ..convert import import_csv
 from ..core import (
+    IMPORT_FILES,
     IMPORT_JOBS,
     IMPORT_LOCK,
     resolve_instance_id,
-    connect,
     seed_target_ontology,
+    submit_write,
 )
 
 SAMPLE_FILES: List[Tuple[str, str]] = [
@@ -81,21 +85,50 @@ def _now_iso() -> str:
 
 
 def _update_progress(job: Dict[str, Any]):
+    """Advance a running job's status; call with ``IMPORT_LOCK`` held."""
     if job["status"] != "running":
         return
     elapsed = time.time() - job.get("started_ts", time.time())
     duration = max(12.0, job.get("expected_seconds", 15.0))
+    if job.get("error"):
+        job["status"] = "failed"
+        job["completedAt"] = _now_iso()
+        job["updatedAt"] = job["completedAt"]
     # stall at 0 until done to avoid spinner feeling finite
-    if elapsed >= duration:
+    elif elapsed >= duration and job.get("applied"):
         job["progress"] = 100.0
         job["status"] = "completed"
         job["completedAt"] = _now_iso()
         job["updatedAt"] = job["completedAt"]
-        if not job.get("applied"):
-            inserted = _apply_seed_data(job["db"])
-            if inserted and not job.get("rows"):
-                job["rows"] = inserted
-            job["applied"] = True
+
+
+def _run_import(job_id: str, db: str):
+    """Apply a job's uploads (or the canned dataset) on a worker thread, off the request path."""
+    with IMPORT_LOCK:
+        uploads = IMPORT_FILES.get(job_id)
+    try:
+        if uploads:
+            results = _apply_uploaded_files(db, uploads)
+            inserted = sum(r["inserted"] for r in results)
+        else:
+            results = None
+            inserted = _apply_seed_data(db)
+    except Exception as exc:  # report any failure on the job; nothing retries it, so drop the uploads too
+        with IMPORT_LOCK:
+            IMPORT_FILES.pop(job_id, None)
+            job = IMPORT_JOBS[job_id]
+            job["error"] = str(exc)
+            _update_progress(job)
+        return
+    with IMPORT_LOCK:
+        IMPORT_FILES.pop(job_id, None)
+        job = IMPORT_JOBS[job_id]
+        if results is not None:
+            job["results"] = results
+        if inserted and not job.get("rows"):
+            job["rows"] = inserted
+        job["applied"] = True
+        _update_progress(job)
 
 
 @bp.post("")
@@ -114,11 +147,13 @@ def create_import(instance_id: str, db: str):
     started_ts = time.time()
     rows = int(payload.get("rows") or 0)
     file_info = []
+    uploads: List[Tuple[str, str]] = []
     for f in files:
         if not f:
             continue
         data = f.read()
         file_info.append({"filename": f.filename, "size": len(data)})
+        uploads.append((f.filename or "", data.decode("utf-8-sig", errors="replace")))
         f.stream.seek(0)
     if not file_info:
         file_info = [{"filename": name, "size": len(content.encode("utf-8"))} for name, content in SAMPLE_FILES]
@@ -144,8 +179,11 @@ def create_import(instance_id: str, db: str):
 
     with IMPORT_LOCK:
         IMPORT_JOBS[job_id] = job
-
-    return jsonify(job), 202
+        if uploads:
+            IMPORT_FILES[job_id] = uploads
+        snapshot = dict(job)
+    threading.Thread(target=_run_import, args=(job_id, db), daemon=True).start()
+    return jsonify(snapshot), 202
 
 
 @bp.get("")
@@ -156,7 +194,8 @@ def list_imports(instance_id: str, db: str):
     with IMPORT_LOCK:
         for job in IMPORT_JOBS.values():
             _update_progress(job)
-        jobs = [job for job in IMPORT_JOBS.values() if job.get("db") == db]
+        # copies: the import thread updates jobs under the lock, serialization happens after it
+        jobs = [dict(job) for job in IMPORT_JOBS.values() if job.get("db") == db]
     return jsonify(jobs)
 
 
@@ -169,6 +208,7 @@ def get_import(instance_id: str, db: str, job_id: str):
         job = IMPORT_JOBS.get(job_id)
         if job and job.get("db") == db:
             _update_progress(job)
+            job = dict(job)
         else:
             job = None
     if not job:
@@ -176,11 +216,50 @@ def get_import(instance_id: str, db: str, job_id: str):
     return jsonify(job)
 
 
+def _table_for_file(tables: List[str], filename: str) -> str | None:
+    """Match an upload like ``billingcycles.csv`` to its ontology table."""
+    stem = filename.rsplit("/", 1)[-1].rsplit(".", 1)[0].lower().replace("_", "").replace("-", "")
+    by_key = {t.lower(): t for t in tables}
+    for candidate in (stem, stem[:-1] if stem.endswith("s") else None):
+        if candidate and candidate in by_key:
+            return by_key[candidate]
+    return None
+
+
+def _apply_uploaded_files(db: str, uploads: List[Tuple[str, str]]) -> List[Dict[str, Any]]:
+    """Run uploaded CSV files through the batched conversion stage."""
+    seed_target_ontology(db)
+
+    def apply(conn: sqlite3.Connection) -> List[Dict[str, Any]]:
+        tables = [
+            r[0]
+            for r in conn.execute(
+                "SELECT name FROM sqlite_master WHERE type='table' AND name NOT LIKE 'sqlite_%' AND name != '__meta__'"
+            ).fetchall()
+        ]
+        results: List[Dict[str, Any]] = []
+        for filename, text in uploads:
+            table = _table_for_file(tables, filename)
+            if table is None:
+                results.append(
+                    {"filename": filename, "table": None, "rows": 0, "inserted": 0, "rejected": 0, "columns": {}}
+                )
+                continue
+            stats = import_csv(conn, table, text)
+            stats["filename"] = filename
+            results.append(stats)
+        return results
+
+    return submit_write(db, apply)
+
+
 def _apply_seed_data(db: str) -> int:
     """Apply a canned import dataset to the target database."""
     seed_target_ontology(db)
-    conn = connect(db)
-    conn.execute("PRAGMA foreign_keys = ON;")
+    return submit_write(db, _insert_seed_data)
+
+
+def _insert_seed_data(conn: sqlite3.Connection) -> int:
     cur = conn.cursor()
 
     customers: List[Tuple] = [
@@ -289,8 +368,6 @@ def _apply_seed_data(db: str) -> int:
         adjustments,
     )
 
-    conn.commit()
-    conn.close()
     return (
         len(customers)
         + len(sites)
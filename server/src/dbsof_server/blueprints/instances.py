@@ -1,13 +1,19 @@
-from flask import Blueprint, jsonify, request
+import json
+
+from flask import Blueprint, Response, jsonify, request, stream_with_context
 
 from ..core import (
     INSTANCE_ID,
     INSTANCE_NAME,
     create_database,
+    db_path,
+    get_copy_progress,
     get_database_migrations,
     list_databases,
     resolve_instance_id,
 )
+from ..diff import CHUNK_SIZE, DEFAULT_ROW_LIMIT, diff_databases
+from ..etags import conditional
 
 bp = Blueprint("instances", __name__)
 
@@ -35,12 +41,14 @@ def create_database_endpoint(instance_id: str):
     db_name = payload.get("name") or ""
     from_branch = payload.get("fromBranch")
     copy_data = payload.get("copyData", False)
+    copy_mode = payload.get("copyMode") or "backup"
+    template = payload.get("template")
     
     if not db_name:
         return jsonify({"error": "Database name is required"}), 400
     
     try:
-        result = create_database(db_name, from_branch, copy_data)
+        result = create_database(db_name, from_branch, copy_data, copy_mode, template)
         return jsonify(result), 201
     except ValueError as e:
         return jsonify({"error": str(e)}), 400
@@ -49,6 +57,7 @@ def create_database_endpoint(instance_id: str):
 
 
 @bp.get("/instances/<instance_id>/databases/<db>/migrations")
+@conditional(lineage=True)
 def get_migrations(instance_id: str, db: str):
     resolved = resolve_instance_id(instance_id)
     if resolved is None:
@@ -59,3 +68,37 @@ def get_migrations(instance_id: str, db: str):
         return jsonify(migrations)
     except Exception as e:
         return jsonify({"error": str(e)}), 500
+
+
+@bp.get("/instances/<instance_id>/databases/<db>/copy-progress")
+def copy_progress(instance_id: str, db: str):
+    resolved = resolve_instance_id(instance_id)
+    if resolved is None:
+        return jsonify({"error": "instance not found"}), 404
+    progress = get_copy_progress(db)
+    if progress is None:
+        return jsonify({"error": "no branch copy recorded for this database"}), 404
+    return jsonify(progress)
+
+
+@bp.get("/instances/<instance_id>/databases/<db>/diff/<other>")
+def diff_branches(instance_id: str, db: str, other: str):
+    resolved = resolve_instance_id(instance_id)
+    if resolved is None:
+        return jsonify({"error": "instance not found"}), 404
+    try:
+        chunk_size = int(request.args.get("chunkSize", CHUNK_SIZE))
+        limit = int(request.args.get("limit", DEFAULT_ROW_LIMIT))
+        missing = [name for name in (db, other) if not db_path(name).exists()]
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    if missing:
+        return jsonify({"error": f"database not found: {missing[0]}"}), 404
+    if chunk_size < 1 or limit < 0:
+        return jsonify({"error": "chunkSize must be positive and limit non-negative"}), 400
+
+    def generate():
+        for entry in diff_databases(db, other, chunk_size, limit):
+            yield json.dumps(entry) + "\n"
+
+    return Response(stream_with_context(generate()), mimetype="application/x-ndjson")
@@ -0,0 +1,118 @@
+from __future__ import annotations
+
+import sqlite3
+from typing import Dict
+
+from flask import Blueprint, jsonify, request
+
+from ..core import connect_reader, resolve_instance_id, submit_write
+from ..metrics import record_sqlite_error
+from ..rollups import (
+    DEFAULT_POINTS,
+    ensure_rollups,
+    query_series,
+    rebuild_rollups,
+    refresh_rollups,
+    rollups_installed,
+    rollups_stale,
+)
+from ..spikes import (
+    DEFAULT_MIN_HISTORY,
+    DEFAULT_PCT_THRESHOLD,
+    DEFAULT_WINDOW,
+    DEFAULT_Z_THRESHOLD,
+    detect_spikes,
+)
+
+bp = Blueprint(
+    "meters",
+    __name__,
+    url_prefix="/instances/<instance_id>/databases/<db>/meters",
+)
+
+
+@bp.post("/spikes")
+def run_spike_detection(instance_id: str, db: str):
+    resolved = resolve_instance_id(instance_id)
+    if resolved is None:
+        return jsonify({"error": "instance not found"}), 404
+    payload = request.get_json(force=True, silent=True) or {}
+    try:
+        window = int(payload.get("window", DEFAULT_WINDOW))
+        min_history = int(payload.get("minHistory", DEFAULT_MIN_HISTORY))
+        z_threshold = float(payload.get("zThreshold", DEFAULT_Z_THRESHOLD))
+        pct_threshold = float(payload.get("pctThreshold", DEFAULT_PCT_THRESHOLD))
+    except (TypeError, ValueError):
+        return jsonify({"error": "window, minHistory, zThreshold and pctThreshold must be numeric"}), 400
+    if window < 1 or min_history < 1:
+        return jsonify({"error": "window and minHistory must be at least 1"}), 400
+
+    # the scan reads from a pooled reader; only the spikes found go through the writer
+    conn = connect_reader(db)
+    try:
+        result = detect_spikes(
+            conn,
+            window=window,
+            min_history=min_history,
+            z_threshold=z_threshold,
+            pct_threshold=pct_threshold,
+            write=not payload.get("dryRun", False),
+            submit=lambda unit: submit_write(db, unit),
+        )
+        return jsonify(result)
+    except sqlite3.OperationalError as exc:
+        record_sqlite_error(exc)
+        return jsonify({"error": str(exc)}), 400
+    finally:
+        conn.close()
+
+
+@bp.post("/rollups/rebuild")
+def rebuild_meter_rollups(instance_id: str, db: str):
+    resolved = resolve_instance_id(instance_id)
+    if resolved is None:
+        return jsonify({"error": "instance not found"}), 404
+
+    def rebuild(writer: sqlite3.Connection) -> Dict[str, int]:
+        if not ensure_rollups(writer):
+            return rebuild_rollups(writer)
+        return {
+            r["resolution"]: r["c"]
+            for r in writer.execute(
+                "SELECT resolution, COUNT(*) AS c FROM MeterReadRollup GROUP BY resolution"
+            ).fetchall()
+        }
+
+    try:
+        counts = submit_write(db, rebuild)
+        return jsonify({"buckets": counts})
+    except sqlite3.OperationalError as exc:
+        record_sqlite_error(exc)
+        return jsonify({"error": str(exc)}), 400
+
+
+@bp.get("/<meter_id>/series")
+def meter_series(instance_id: str, db: str, meter_id: str):
+    resolved = resolve_instance_id(instance_id)
+    if resolved is None:
+        return jsonify({"error": "instance not found"}), 404
+    try:
+        points = int(request.args.get("points", DEFAULT_POINTS))
+    except ValueError:
+        return jsonify({"error": "points must be an integer"}), 400
+    conn = connect_reader(db)
+    try:
+        if not rollups_installed(conn):
+            submit_write(db, ensure_rollups)
+        if rollups_stale(conn, meter_id):
+            # buckets a delete left with an unknown min, max or last; recomputed once here
+            submit_write(db, lambda writer: refresh_rollups(writer, meter_id))
+        result = query_series(
+            conn, meter_id, request.args.get("from"), request.args.get("to"), points
+        )
+        return jsonify(result)
+    except (ValueError, sqlite3.OperationalError) as exc:
+        record_sqlite_error(exc)
+        return jsonify({"error": str(exc)}), 400
+    finally:
+        conn.close()
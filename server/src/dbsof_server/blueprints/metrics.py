@@ -0,0 +1,31 @@
+from __future__ import annotations
+
+from collections import Counter
+from typing import Any, Dict, Iterable, Tuple
+
+from flask import Blueprint, current_app
+
+from ..core import AI_TASK_LOCK, AI_TASKS, IMPORT_JOBS, IMPORT_LOCK
+from ..metrics import CONTENT_TYPE, register_gauge, render
+
+bp = Blueprint("metrics", __name__)
+
+
+def _by_status(jobs: Dict[str, Dict[str, Any]], lock, *fields: str) -> Iterable[Tuple[Dict[str, str], float]]:
+    with lock:
+        counts = Counter(tuple(str(job.get(field, "")) for field in fields) for job in jobs.values())
+    return [(dict(zip(fields, key)), count) for key, count in counts.items()]
+
+
+register_gauge(
+    "dbsof_import_jobs",
+    "Import jobs by database and status.",
+    lambda: _by_status(IMPORT_JOBS, IMPORT_LOCK, "db", "status"),
+)
+register_gauge("dbsof_ai_tasks", "AI tasks by status.", lambda: _by_status(AI_TASKS, AI_TASK_LOCK, "status"))
+
+
+@bp.get("/metrics")
+def metrics():
+    """Prometheus scrape endpoint."""
+    return current_app.response_class(render(), content_type=CONTENT_TYPE)
@@ -0,0 +1,34 @@
+from __future__ import annotations
+
+from flask import Blueprint, current_app, jsonify, request
+
+from ..profiling import clear_profiles, collapsed, get_profile, is_admin, list_profiles
+
+bp = Blueprint("profiles", __name__, url_prefix="/profiles")
+
+
+@bp.before_request
+def require_admin():
+    if not is_admin():
+        return jsonify({"error": "profiling requires the admin token"}), 403
+
+
+@bp.get("")
+def profiles():
+    """Stored request profiles, newest first."""
+    return jsonify(list_profiles(request.args.get("route")))
+
+
+@bp.delete("")
+def delete_profiles():
+    clear_profiles()
+    return "", 204
+
+
+@bp.get("/<profile_id>")
+def profile(profile_id: str):
+    """One profile as collapsed stacks, ready for flamegraph.pl or speedscope."""
+    entry = get_profile(profile_id)
+    if entry is None:
+        return jsonify({"error": "Profile not found"}), 404
+    return current_app.response_class(collapsed(entry), mimetype="text/plain")
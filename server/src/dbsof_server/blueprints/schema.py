@@ -1,8 +1,17 @@
 from __future__ import annotations
 
+import sqlite3
+import time
+
 from flask import Blueprint, jsonify, request
 
-from ..core import connect, sql_schema, table_schema, resolve_instance_id
+from ..advisor import record_query
+from ..core import connect_reader, shadow_tables, sql_schema, table_schema, resolve_instance_id
+from ..etags import conditional
+from ..expand import DEFAULT_DEPTH, DEFAULT_PER_PARENT, MAX_DEPTH, MAX_PER_PARENT, expand_rows, parse_expand
+from ..filters import compile_rows_query, parse_json_param, parse_order_by
+from ..metrics import record_sqlite_error
+from ..stats import DEFAULT_BINS, DEFAULT_SAMPLE_ROWS, DEFAULT_TOP_K, MAX_BINS, MAX_TOP_K, cached_table_stats
 
 bp = Blueprint(
     "schema",
@@ -12,11 +21,12 @@ bp = Blueprint(
 
 
 @bp.get("/schema")
+@conditional
 def schema(instance_id: str, db: str):
     resolved = resolve_instance_id(instance_id)
     if resolved is None:
         return jsonify({"types": [], "version": "0"}), 404
-    conn = connect(db)
+    conn = connect_reader(db)
     try:
         return jsonify(sql_schema(conn))
     finally:
@@ -24,18 +34,22 @@ def schema(instance_id: str, db: str):
 
 
 @bp.get("/tables")
+@conditional
 def tables(instance_id: str, db: str):
     resolved = resolve_instance_id(instance_id)
     if resolved is None:
         return jsonify([]), 404
-    conn = connect(db)
+    conn = connect_reader(db)
     try:
         cur = conn.execute(
             "SELECT name FROM sqlite_master WHERE type='table' AND name NOT LIKE 'sqlite_%'"
         )
+        hidden = shadow_tables(conn)
         tables = []
         for row in cur.fetchall():
             name = row["name"]
+            if name in hidden:
+                continue
             cnt = conn.execute(f"SELECT COUNT(*) as c FROM '{name}'").fetchone()[0]
             cols = table_schema(conn, name)["columns"]
             tables.append({"name": name, "rowCount": cnt, "columns": cols})
@@ -45,50 +59,106 @@ def tables(instance_id: str, db: str):
 
 
 @bp.get("/tables/<table>/schema")
+@conditional
 def table_schema_route(instance_id: str, db: str, table: str):
     resolved = resolve_instance_id(instance_id)
     if resolved is None:
         return jsonify({}), 404
-    conn = connect(db)
+    conn = connect_reader(db)
     try:
         return jsonify(table_schema(conn, table))
     finally:
         conn.close()
 
 
+@bp.get("/tables/<table>/stats")
+@conditional
+def table_stats_route(instance_id: str, db: str, table: str):
+    resolved = resolve_instance_id(instance_id)
+    if resolved is None:
+        return jsonify({}), 404
+    try:
+        sample_rows = max(int(request.args.get("sample", DEFAULT_SAMPLE_ROWS)), 0)
+        top_k = max(1, min(int(request.args.get("topK", DEFAULT_TOP_K)), MAX_TOP_K))
+        bins = max(1, min(int(request.args.get("bins", DEFAULT_BINS)), MAX_BINS))
+    except ValueError:
+        return jsonify({"error": "sample, topK and bins must be integers"}), 400
+    conn = connect_reader(db)
+    try:
+        return jsonify(cached_table_stats(conn, db, table, sample_rows, top_k, bins))
+    except LookupError as exc:
+        return jsonify({"error": str(exc)}), 404
+    finally:
+        conn.close()
+
+
 @bp.get("/tables/<table>/rows")
+@conditional
 def table_rows(instance_id: str, db: str, table: str):
     resolved = resolve_instance_id(instance_id)
     if resolved is None:
         return jsonify({}), 404
-    limit = min(int(request.args.get("limit", 100)), 500)
-    offset = max(int(request.args.get("offset", 0)), 0)
     where = request.args.get("where")
     order_by = request.args.get("orderBy")
+    filter_raw = request.args.get("filter")
+    sort_raw = request.args.get("sort")
+    try:
+        limit = min(int(request.args.get("limit", 100)), 500)
+        offset = max(int(request.args.get("offset", 0)), 0)
+        depth = min(int(request.args.get("expandDepth", DEFAULT_DEPTH)), MAX_DEPTH)
+        per_parent = max(1, min(int(request.args.get("expandLimit", DEFAULT_PER_PARENT)), MAX_PER_PARENT))
+        expand_paths = parse_expand(request.args.get("expand"), depth)
+    except ValueError as exc:
+        return jsonify({"error": str(exc)}), 400
+
+    if where:
+        return jsonify({"error": "where is no longer supported; use filter"}), 400
+    if order_by and sort_raw:
+        return jsonify({"error": "sort cannot be combined with orderBy"}), 400
 
-    conn = connect(db)
+    conn = connect_reader(db)
     try:
-        base = f"SELECT * FROM '{table}'"
-        clauses = []
-        params = []
-        if where:
-            clauses.append(f"({where})")
-        if clauses:
-            base += " WHERE " + " AND ".join(clauses)
-        if order_by:
-            base += f" ORDER BY {order_by}"
-        base += " LIMIT ? OFFSET ?"
-        params.extend([limit, offset])
+        matched = None
+        columns = [c["name"] for c in table_schema(conn, table)["columns"]]
+        if not columns:
+            return jsonify({"error": f"table not found: {table}"}), 404
+        try:
+            if order_by:
+                # legacy fragment, translated to sort terms instead of spliced into SQL
+                sort_spec = parse_order_by(order_by)
+            elif (sort_raw or "").lstrip().startswith("["):
+                sort_spec = parse_json_param(sort_raw, "sort")
+            else:
+                sort_spec = sort_raw
+            compiled = compile_rows_query(table, columns, parse_json_param(filter_raw, "filter"), sort_spec)
+        except ValueError as exc:
+            return jsonify({"error": str(exc)}), 400
+        base = compiled["sql"]
+        params = [*compiled["params"], limit, offset]
+        if filter_raw:
+            matched = conn.execute(compiled["countSql"], compiled["params"]).fetchone()[0]
+        start = time.perf_counter()
         cur = conn.execute(base, params)
         rows = cur.fetchall()
+        if filter_raw or sort_raw or order_by:
+            record_query(db, base, params, "rows", (time.perf_counter() - start) * 1000)
         columns = [d[0] for d in cur.description] if cur.description else []
         total = conn.execute(f"SELECT COUNT(*) FROM '{table}'").fetchone()[0]
-        return jsonify(
-            {
-                "columns": columns,
-                "rows": [list(r) for r in rows],
-                "total": total,
-            }
-        )
+        result = {
+            "columns": columns,
+            "rows": [list(r) for r in rows],
+            "total": total,
+        }
+        if matched is not None:
+            result["matched"] = matched
+        if expand_paths:
+            try:
+                result["expansions"] = expand_rows(conn, table, columns, rows, expand_paths, per_parent)
+            except ValueError as exc:
+                return jsonify({"error": str(exc)}), 400
+        return jsonify(result)
+    except sqlite3.OperationalError as exc:
+        record_sqlite_error(exc)
+        return jsonify({"error": str(exc)}), 400
     finally:
         conn.close()
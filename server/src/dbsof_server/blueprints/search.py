@@ -0,0 +1,65 @@
+from __future__ import annotations
+
+import sqlite3
+
+from flask import Blueprint, jsonify, request
+
+from ..core import connect_reader, resolve_instance_id, submit_write
+from ..metrics import record_sqlite_error
+from ..search import DEFAULT_LIMIT, ensure_search, fts5_available, rebuild_search, search, search_installed
+
+bp = Blueprint(
+    "search",
+    __name__,
+    url_prefix="/instances/<instance_id>/databases/<db>/search",
+)
+
+
+@bp.get("")
+def search_text(instance_id: str, db: str):
+    resolved = resolve_instance_id(instance_id)
+    if resolved is None:
+        return jsonify({"error": "instance not found"}), 404
+    query = (request.args.get("q") or "").strip()
+    if not query:
+        return jsonify({"error": "q is required"}), 400
+    tables = [t for t in (request.args.get("tables") or "").split(",") if t] or None
+    try:
+        limit = int(request.args.get("limit", DEFAULT_LIMIT))
+        offset = int(request.args.get("offset", 0))
+    except ValueError:
+        return jsonify({"error": "limit and offset must be integers"}), 400
+    raw = request.args.get("syntax") == "fts"
+
+    conn = connect_reader(db)
+    try:
+        if not fts5_available(conn):
+            return jsonify({"error": "full-text search needs SQLite built with FTS5"}), 501
+        if not search_installed(conn):
+            submit_write(db, ensure_search)
+        result = search(conn, query, tables, limit, offset, raw)
+        return jsonify(result)
+    except (ValueError, sqlite3.OperationalError) as exc:
+        record_sqlite_error(exc)
+        return jsonify({"error": str(exc)}), 400
+    finally:
+        conn.close()
+
+
+@bp.post("/rebuild")
+def rebuild_indexes(instance_id: str, db: str):
+    resolved = resolve_instance_id(instance_id)
+    if resolved is None:
+        return jsonify({"error": "instance not found"}), 404
+    conn = connect_reader(db)
+    try:
+        if not fts5_available(conn):
+            return jsonify({"error": "full-text search needs SQLite built with FTS5"}), 501
+    finally:
+        conn.close()
+    try:
+        rebuilt = submit_write(db, rebuild_search)
+    except sqlite3.OperationalError as exc:
+        record_sqlite_error(exc)
+        return jsonify({"error": str(exc)}), 400
+    return jsonify({"tables": rebuilt})
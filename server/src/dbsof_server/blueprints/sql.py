@@ -6,7 +6,9 @@ import re
 
 from flask import Blueprint, jsonify, request
 
-from ..core import QUERY_HISTORY, connect, record_history, resolve_instance_id
+from ..advisor import record_query
+from ..core import QUERY_HISTORY, connect_reader, db_path, record_history, resolve_instance_id, submit_write
+from ..metrics import record_sqlite_error
 
 bp = Blueprint(
     "sql",
@@ -14,6 +16,39 @@ bp = Blueprint(
     url_prefix="/instances/<instance_id>/databases/<db>/sql",
 )
 
+# every console statement commits on its own through the database's writer,
+# so these would end or nest inside other callers' group transactions
+TRANSACTION_CONTROL = ("begin", "commit", "end", "rollback", "savepoint", "release")
+# cannot run inside a transaction
+AUTOCOMMIT_STATEMENTS = ("vacuum",)
+LEADING_KEYWORD_RE = re.compile(r"^(?:\s+|--[^\n]*(?:\n|$)|/\*.*?\*/)*([A-Za-z]+)", re.DOTALL)
+
+
+def _leading_keyword(query: str) -> str:
+    match = LEADING_KEYWORD_RE.match(query)
+    return match.group(1).lower() if match else ""
+
+
+def _pragma_unit(db: str, query: str, params):
+    """Writer unit running a console PRAGMA on a connection of its own.
+
+    PRAGMAs change connection state, which would otherwise stick to the
+    writer every client of the database shares. Queued to the writer so the
+    throwaway connection never contends with it.
+    """
+
+    def unit(writer: sqlite3.Connection):
+        conn = sqlite3.connect(db_path(db), isolation_level=None)
+        try:
+            cur = conn.execute(query, params)
+            rows = [list(row) for row in cur.fetchall()]
+            columns = [desc[0] for desc in cur.description] if cur.description else []
+            return columns, rows
+        finally:
+            conn.close()
+
+    return unit
+
 
 @bp.post("/commands")
 def run_sql(instance_id: str, db: str):
@@ -38,7 +73,7 @@ def run_sql(instance_id: str, db: str):
     except: pass
     # #endregion
 
-    conn = connect(db)
+    conn = connect_reader(db)
     start = time.perf_counter()
     translated_query = None
     translated_params = dict(params)
@@ -122,13 +157,14 @@ def run_sql(instance_id: str, db: str):
             }), 400
     
     try:
-        cur = conn.execute(query_to_run, params)
         if query.strip().lower().startswith("select"):
+            cur = conn.execute(query_to_run, params)
             rows = cur.fetchall()
             columns = [desc[0] for desc in cur.description] if cur.description else []
             result_rows = [list(row) for row in rows]
             duration = (time.perf_counter() - start) * 1000
             record_history(db, query, duration, "OK")
+            record_query(db, query_to_run, params, "sql", duration)
             return jsonify(
                 {
                     "status": "OK",
@@ -139,20 +175,45 @@ def run_sql(instance_id: str, db: str):
                 }
             )
         else:
-            conn.commit()
+            keyword = _leading_keyword(query_to_run)
+            if keyword in TRANSACTION_CONTROL:
+                return jsonify(
+                    {"error": f"{keyword.upper()} is not supported in the console: each statement is committed on its own"}
+                ), 400
+            if keyword == "pragma":
+                columns, result_rows = submit_write(db, _pragma_unit(db, query_to_run, params), transactional=False)
+                duration = (time.perf_counter() - start) * 1000
+                record_history(db, query, duration, "OK")
+                return jsonify(
+                    {
+                        "status": "OK",
+                        "durationMs": duration,
+                        "columns": columns,
+                        "rows": result_rows,
+                        "rawText": None if mode == "tabular" else "\n".join(str(r) for r in result_rows),
+                    }
+                )
+            # queued to the database's writer thread and group-committed with concurrent writes
+            rowcount = submit_write(
+                db,
+                lambda writer: writer.execute(query_to_run, params).rowcount,
+                transactional=keyword not in AUTOCOMMIT_STATEMENTS,
+            )
             duration = (time.perf_counter() - start) * 1000
             record_history(db, query, duration, "OK")
+            record_query(db, query_to_run, params, "sql", duration)
             return jsonify(
                 {
                     "status": "OK",
                     "durationMs": duration,
                     "columns": [],
                     "rows": [],
-                    "rawText": f"{cur.rowcount} rows affected" if mode == "raw" else None,
+                    "rawText": f"{rowcount} rows affected" if mode == "raw" else None,
                 }
             )
     except sqlite3.OperationalError as exc:
         conn.rollback()
+        record_sqlite_error(exc)
         duration = (time.perf_counter() - start) * 1000
         record_history(db, query, duration, "error")
         error_msg = str(exc)
@@ -164,6 +225,7 @@ def run_sql(instance_id: str, db: str):
         return jsonify({"error": error_msg}), 400
     except Exception as exc:
         conn.rollback()
+        record_sqlite_error(exc)
         duration = (time.perf_counter() - start) * 1000
         record_history(db, query, duration, "error")
         return jsonify({"error": str(exc)}), 400
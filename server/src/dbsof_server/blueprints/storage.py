@@ -0,0 +1,72 @@
+from __future__ import annotations
+
+import sqlite3
+
+from flask import Blueprint, jsonify, request
+
+from ..core import db_path, resolve_instance_id, set_storage_profile, storage_profile
+from ..maintenance import DB_STATUS, STATUS_LOCK, inspect_file, maintain_now, status
+from ..metrics import record_sqlite_error
+from ..storage import STORAGE_PROFILES, parse_profile
+
+bp = Blueprint("storage", __name__)
+
+
+def _storage_view(db: str):
+    profile = storage_profile(db)
+    with STATUS_LOCK:
+        state = DB_STATUS.get(db)
+        maintenance = {key: value for key, value in state.items() if key != "stamp"} if state else None
+    return jsonify(
+        {
+            "profile": profile["profile"],
+            "overrides": profile["overrides"],
+            "settings": profile["settings"],
+            "profiles": STORAGE_PROFILES,
+            "file": inspect_file(db),
+            "maintenance": maintenance,
+        }
+    )
+
+
+@bp.get("/instances/<instance_id>/databases/<db>/storage")
+def get_storage(instance_id: str, db: str):
+    """The database's storage profile, its effective settings and the file's current layout."""
+    if resolve_instance_id(instance_id) is None:
+        return jsonify({"error": "instance not found"}), 404
+    if not db_path(db).exists():
+        return jsonify({"error": "database not found"}), 404
+    return _storage_view(db)
+
+
+@bp.put("/instances/<instance_id>/databases/<db>/storage")
+def put_storage(instance_id: str, db: str):
+    if resolve_instance_id(instance_id) is None:
+        return jsonify({"error": "instance not found"}), 404
+    if not db_path(db).exists():
+        return jsonify({"error": "database not found"}), 404
+    try:
+        spec = parse_profile(request.get_json(force=True, silent=True))
+        set_storage_profile(db, spec)
+    except ValueError as exc:
+        return jsonify({"error": str(exc)}), 400
+    except sqlite3.OperationalError as exc:
+        record_sqlite_error(exc)
+        return jsonify({"error": str(exc)}), 400
+    return _storage_view(db)
+
+
+@bp.post("/instances/<instance_id>/databases/<db>/maintenance")
+def run_maintenance(instance_id: str, db: str):
+    """Run the maintenance the database is due for now, instead of waiting for the scheduler."""
+    if resolve_instance_id(instance_id) is None:
+        return jsonify({"error": "instance not found"}), 404
+    if not db_path(db).exists():
+        return jsonify({"error": "database not found"}), 404
+    return jsonify(maintain_now(db))
+
+
+@bp.get("/maintenance")
+def maintenance_status():
+    """Scheduler state and the last maintenance run of every database."""
+    return jsonify(status())
@@ -0,0 +1,282 @@
+from __future__ import annotations
+
+import csv
+import io
+import json
+import re
+import sqlite3
+from decimal import Decimal, InvalidOperation
+from typing import Any, Dict, Iterable, List, Sequence, Tuple
+
+try:
+    import numpy as np
+except ImportError:  # numpy is optional; the pure-Python path is used instead
+    np = None
+
+from .core import table_schema
+
+SAMPLE_SIZE = 200
+CHUNK_SIZE = 5000
+# SQLite INTEGER range; larger values are rejected rather than wrapped or rounded
+MIN_INTEGER = -(2**63)
+MAX_INTEGER = 2**63 - 1
+
+TRUE_VALUES = ("true", "t", "yes", "y", "1")
+FALSE_VALUES = ("false", "f", "no", "n", "0")
+TIMESTAMP_RE = re.compile(
+    r"^\d{4}-\d{2}-\d{2}(?:[T ]\d{2}:\d{2}(?::\d{2}(?:\.\d+)?)?(?:Z|[+-]\d{2}:?\d{2})?)?$"
+)
+
+
+def column_affinity(declared: str | None) -> str:
+    """Map a declared column type to its SQLite affinity."""
+    decl = (declared or "").upper()
+    if "INT" in decl:
+        return "integer"
+    if "CHAR" in decl or "CLOB" in decl or "TEXT" in decl:
+        return "text"
+    if not decl or "BLOB" in decl:
+        return "blob"
+    if "REAL" in decl or "FLOA" in decl or "DOUB" in decl:
+        return "real"
+    return "numeric"
+
+
+def _is_json_container(value: str) -> bool:
+    value = value.strip()
+    return (value.startswith("{") and value.endswith("}")) or (
+        value.startswith("[") and value.endswith("]")
+    )
+
+
+def infer_column_kinds(
+    conn: sqlite3.Connection, table: str, header: Sequence[str], sample: Iterable[Sequence[str]]
+) -> Dict[str, str]:
+    """Pick a converter for each imported column from the table's declared types and a sample.
+
+    Columns the target table does not declare are mapped to ``"skip"``.
+    """
+    declared = {c["name"]: c["type"] for c in table_schema(conn, table)["columns"]}
+    sample_rows = list(sample)
+    kinds: Dict[str, str] = {}
+    for idx, name in enumerate(header):
+        if name not in declared:
+            kinds[name] = "skip"
+            continue
+        values = [row[idx].strip() for row in sample_rows if idx < len(row) and row[idx].strip()]
+        affinity = column_affinity(declared[name])
+        if affinity == "integer":
+            lowered = {v.lower() for v in values}
+            if lowered and lowered <= set(TRUE_VALUES + FALSE_VALUES) and not lowered <= {"0", "1"}:
+                kinds[name] = "boolean"
+            else:
+                kinds[name] = "integer"
+        elif affinity in ("real", "numeric"):
+            kinds[name] = "real"
+        elif affinity == "text" and values and all(_is_json_container(v) for v in values):
+            kinds[name] = "json"
+        elif affinity == "text" and values and all(TIMESTAMP_RE.match(v) for v in values):
+            kinds[name] = "timestamp"
+        else:
+            kinds[name] = "text"
+    return kinds
+
+
+def _parse_integer(value: str) -> int | None:
+    """Exact integer value of ``value`` (``"42"``, ``"4.0"``, ``"1e3"``), or None if it has none in range."""
+    try:
+        num = int(value)
+    except ValueError:
+        # never via float: it would round anything past 2**53
+        try:
+            dec = Decimal(value)
+        except InvalidOperation:
+            return None
+        # adjusted() bounds the magnitude before int() expands e.g. "1e999999999"
+        if not dec.is_finite() or dec.adjusted() > 18 or dec != dec.to_integral_value():
+            return None
+        num = int(dec)
+    return num if MIN_INTEGER <= num <= MAX_INTEGER else None
+
+
+def _convert_numeric_py(values: Sequence[str], integral: bool) -> Tuple[List[Any], List[bool]]:
+    out: List[Any] = []
+    rejected: List[bool] = []
+    for raw in values:
+        value = raw.strip()
+        if not value:
+            out.append(None)
+            rejected.append(False)
+            continue
+        if integral:
+            num = _parse_integer(value)
+            out.append(num)
+            rejected.append(num is None)
+            continue
+        try:
+            num = float(value)
+        except ValueError:
+            out.append(None)
+            rejected.append(True)
+            continue
+        if num != num or num in (float("inf"), float("-inf")):
+            out.append(None)
+            rejected.append(True)
+            continue
+        out.append(num)
+        rejected.append(False)
+    return out, rejected
+
+
+def _convert_numeric(values: Sequence[str], integral: bool) -> Tuple[List[Any], List[bool]]:
+    if np is None:
+        return _convert_numeric_py(values, integral)
+    arr = np.char.strip(np.asarray(values, dtype=str))
+    empty = arr == ""
+    try:
+        # integers parse straight to int64, which raises on overflow instead of rounding
+        nums = np.where(empty, "0", arr).astype(np.int64 if integral else np.float64)
+    except (ValueError, OverflowError):
+        # at least one cell is not a plain number; let the scalar path find which
+        return _convert_numeric_py(values, integral)
+    bad = np.zeros(len(arr), dtype=bool) if integral else ~np.isfinite(nums) & ~empty
+    converted = nums.astype(object)
+    converted[empty | bad] = None
+    return converted.tolist(), bad.tolist()
+
+
+def _convert_boolean(values: Sequence[str]) -> Tuple[List[Any], List[bool]]:
+    if np is None:
+        out: List[Any] = []
+        rejected: List[bool] = []
+        for raw in values:
+            value = raw.strip().lower()
+            if not value:
+                out.append(None)
+                rejected.append(False)
+            elif value in TRUE_VALUES:
+                out.append(1)
+                rejected.append(False)
+            elif value in FALSE_VALUES:
+                out.append(0)
+                rejected.append(False)
+            else:
+                out.append(None)
+                rejected.append(True)
+        return out, rejected
+    arr = np.char.lower(np.char.strip(np.asarray(values, dtype=str)))
+    empty = arr == ""
+    truthy = np.isin(arr, TRUE_VALUES)
+    falsy = np.isin(arr, FALSE_VALUES)
+    bad = ~(empty | truthy | falsy)
+    converted = np.where(truthy, 1, 0).astype(object)
+    converted[empty | bad] = None
+    return converted.tolist(), bad.tolist()
+
+
+def _convert_json(values: Sequence[str]) -> Tuple[List[Any], List[bool]]:
+    out: List[Any] = []
+    rejected: List[bool] = []
+    for raw in values:
+        value = raw.strip()
+        if not value:
+            out.append(None)
+            rejected.append(False)
+            continue
+        try:
+            json.loads(value)
+        except ValueError:
+            out.append(None)
+            rejected.append(True)
+            continue
+        out.append(value)
+        rejected.append(False)
+    return out, rejected
+
+
+def _convert_timestamp(values: Sequence[str]) -> Tuple[List[Any], List[bool]]:
+    out: List[Any] = []
+    rejected: List[bool] = []
+    match = TIMESTAMP_RE.match
+    for raw in values:
+        value = raw.strip()
+        if not value:
+            out.append(None)
+            rejected.append(False)
+        elif match(value):
+            out.append(value)
+            rejected.append(False)
+        else:
+            out.append(None)
+            rejected.append(True)
+    return out, rejected
+
+
+def convert_column(values: Sequence[str], kind: str) -> Tuple[List[Any], List[bool]]:
+    """Convert a whole column chunk at once, returning values and a per-cell reject mask."""
+    if kind == "integer":
+        return _convert_numeric(values, integral=True)
+    if kind == "real":
+        return _convert_numeric(values, integral=False)
+    if kind == "boolean":
+        return _convert_boolean(values)
+    if kind == "json":
+        return _convert_json(values)
+    if kind == "timestamp":
+        return _convert_timestamp(values)
+    return list(values), [False] * len(values)
+
+
+def import_csv(
+    conn: sqlite3.Connection, table: str, text: str, chunk_size: int = CHUNK_SIZE
+) -> Dict[str, Any]:
+    """Load CSV text into ``table`` column chunk by column chunk.
+
+    Rows with a rejected cell are skipped and counted against that column
+    rather than aborting the import. The caller commits.
+    """
+    reader = csv.reader(io.StringIO(text))
+    header = [h.strip() for h in next(reader, [])]
+    rows = [row for row in reader if row]
+    kinds = infer_column_kinds(conn, table, header, rows[:SAMPLE_SIZE])
+    targets = [(idx, name) for idx, name in enumerate(header) if kinds[name] != "skip"]
+    rejects = {name: 0 for _, name in targets}
+    stats: Dict[str, Any] = {
+        "table": table,
+        "rows": len(rows),
+        "inserted": 0,
+        "rejected": 0,
+        "columns": {name: {"kind": kind, "rejects": 0} for name, kind in kinds.items()},
+    }
+    if not targets:
+        stats["rejected"] = len(rows)
+        return stats
+
+    col_sql = ", ".join(f'"{name}"' for _, name in targets)
+    placeholders = ",".join("?" for _ in targets)
+    insert_sql = f'INSERT OR IGNORE INTO "{table}" ({col_sql}) VALUES ({placeholders})'
+    width = len(header)
+    for start in range(0, len(rows), chunk_size):
+        chunk = rows[start : start + chunk_size]
+        # pad short rows so the transpose keeps every column aligned
+        padded = [row if len(row) >= width else row + [""] * (width - len(row)) for row in chunk]
+        raw_columns = list(zip(*padded))
+        converted: List[List[Any]] = []
+        bad_rows = [False] * len(chunk)
+        for idx, name in targets:
+            values, rejected = convert_column(raw_columns[idx], kinds[name])
+            converted.append(values)
+            count = 0
+            for pos, flag in enumerate(rejected):
+                if flag:
+                    bad_rows[pos] = True
+                    count += 1
+            rejects[name] += count
+        good = [row for row, bad in zip(zip(*converted), bad_rows) if not bad]
+        # rowcount, not total_changes: the rollup and search triggers change rows too
+        stats["inserted"] += conn.executemany(insert_sql, good).rowcount
+        stats["rejected"] += len(chunk) - len(good)
+
+    for name, count in rejects.items():
+        stats["columns"][name]["rejects"] = count
+    return stats
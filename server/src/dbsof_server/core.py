@@ -1,12 +1,24 @@
 from __future__ import annotations
 
+import contextvars
+import hashlib
+import itertools
+import json
+import os
+import queue
 import sqlite3
-import shutil
 import threading
 import time
 import uuid
+from concurrent.futures import Future
 from pathlib import Path
-from typing import Any, Dict, List
+from typing import Any, Callable, Dict, List
+
+from .metrics import inc
+from .rollups import ROLLUP_SCRIPT, ensure_rollups
+from .search import SEARCH_SCRIPT, ensure_search
+from .sqlscript import run_script
+from .storage import META_KEY, apply_pragmas, read_profile, resolve_profile
 
 DATA_DIR = Path(__file__).resolve().parent / "data"
 DATA_DIR.mkdir(parents=True, exist_ok=True)
@@ -20,10 +32,40 @@ QUERY_HISTORY: Dict[str, List[Dict[str, Any]]] = {}
 AI_TASKS: Dict[str, Dict[str, Any]] = {}
 AI_TASK_LOCK = threading.Lock()
 AI_PROGRAMS: Dict[str, Dict[str, Any]] = {}
+AI_PROGRAM_STATE: Dict[str, Dict[str, Any]] = {}
+AI_RUNNING_TASKS: set[str] = set()
 IMPORT_JOBS: Dict[str, Dict[str, Any]] = {}
+IMPORT_FILES: Dict[str, List[Any]] = {}
 IMPORT_LOCK = threading.Lock()
 USER_SETTINGS: Dict[str, Dict[str, Any]] = {}
 USER_SETTINGS_LOCK = threading.Lock()
+BRANCH_COPIES: Dict[str, Dict[str, Any]] = {}
+LINEAGE: Dict[str, Dict[str, Any]] = {}
+LINEAGE_LOCK = threading.Lock()
+CATALOG: Dict[str, Dict[str, Any]] = {}
+CATALOG_STATE: Dict[str, Any] = {"dirMtime": None, "checkedAt": 0.0}
+CATALOG_LOCK = threading.Lock()
+CATALOG_TTL = 2.0
+BRANCH_COPY_LOCK = threading.Lock()
+TEMPLATE_LOCK = threading.Lock()
+WORKLOAD: Dict[str, Dict[str, Dict[str, Any]]] = {}
+WORKLOAD_LOCK = threading.Lock()
+PREPARED_DBS: Dict[Path, int] = {}
+PREPARE_LOCK = threading.Lock()
+READERS: Dict[str, List[sqlite3.Connection]] = {}
+READERS_LOCK = threading.Lock()
+READER_POOL_SIZE = 16  # idle read-only connections kept per database
+STORAGE: Dict[Path, Dict[str, Any]] = {}  # file -> resolved storage profile
+STORAGE_STAMPS: Dict[Path, tuple[int, ...]] = {}  # file -> data_version the profile was read at
+WRITE_CHURN: Dict[str, int] = {}  # db name -> rows changed by the writer since maintenance last looked
+
+BRANCH_COPY_MODES = ("backup", "overlay")
+DATABASE_TEMPLATES = ("ontology", "seeded")
+BACKUP_STEP_PAGES = 256
+# __meta__ keys holding each table's change token (see diff.track_changes); a
+# token describes the table's rows, so copies that do not copy the rows drop it
+CHANGE_TOKEN_PREFIX = "changes:"
+FICLONE = 0x40049409
 
 
 def db_path(db_name: str) -> Path:
@@ -38,102 +80,522 @@ def ensure_db(db_name: str) -> Path:
     if not path.exists():
         conn = sqlite3.connect(path)
         conn.execute("PRAGMA foreign_keys = ON;")
+        # before the first table, so free pages can be returned with incremental_vacuum
+        conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
         conn.execute("CREATE TABLE IF NOT EXISTS __meta__ (k TEXT PRIMARY KEY, v TEXT)")
         conn.commit()
         conn.close()
+    _prepare_db(path)
     return path
 
 
+def _prepare_db(path: Path) -> int:
+    """Switch the file to WAL, rename legacy tables and load its storage profile, once per file; returns its inode.
+
+    WAL lets the read-only readers run alongside the writer. Keyed by
+    inode so a file replaced by a branch copy or template is prepared again.
+    """
+    inode = path.stat().st_ino
+    if PREPARED_DBS.get(path) == inode:
+        return inode
+    with PREPARE_LOCK:
+        if PREPARED_DBS.get(path) != inode:
+            conn = sqlite3.connect(path)
+            conn.row_factory = sqlite3.Row
+            try:
+                conn.execute("PRAGMA journal_mode=WAL")
+                migrate_legacy_lowercase_tables(conn)
+                STORAGE[path] = read_profile(conn)
+            finally:
+                conn.close()
+            PREPARED_DBS[path] = inode
+    return inode
+
+
+class _BorrowedConnection(sqlite3.Connection):
+    """Connection lent to views through ``SHARED_CONNECTIONS``; their ``close()`` is a no-op."""
+
+    def close(self):
+        pass
+
+
+# db name -> connection, set while a batch of read-only requests shares connections
+SHARED_CONNECTIONS: contextvars.ContextVar[Dict[str, sqlite3.Connection] | None] = contextvars.ContextVar(
+    "SHARED_CONNECTIONS", default=None
+)
+
+
 def connect(db_name: str) -> sqlite3.Connection:
+    shared = SHARED_CONNECTIONS.get()
+    if shared is not None and db_name in shared:
+        return shared[db_name]
     path = ensure_db(db_name)
-    conn = sqlite3.connect(path)
+    conn = sqlite3.connect(path, factory=_BorrowedConnection if shared is not None else sqlite3.Connection)
+    inc("dbsof_sqlite_connections_opened_total", mode="rw")
     conn.row_factory = sqlite3.Row
-    migrate_legacy_lowercase_tables(conn)
+    apply_pragmas(conn, STORAGE[path]["settings"])
+    if shared is not None:
+        shared[db_name] = conn
+    return conn
+
+
+class _PooledReader(sqlite3.Connection):
+    """Read-only connection from the reader pool; ``close()`` hands it back to the pool."""
+
+    db_name = ""
+    inode = 0
+    lent = False  # held by SHARED_CONNECTIONS until the batch ends
+
+    def close(self):
+        if not self.lent:
+            _release_reader(self)
+
+
+def connect_reader(db_name: str) -> sqlite3.Connection:
+    """A pooled ``mode=ro`` connection for read-only endpoints.
+
+    Under WAL it never blocks or is blocked by the writer, and it cannot
+    write even if handed raw SQL. ``close()`` returns it to the pool.
+    """
+    key = f"{db_name}:ro"
+    shared = SHARED_CONNECTIONS.get()
+    if shared is not None and key in shared:
+        return shared[key]
+    path = ensure_db(db_name)
+    inode = PREPARED_DBS[path]
+    conn = None
+    stale: List[sqlite3.Connection] = []
+    with READERS_LOCK:
+        idle = READERS.get(db_name, [])
+        while idle and conn is None:
+            candidate = idle.pop()
+            if candidate.inode == inode:
+                conn = candidate
+            else:
+                stale.append(candidate)
+    for old in stale:
+        sqlite3.Connection.close(old)
+    if conn is None:
+        # pooled connections move between request threads, one at a time
+        conn = sqlite3.connect(f"{path.as_uri()}?mode=ro", uri=True, factory=_PooledReader, check_same_thread=False)
+        inc("dbsof_sqlite_connections_opened_total", mode="ro")
+        conn.db_name = db_name
+        conn.inode = inode
+        conn.row_factory = sqlite3.Row
+        apply_pragmas(conn, STORAGE[path]["settings"])
+    if shared is not None:
+        conn.lent = True
+        shared[key] = conn
     return conn
 
 
+def close_idle_readers(db_name: str) -> None:
+    with READERS_LOCK:
+        idle = READERS.pop(db_name, [])
+    for conn in idle:
+        sqlite3.Connection.close(conn)
+
+
+def _release_reader(conn: _PooledReader) -> None:
+    if conn.in_transaction:
+        conn.rollback()
+    conn.row_factory = sqlite3.Row
+    with READERS_LOCK:
+        idle = READERS.setdefault(conn.db_name, [])
+        if len(idle) < READER_POOL_SIZE:
+            idle.append(conn)
+            return
+    sqlite3.Connection.close(conn)
+
+
+def close_shared(shared: Dict[str, sqlite3.Connection]) -> None:
+    for conn in shared.values():
+        if isinstance(conn, _PooledReader):
+            conn.lent = False
+            _release_reader(conn)
+        else:
+            sqlite3.Connection.close(conn)
+    shared.clear()
+
+
+# Writes go through one writer thread per database, which owns the only
+# write connection and commits queued units in groups: one fsync and no
+# lock contention for a burst of small writes. Readers keep their own
+# connections and never wait on this queue.
+GROUP_COMMIT_WINDOW = 0.002  # seconds the writer waits for more units after the first
+MAX_GROUP_UNITS = 64
+WRITER_IDLE_TIMEOUT = 30.0
+WRITERS: Dict[str, "queue.Queue[Any]"] = {}
+WRITERS_LOCK = threading.Lock()
+
+
+def _open_writer(db_name: str) -> sqlite3.Connection:
+    # autocommit mode: the writer issues BEGIN/SAVEPOINT/COMMIT itself
+    path = ensure_db(db_name)
+    conn = sqlite3.connect(path, isolation_level=None)
+    inc("dbsof_sqlite_connections_opened_total", mode="writer")
+    conn.row_factory = sqlite3.Row
+    apply_pragmas(conn, STORAGE[path]["settings"])
+    return conn
+
+
+def _run_group(conn: sqlite3.Connection, group: List[Any]) -> None:
+    """Run each unit in its own savepoint inside one transaction, then commit once."""
+    done: List[Any] = []
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+    except sqlite3.Error as exc:
+        for _, future, _ in group:
+            future.set_exception(exc)
+        return
+    for item in group:
+        unit, future, _ = item
+        conn.execute("SAVEPOINT unit")
+        try:
+            result = unit(conn)
+        except BaseException as exc:
+            future.set_exception(exc)
+            if conn.in_transaction:
+                conn.execute("ROLLBACK TO unit")
+                conn.execute("RELEASE unit")
+                continue
+            # SQLite rolled back the whole transaction, taking the units before
+            # this one with it; they did nothing wrong, so they run again on their
+            # own, in order, before the rest of the group carries on
+            for earlier, _ in done:
+                _run_group(conn, [earlier])
+            done = []
+            conn.execute("BEGIN IMMEDIATE")
+        else:
+            conn.execute("RELEASE unit")
+            done.append((item, result))
+    try:
+        conn.execute("COMMIT")
+    except sqlite3.Error as exc:
+        if conn.in_transaction:
+            conn.execute("ROLLBACK")
+        for (_, future, _), _ in done:
+            future.set_exception(exc)
+        return
+    inc("dbsof_sqlite_group_commits_total")
+    inc("dbsof_sqlite_write_units_total", len(done))
+    for (_, future, _), result in done:
+        future.set_result(result)
+
+
+def _run_alone(conn: sqlite3.Connection, unit: Callable[[sqlite3.Connection], Any], future: Future) -> None:
+    """Run a unit outside any transaction, for statements such as VACUUM that cannot run inside one."""
+    try:
+        result = unit(conn)
+    except BaseException as exc:
+        if conn.in_transaction:
+            conn.execute("ROLLBACK")
+        future.set_exception(exc)
+    else:
+        future.set_result(result)
+
+
+def _writer_loop(db_name: str, units: "queue.Queue[Any]") -> None:
+    conn = None
+    try:
+        while True:
+            try:
+                group = [units.get(timeout=WRITER_IDLE_TIMEOUT)]
+            except queue.Empty:
+                with WRITERS_LOCK:
+                    # submit_write enqueues under the lock, so nothing can slip in after this check
+                    if units.empty():
+                        WRITERS.pop(db_name, None)
+                        return
+                continue
+            deadline = time.monotonic() + GROUP_COMMIT_WINDOW
+            while len(group) < MAX_GROUP_UNITS:
+                try:
+                    group.append(units.get(timeout=max(0.0, deadline - time.monotonic())))
+                except queue.Empty:
+                    break
+            group = [item for item in group if item[1].set_running_or_notify_cancel()]
+            if conn is None:
+                try:
+                    conn = _open_writer(db_name)
+                except Exception as exc:
+                    for _, future, _ in group:
+                        future.set_exception(exc)
+                    continue
+            changes = conn.total_changes
+            try:
+                for transactional, run in itertools.groupby(group, key=lambda item: item[2]):
+                    if transactional:
+                        _run_group(conn, list(run))
+                    else:
+                        for unit, future, _ in run:
+                            _run_alone(conn, unit, future)
+            except Exception as exc:
+                # the connection is in an unknown state; fail what is left and start afresh
+                for _, future, _ in group:
+                    if not future.done():
+                        future.set_exception(exc)
+                conn.close()
+                conn = None
+            else:
+                WRITE_CHURN[db_name] = WRITE_CHURN.get(db_name, 0) + conn.total_changes - changes
+    finally:
+        if conn is not None:
+            conn.close()
+
+
+def submit_write(
+    db_name: str,
+    unit: Callable[[sqlite3.Connection], Any],
+    timeout: float | None = None,
+    transactional: bool = True,
+) -> Any:
+    """Run ``unit(conn)`` on ``db_name``'s writer thread and return its result or raise its error.
+
+    The unit runs inside a savepoint of a group transaction, so it must not
+    commit or roll back itself; its changes are committed once this returns
+    (and durable as far as the profile's ``synchronous`` setting promises).
+    Return plain values, not cursors or rows. A unit runs again if another
+    unit's error rolls back the whole group, so it should only act through
+    ``conn``. ``transactional=False`` runs the unit on its own in autocommit
+    mode, for VACUUM and similar.
+    """
+    future: Future = Future()
+    with WRITERS_LOCK:
+        units = WRITERS.get(db_name)
+        if units is None:
+            units = WRITERS[db_name] = queue.Queue()
+            threading.Thread(
+                target=_writer_loop, args=(db_name, units), name=f"dbsof-writer-{db_name}", daemon=True
+            ).start()
+        units.put((unit, future, transactional))
+    return future.result(timeout)
+
+
+def storage_profile(db_name: str) -> Dict[str, Any]:
+    """The database's storage profile, re-read from ``__meta__`` whenever the file has changed.
+
+    Another worker process may have stored a new profile, and acting on a
+    stale ``page_size`` would rebuild the file back to it.
+    """
+    path = ensure_db(db_name)
+    stamp = data_version(db_name)
+    if STORAGE_STAMPS.get(path) == stamp:
+        return STORAGE[path]
+    conn = connect_reader(db_name)
+    try:
+        resolved = read_profile(conn)
+    finally:
+        conn.close()
+    if resolved != STORAGE.get(path):
+        STORAGE[path] = resolved
+        close_idle_readers(db_name)
+        submit_write(db_name, lambda writer: apply_pragmas(writer, resolved["settings"]), transactional=False)
+    STORAGE_STAMPS[path] = stamp
+    return resolved
+
+
+def set_storage_profile(db_name: str, spec: Dict[str, Any]) -> Dict[str, Any]:
+    """Store a parsed profile in ``__meta__`` and apply it to the writer and new readers.
+
+    A changed ``page_size`` only takes effect when maintenance rebuilds the file.
+    """
+    path = ensure_db(db_name)
+    resolved = resolve_profile(json.dumps(spec))
+
+    def store(conn: sqlite3.Connection) -> None:
+        conn.execute("INSERT OR REPLACE INTO __meta__ (k, v) VALUES (?, ?)", (META_KEY, json.dumps(spec)))
+        apply_pragmas(conn, resolved["settings"])
+
+    submit_write(db_name, store, transactional=False)
+    STORAGE[path] = resolved
+    close_idle_readers(db_name)
+    return resolved
+
+
+def _catalog_entry(name: str, path: Path, stamp: tuple[int, ...]) -> Dict[str, Any]:
+    conn = sqlite3.connect(path)
+    try:
+        page_count = conn.execute("PRAGMA page_count").fetchone()[0]
+        page_size = conn.execute("PRAGMA page_size").fetchone()[0]
+        table_count = conn.execute(
+            "SELECT COUNT(*) FROM sqlite_master WHERE type='table' AND name NOT LIKE 'sqlite_%' AND name != '__meta__'"
+        ).fetchone()[0]
+    finally:
+        conn.close()
+    migrations = get_database_migrations(name)
+    return {
+        "name": name,
+        "lastMigration": migrations[-1]["name"] if migrations else None,
+        "sizeBytes": stamp[1],
+        "pageCount": page_count,
+        "pageSize": page_size,
+        "tableCount": table_count,
+        "lastModified": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(max(stamp[0::2]) / 1e9)),
+        "_stamp": stamp,
+    }
+
+
+def refresh_catalog(force: bool = False):
+    """Bring the database catalog up to date.
+
+    Membership is rescanned only when the data directory's mtime changes;
+    per-file metadata is re-read at most every ``CATALOG_TTL`` seconds and
+    only for files whose ``data_version`` (file and WAL) moved.
+    """
+    with CATALOG_LOCK:
+        now = time.monotonic()
+        dir_mtime = DATA_DIR.stat().st_mtime_ns
+        membership_changed = force or dir_mtime != CATALOG_STATE["dirMtime"]
+        if not membership_changed and now - CATALOG_STATE["checkedAt"] < CATALOG_TTL:
+            return
+        if membership_changed:
+            names = {file.stem for file in DATA_DIR.glob("*.db")}
+            for stale in set(CATALOG) - names:
+                del CATALOG[stale]
+        else:
+            names = set(CATALOG)
+        for name in names:
+            path = DATA_DIR / f"{name}.db"
+            stamp = data_version(name)
+            if not stamp:
+                CATALOG.pop(name, None)
+                continue
+            entry = CATALOG.get(name)
+            if entry is None or entry["_stamp"] != stamp:
+                try:
+                    CATALOG[name] = _catalog_entry(name, path, stamp)
+                except sqlite3.DatabaseError:
+                    CATALOG.pop(name, None)
+        CATALOG_STATE["dirMtime"] = dir_mtime
+        CATALOG_STATE["checkedAt"] = now
+
+
 def list_databases() -> List[Dict[str, Any]]:
-    dbs: List[Dict[str, Any]] = []
-    for file in DATA_DIR.glob("*.db"):
-        dbs.append({"name": file.stem, "lastMigration": None})
-    if not dbs:
+    refresh_catalog()
+    with CATALOG_LOCK:
+        empty = not CATALOG
+    if empty:
         seed_target_ontology("main")
-        dbs.append({"name": "main", "lastMigration": None})
-    return dbs
+        refresh_catalog(force=True)
+    with CATALOG_LOCK:
+        return [
+            {k: v for k, v in entry.items() if not k.startswith("_")}
+            for _, entry in sorted(CATALOG.items())
+        ]
 
 
-def get_database_migrations(db_name: str, visited: set[str] | None = None) -> List[Dict[str, Any]]:
-    """Get migration history for a database."""
-    if visited is None:
-        visited = set()
-    
-    # Prevent infinite recursion
-    if db_name in visited:
-        return []
-    visited.add(db_name)
-    
-    path = db_path(db_name)
-    if not path.exists():
-        return []
-    
+def _read_lineage(path: Path, stamp: tuple[int, ...]) -> Dict[str, Any]:
     conn = sqlite3.connect(path)
-    conn.row_factory = sqlite3.Row
     try:
-        # Check for parent branch information
-        parent_branch_row = conn.execute("SELECT v FROM __meta__ WHERE k = 'parent_branch'").fetchone()
-        parent_migration_row = conn.execute("SELECT v FROM __meta__ WHERE k = 'parent_migration'").fetchone()
-        parent_branch = parent_branch_row[0] if parent_branch_row else None
-        parent_migration = parent_migration_row[0] if parent_migration_row else None
-        
-        # If this branch was created from another branch, include parent's migration history
-        migrations = []
+        meta = dict(conn.execute("SELECT k, v FROM __meta__ WHERE k IN ('parent_branch', 'parent_migration', 'seeded')").fetchall())
+        initialized = "seeded" in meta or conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type='table' AND name NOT LIKE 'sqlite_%' AND name != '__meta__' LIMIT 1"
+        ).fetchone() is not None
+    except sqlite3.OperationalError:
+        meta, initialized = {}, False
+    finally:
+        conn.close()
+    return {
+        "stamp": stamp,
+        "parent": meta.get("parent_branch"),
+        "parentMigration": meta.get("parent_migration"),
+        "initialized": initialized,
+    }
+
+
+def lineage_entry(db_name: str) -> Dict[str, Any] | None:
+    """Cached branch metadata for ``db_name``, re-read only when its ``data_version`` changes."""
+    try:
+        path = db_path(db_name)
+        stamp = data_version(db_name)
+    except ValueError:
+        stamp = ()
+    if not stamp:
+        with LINEAGE_LOCK:
+            LINEAGE.pop(db_name, None)
+        return None
+    with LINEAGE_LOCK:
+        entry = LINEAGE.get(db_name)
+    if entry is None or entry["stamp"] != stamp:
+        entry = _read_lineage(path, stamp)
+        with LINEAGE_LOCK:
+            LINEAGE[db_name] = entry
+    return entry
+
+
+def data_version(db_name: str) -> tuple[int, ...]:
+    """Cheap change stamp for ``db_name``: mtime and size of the file and its WAL, if any.
+
+    Unlike ``PRAGMA data_version`` it is comparable across connections, so
+    it can key caches that outlive the per-request connection.
+    """
+    path = db_path(db_name)
+    stamp: tuple[int, ...] = ()
+    for file in (path, path.with_name(path.name + "-wal")):
+        try:
+            st = file.stat()
+        except OSError:
+            continue
+        stamp += (st.st_mtime_ns, st.st_size)
+    return stamp
+
+
+def build_lineage_index():
+    """Load branch metadata for every database once, e.g. at startup."""
+    with LINEAGE_LOCK:
+        LINEAGE.clear()
+    for file in DATA_DIR.glob("*.db"):
+        lineage_entry(file.stem)
+
+
+def get_database_migrations(db_name: str) -> List[Dict[str, Any]]:
+    """Get migration history for a database from the lineage index, walking up its parents."""
+    chain: List[tuple[str, Dict[str, Any]]] = []
+    seen: set[str] = set()
+    name: str | None = db_name
+    while name and name not in seen:
+        seen.add(name)
+        entry = lineage_entry(name)
+        if entry is None:
+            break
+        chain.append((name, entry))
+        # only follow the parent when we know where this branch forked from it
+        name = entry["parent"] if entry["parentMigration"] else None
+
+    migrations: List[Dict[str, Any]] = []
+    for depth in range(len(chain) - 1, -1, -1):
+        name, entry = chain[depth]
         parent_migration_id = None
-        if parent_branch and parent_migration:
-            # Get parent branch's full migration history
-            parent_migrations = get_database_migrations(parent_branch, visited.copy())
-            # Include all parent migrations up to and including the point where this branch was created
-            for pm in parent_migrations:
-                migrations.append(pm)
-                if pm["name"] == parent_migration:
-                    # Found the migration point where we branched from - use its ID as parentId
+        if depth < len(chain) - 1:
+            # keep the parent's history up to and including the fork point
+            for idx, pm in enumerate(migrations):
+                if pm["name"] == entry["parentMigration"]:
                     parent_migration_id = pm["id"]
+                    del migrations[idx + 1 :]
                     break
-        
-        # Check if database has been seeded (has migrations)
-        meta = conn.execute("SELECT v FROM __meta__ WHERE k = 'seeded'").fetchone()
-        if meta:
-            # Add this branch's own migration, connected to parent if exists
-            migrations.append({
-                "id": f"{db_name}-initial",
-                "name": f"0001-{db_name}",
-                "parentId": parent_migration_id if parent_migration_id else None,
-            })
-            return migrations
-        
-        # Check if database has any tables (indicates it's been initialized)
-        tables = conn.execute(
-            "SELECT name FROM sqlite_master WHERE type='table' AND name NOT LIKE 'sqlite_%' AND name != '__meta__'"
-        ).fetchall()
-        
-        if tables:
-            # Database exists but no migration tracking - return migrations with parent connection
-            migrations.append({
-                "id": f"{db_name}-initial",
-                "name": f"0001-{db_name}",
-                "parentId": parent_migration_id if parent_migration_id else None,
-            })
-            return migrations
-        
-        # Empty database - no migrations
-        return []
-    finally:
-        conn.close()
+        else:
+            migrations = []
+        if not entry["initialized"]:
+            # an empty database has no history, whatever its parents have
+            migrations = []
+            continue
+        migrations.append({
+            "id": f"{name}-initial",
+            "name": f"0001-{name}",
+            "parentId": parent_migration_id,
+        })
+    return migrations
 
 
 def create_database(
-    db_name: str, from_branch: str | None = None, copy_data: bool = False
+    db_name: str,
+    from_branch: str | None = None,
+    copy_data: bool = False,
+    copy_mode: str = "backup",
+    template: str | None = None,
 ) -> Dict[str, Any]:
-    """Create a new database, optionally copying from an existing branch."""
+    """Create a new database, optionally copying from an existing branch or the ontology template."""
     # Validate database name
     if not db_name or not db_name.strip():
         raise ValueError("Database name is required")
@@ -158,18 +620,32 @@ def create_database(
         source_path = db_path(from_branch)
         if not source_path.exists():
             raise ValueError(f"Source branch '{from_branch}' does not exist")
-        
-        # Copy the database file
-        shutil.copy2(source_path, target_path)
-        
-        # Store parent branch information in metadata
-        conn = sqlite3.connect(target_path)
+        if copy_mode not in BRANCH_COPY_MODES:
+            raise ValueError(f"Invalid copy mode: expected one of {', '.join(BRANCH_COPY_MODES)}")
+
+        start = time.perf_counter()
+        _set_copy_progress(db_name, "running", 0, 0)
         try:
-            # Get the parent branch's last migration to establish connection
-            parent_migrations = get_database_migrations(from_branch)
-            parent_last_migration = parent_migrations[-1]["name"] if parent_migrations else None
-            
-            # Store parent branch info
+            if not copy_data:
+                # schema-only: replay the DDL instead of copying and emptying every page
+                mode = "schema"
+                _copy_schema(source_path, target_path)
+            elif copy_mode == "overlay" and _reflink(source_path, target_path):
+                mode = "overlay"
+            else:
+                mode = "backup"
+                _copy_backup(source_path, target_path, db_name)
+        except Exception:
+            _set_copy_progress(db_name, "failed", 0, 0)
+            target_path.unlink(missing_ok=True)
+            raise
+
+        # Get the parent branch's last migration to establish connection
+        parent_migrations = get_database_migrations(from_branch)
+        parent_last_migration = parent_migrations[-1]["name"] if parent_migrations else None
+
+        # Store parent branch information in metadata
+        def store_parent(conn: sqlite3.Connection) -> int:
             conn.execute(
                 "INSERT OR REPLACE INTO __meta__ (k, v) VALUES ('parent_branch', ?)",
                 (from_branch,)
@@ -179,26 +655,29 @@ def create_database(
                     "INSERT OR REPLACE INTO __meta__ (k, v) VALUES ('parent_migration', ?)",
                     (parent_last_migration,)
                 )
-            
-            if not copy_data:
-                # If only copying schema, clear all data but keep structure
-                conn.execute("PRAGMA foreign_keys = OFF;")
-                try:
-                    # Get all table names
-                    cur = conn.execute(
-                        "SELECT name FROM sqlite_master WHERE type='table' AND name NOT LIKE 'sqlite_%' AND name != '__meta__'"
-                    )
-                    tables = [row[0] for row in cur.fetchall()]
-                    
-                    # Delete all data from tables
-                    for table in tables:
-                        conn.execute(f'DELETE FROM "{table}"')
-                finally:
-                    conn.execute("PRAGMA foreign_keys = ON;")
-            
-            conn.commit()
-        finally:
-            conn.close()
+            return conn.execute("PRAGMA page_count").fetchone()[0]
+
+        pages = submit_write(db_name, store_parent)
+        lineage_entry(db_name)
+        _set_copy_progress(db_name, "completed", pages, pages)
+        return {
+            "name": db_name,
+            "lastMigration": None,
+            "copy": {"mode": mode, "pages": pages, "durationMs": (time.perf_counter() - start) * 1000},
+        }
+    elif template:
+        if template not in DATABASE_TEMPLATES:
+            raise ValueError(f"Invalid template: expected one of {', '.join(DATABASE_TEMPLATES)}")
+        start = time.perf_counter()
+        _copy_backup(ontology_template(seed=template == "seeded"), target_path, db_name)
+        progress = get_copy_progress(db_name) or {}
+        pages = progress.get("totalPages", 0)
+        _set_copy_progress(db_name, "completed", pages, pages)
+        return {
+            "name": db_name,
+            "lastMigration": None,
+            "copy": {"mode": "template", "pages": pages, "durationMs": (time.perf_counter() - start) * 1000},
+        }
     else:
         # Create empty database
         ensure_db(db_name)
@@ -206,12 +685,113 @@ def create_database(
     return {"name": db_name, "lastMigration": None}
 
 
-def seed_target_ontology(db_name: str):
-    conn = connect(db_name)
-    conn.execute("PRAGMA foreign_keys = ON;")
-    migrate_legacy_lowercase_tables(conn)
-    conn.executescript(
-        """
+def _set_copy_progress(db_name: str, status: str, copied: int, total: int):
+    with BRANCH_COPY_LOCK:
+        BRANCH_COPIES[db_name] = {
+            "status": status,
+            "copiedPages": copied,
+            "totalPages": total,
+            "updatedAt": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        }
+
+
+def get_copy_progress(db_name: str) -> Dict[str, Any] | None:
+    with BRANCH_COPY_LOCK:
+        progress = BRANCH_COPIES.get(db_name)
+        return dict(progress) if progress else None
+
+
+def _copy_schema(source_path: Path, target_path: Path):
+    """Create ``target_path`` by replaying the source's DDL; only ``__meta__`` rows are copied."""
+    src = sqlite3.connect(source_path)
+    try:
+        page_size = src.execute("PRAGMA page_size").fetchone()[0]
+        objects = src.execute(
+            """
+            SELECT type, name, sql FROM sqlite_master
+            WHERE sql IS NOT NULL AND name NOT LIKE 'sqlite_%'
+            ORDER BY CASE type WHEN 'table' THEN 0 WHEN 'index' THEN 1 WHEN 'view' THEN 2 ELSE 3 END, rowid
+            """
+        ).fetchall()
+        has_meta = any(t == "table" and n == "__meta__" for t, n, _ in objects)
+        meta = (
+            src.execute("SELECT k, v FROM __meta__ WHERE k NOT GLOB ?", (f"{CHANGE_TOKEN_PREFIX}*",)).fetchall()
+            if has_meta
+            else []
+        )
+    finally:
+        src.close()
+
+    # shadow tables are recreated by their virtual table
+    virtual = [n for t, n, sql in objects if t == "table" and sql.upper().startswith("CREATE VIRTUAL TABLE")]
+    dst = sqlite3.connect(target_path)
+    try:
+        dst.execute(f"PRAGMA page_size = {int(page_size)}")
+        for obj_type, name, sql in objects:
+            if obj_type == "table" and any(name.startswith(f"{v}_") for v in virtual):
+                continue
+            dst.execute(sql)
+        if not has_meta:
+            dst.execute("CREATE TABLE IF NOT EXISTS __meta__ (k TEXT PRIMARY KEY, v TEXT)")
+        dst.executemany("INSERT OR REPLACE INTO __meta__ (k, v) VALUES (?, ?)", meta)
+        dst.commit()
+    finally:
+        dst.close()
+
+
+def _copy_backup(source_path: Path, target_path: Path, db_name: str):
+    """Copy with the online backup API in small steps so the source is only briefly read-locked."""
+
+    def progress(status: int, remaining: int, total: int):
+        _set_copy_progress(db_name, "running", total - remaining, total)
+
+    src = sqlite3.connect(source_path)
+    dst = sqlite3.connect(target_path)
+    try:
+        src.backup(dst, pages=BACKUP_STEP_PAGES, progress=progress)
+    finally:
+        dst.close()
+        src.close()
+
+
+def _reflink(source_path: Path, target_path: Path) -> bool:
+    """Clone the source file so both branches share unchanged extents (copy-on-write).
+
+    Needs a Linux filesystem with reflink support such as btrfs or XFS;
+    returns False otherwise so the caller can fall back to a full copy.
+    """
+    try:
+        import fcntl
+    except ImportError:
+        return False
+    src = sqlite3.connect(source_path)
+    try:
+        wal = source_path.with_name(source_path.name + "-wal")
+        if src.execute("PRAGMA journal_mode").fetchone()[0].lower() == "wal":
+            # move committed pages out of the -wal file into the main file
+            src.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        # hold a shared lock so no writer can change the file mid-clone
+        src.execute("BEGIN")
+        src.execute("SELECT COUNT(*) FROM sqlite_master").fetchone()
+        if wal.exists() and wal.stat().st_size:
+            # a commit landed after the checkpoint, so the main file alone is not our snapshot
+            return False
+        with open(source_path, "rb") as s, open(target_path, "wb") as d:
+            try:
+                fcntl.ioctl(d.fileno(), FICLONE, s.fileno())
+            except OSError:
+                cloned = False
+            else:
+                cloned = True
+        if not cloned:
+            target_path.unlink(missing_ok=True)
+        return cloned
+    finally:
+        src.rollback()
+        src.close()
+
+
+ONTOLOGY_DDL = """
 CREATE TABLE IF NOT EXISTS Customer (
   id TEXT PRIMARY KEY,
   name TEXT,
@@ -343,59 +923,143 @@ CREATE TABLE IF NOT EXISTS WorkflowAction (
   executed_at TEXT
 );
 """
+
+# minimal rows inserted when the Customer table is empty
+ONTOLOGY_SEED: List[tuple[str, tuple]] = [
+    (
+        "INSERT INTO Customer (id, name, customer_type, jurisdiction, status, created_at) VALUES (?,?,?,?,?,?)",
+        ("11111111-1111-1111-1111-111111111111", "Acme Energy", "commercial", "NY", "active", "2023-01-01T00:00:00Z"),
+    ),
+    (
+        "INSERT INTO Site (id, customer_id, address, network_region, site_type, active) VALUES (?,?,?,?,?,?)",
+        ("22222222-2222-2222-2222-222222222222", "11111111-1111-1111-1111-111111111111", "123 Grid St", "North", "industrial", 1),
+    ),
+    (
+        "INSERT INTO Meter (id, site_id, meter_type, fuel_type, capabilities, install_date, status) VALUES (?,?,?,?,?,?,?)",
+        ("33333333-3333-3333-3333-333333333333", "22222222-2222-2222-2222-222222222222", "smart", "electricity", "{}", "2023-02-01", "active"),
+    ),
+    (
+        "INSERT INTO MeterRead (id, meter_id, read_type, read_timestamp, value, source, quality_flag) VALUES (?,?,?,?,?,?,?)",
+        ("44444444-4444-4444-4444-444444444444", "33333333-3333-3333-3333-333333333333", "actual", "2023-03-01T00:00:00Z", 1234.5, "device", "valid"),
+    ),
+]
+
+# bumps whenever the DDL, seed rows, rollup triggers or search indexes change, which rebuilds the template
+ONTOLOGY_VERSION = hashlib.sha256(
+    (ONTOLOGY_DDL + ROLLUP_SCRIPT + SEARCH_SCRIPT + repr(ONTOLOGY_SEED)).encode()
+).hexdigest()[:16]
+
+
+def _apply_ontology(conn: sqlite3.Connection, seed: bool = True):
+    """Run the idempotent ontology DDL in place and stamp the ontology version.
+
+    Never commits, so it can run as a writer unit; the caller commits.
+    """
+    run_script(conn, ONTOLOGY_DDL)
+    if seed:
+        # seed minimal data if empty
+        existing = conn.execute("SELECT COUNT(*) AS c FROM Customer").fetchone()[0]
+        if existing == 0:
+            for sql, params in ONTOLOGY_SEED:
+                conn.execute(sql, params)
+        conn.execute("INSERT OR REPLACE INTO __meta__ (k, v) VALUES ('seeded', 'true')")
+    conn.execute("INSERT OR REPLACE INTO __meta__ (k, v) VALUES ('ontology_version', ?)", (ONTOLOGY_VERSION,))
+    ensure_rollups(conn)
+    ensure_search(conn)
+
+
+def ontology_template(seed: bool = True) -> Path:
+    """Return the template database for the current ontology version, building it once."""
+    directory = DATA_DIR / "templates"
+    path = directory / f"ontology-{ONTOLOGY_VERSION}{'' if seed else '-schema'}.db"
+    with TEMPLATE_LOCK:
+        if path.exists():
+            return path
+        directory.mkdir(parents=True, exist_ok=True)
+        building = path.with_suffix(".building")
+        building.unlink(missing_ok=True)
+        conn = sqlite3.connect(building)
+        try:
+            conn.execute("PRAGMA foreign_keys = ON")
+            conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+            conn.execute("CREATE TABLE IF NOT EXISTS __meta__ (k TEXT PRIMARY KEY, v TEXT)")
+            _apply_ontology(conn, seed)
+            conn.commit()
+            conn.execute("VACUUM")
+        finally:
+            conn.close()
+        os.replace(building, path)
+        for stale in directory.glob("ontology-*.db"):
+            if ONTOLOGY_VERSION not in stale.name:
+                stale.unlink(missing_ok=True)
+    return path
+
+
+def _clone_template(template: Path, dst: sqlite3.Connection):
+    """Overwrite ``dst``'s database with the template via the backup API, keeping its ``__meta__`` rows.
+
+    ``dst`` is the database's writer, in autocommit mode, so nothing else
+    writes to the file while it is replaced.
+    """
+    try:
+        meta = dst.execute(
+            "SELECT k, v FROM __meta__ WHERE k != 'ontology_version' AND k NOT GLOB ?", (f"{CHANGE_TOKEN_PREFIX}*",)
+        ).fetchall()
+    except sqlite3.OperationalError:
+        meta = []
+    src = sqlite3.connect(template)
+    try:
+        src.backup(dst)
+    finally:
+        src.close()
+    dst.execute("BEGIN IMMEDIATE")
+    dst.executemany("INSERT OR REPLACE INTO __meta__ (k, v) VALUES (?, ?)", [tuple(row) for row in meta])
+    dst.execute("COMMIT")
+
+
+def _ontology_current(conn: sqlite3.Connection) -> bool:
+    meta = dict(
+        tuple(row)
+        for row in conn.execute("SELECT k, v FROM __meta__ WHERE k IN ('ontology_version', 'seeded')").fetchall()
     )
-    # seed minimal data if empty
-    existing = conn.execute("SELECT COUNT(*) AS c FROM Customer").fetchone()[0]
-    if existing == 0:
-        conn.execute(
-            "INSERT INTO Customer (id, name, customer_type, jurisdiction, status, created_at) VALUES (?,?,?,?,?,?)",
-            (
-                "11111111-1111-1111-1111-111111111111",
-                "Acme Energy",
-                "commercial",
-                "NY",
-                "active",
-                "2023-01-01T00:00:00Z",
-            ),
-        )
-        conn.execute(
-            "INSERT INTO Site (id, customer_id, address, network_region, site_type, active) VALUES (?,?,?,?,?,?)",
-            (
-                "22222222-2222-2222-2222-222222222222",
-                "11111111-1111-1111-1111-111111111111",
-                "123 Grid St",
-                "North",
-                "industrial",
-                1,
-            ),
-        )
-        conn.execute(
-            "INSERT INTO Meter (id, site_id, meter_type, fuel_type, capabilities, install_date, status) VALUES (?,?,?,?,?,?,?)",
-            (
-                "33333333-3333-3333-3333-333333333333",
-                "22222222-2222-2222-2222-222222222222",
-                "smart",
-                "electricity",
-                "{}",
-                "2023-02-01",
-                "active",
-            ),
-        )
-        conn.execute(
-            "INSERT INTO MeterRead (id, meter_id, read_type, read_timestamp, value, source, quality_flag) VALUES (?,?,?,?,?,?,?)",
-            (
-                "44444444-4444-4444-4444-444444444444",
-                "33333333-3333-3333-3333-333333333333",
-                "actual",
-                "2023-03-01T00:00:00Z",
-                1234.5,
-                "device",
-                "valid",
-            ),
-        )
-    conn.execute("INSERT OR REPLACE INTO __meta__ (k, v) VALUES ('seeded', 'true')")
-    conn.commit()
-    conn.close()
+    return meta.get("ontology_version") == ONTOLOGY_VERSION and meta.get("seeded") == "true"
+
+
+def seed_target_ontology(db_name: str):
+    """Install the ontology and minimal seed data in ``db_name``.
+
+    Databases already stamped with the current ontology version are left
+    alone, empty ones are cloned from the prebuilt template, and anything
+    else gets the idempotent DDL applied in place. The work runs on the
+    database's writer, which re-checks the stamp so concurrent calls seed once.
+    """
+    conn = connect_reader(db_name)
+    try:
+        if _ontology_current(conn):
+            return
+    finally:
+        conn.close()
+    template = ontology_template()
+
+    def seed(writer: sqlite3.Connection) -> None:
+        if _ontology_current(writer):
+            return
+        tables = writer.execute(
+            "SELECT COUNT(*) FROM sqlite_master WHERE type='table' AND name != '__meta__'"
+        ).fetchone()[0]
+        if not tables:
+            _clone_template(template, writer)
+            return
+        writer.execute("BEGIN IMMEDIATE")
+        try:
+            _apply_ontology(writer)
+        except BaseException:
+            writer.execute("ROLLBACK")
+            raise
+        writer.execute("COMMIT")
+
+    # not a group unit: the backup API cannot run inside a transaction
+    submit_write(db_name, seed, transactional=False)
 
 
 def migrate_legacy_lowercase_tables(conn: sqlite3.Connection):
@@ -468,11 +1132,26 @@ def resolve_instance_id(raw_id: str) -> str | None:
     return INSTANCE_ID if candidate in INSTANCE_ALIASES else None
 
 
+def shadow_tables(conn: sqlite3.Connection) -> set[str]:
+    """Tables a virtual table (such as an FTS5 index) keeps its data in."""
+    virtual = [
+        r[0] for r in conn.execute("SELECT name FROM sqlite_master WHERE type='table' AND sql LIKE 'CREATE VIRTUAL TABLE%'")
+    ]
+    if not virtual:
+        return set()
+    return {
+        r[0]
+        for r in conn.execute("SELECT name FROM sqlite_master WHERE type='table'")
+        if any(r[0].startswith(f"{v}_") for v in virtual)
+    }
+
+
 def sql_schema(conn: sqlite3.Connection) -> Dict[str, Any]:
     cur = conn.execute(
         "SELECT name FROM sqlite_master WHERE type='table' AND name NOT LIKE 'sqlite_%' AND name != '__meta__'"
     )
-    tables = [r["name"] for r in cur.fetchall()]
+    hidden = shadow_tables(conn)
+    tables = [r["name"] for r in cur.fetchall() if r["name"] not in hidden]
     types = []
     for table in tables:
         cols_cur = conn.execute(f"PRAGMA table_info('{table}')")
@@ -0,0 +1,326 @@
+from __future__ import annotations
+
+import hashlib
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Iterator, List, Sequence, Tuple
+
+from .core import (
+    CHANGE_TOKEN_PREFIX,
+    connect_reader,
+    data_version,
+    db_path,
+    shadow_tables,
+    sql_schema,
+    submit_write,
+    table_schema,
+)
+
+CHUNK_SIZE = 1000
+DEFAULT_ROW_LIMIT = 10_000
+HASH_CACHE_LIMIT = 100_000
+
+# chunk digests and boundaries keyed by the table's change token, so a table is
+# only rehashed after its own rows change (whole-file stamp for untracked tables)
+_HASH_CACHE: Dict[Tuple[Any, ...], Any] = {}
+_HASH_CACHE_LOCK = threading.Lock()
+TRACK_TRIGGER_PREFIX = "__diff_"
+
+Key = Tuple[Any, ...]
+
+
+class _RowHash:
+    """Order-independent digest of a set of rows: row count plus the sum of per-row hashes."""
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0
+
+    def step(self, *values):
+        digest = hashlib.blake2b(repr(values).encode(), digest_size=8).digest()
+        self.total = (self.total + int.from_bytes(digest, "big")) & 0xFFFFFFFFFFFFFFFF
+        self.count += 1
+
+    def finalize(self):
+        return f"{self.count}:{self.total:016x}"
+
+
+def _quote(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+
+def track_changes(conn: sqlite3.Connection, tables: Sequence[str]) -> None:
+    """Give each table a change token in ``__meta__`` that its triggers renew on every row change.
+
+    Tokens are random, so two databases holding the same token for a table
+    (a branch and its parent, before either touched it) hold the same rows.
+    Installing always issues a fresh token, as changes made before the
+    triggers existed were not tracked. The caller commits.
+    """
+    for table in tables:
+        for (name,) in conn.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'trigger' AND tbl_name = ? AND name GLOB ?",
+            (table, f"{TRACK_TRIGGER_PREFIX}*"),
+        ).fetchall():
+            conn.execute(f"DROP TRIGGER {_quote(name)}")
+        key = (CHANGE_TOKEN_PREFIX + table).replace("'", "''")
+        for event in ("insert", "update", "delete"):
+            conn.execute(
+                f"CREATE TRIGGER {_quote(f'{TRACK_TRIGGER_PREFIX}{table}_{event}')} AFTER {event.upper()} ON {_quote(table)} "
+                f"BEGIN UPDATE __meta__ SET v = lower(hex(randomblob(8))) WHERE k = '{key}'; END"
+            )
+        conn.execute(
+            "INSERT OR REPLACE INTO __meta__ (k, v) VALUES (?, lower(hex(randomblob(8))))", (CHANGE_TOKEN_PREFIX + table,)
+        )
+
+
+def _untracked(conn: sqlite3.Connection, tables: Sequence[str]) -> List[str]:
+    triggers = {
+        (r[0], r[1])
+        for r in conn.execute(
+            "SELECT name, tbl_name FROM sqlite_master WHERE type = 'trigger' AND name GLOB ?", (f"{TRACK_TRIGGER_PREFIX}*",)
+        )
+    }
+    tokens = _tokens(conn)
+    return [
+        table
+        for table in tables
+        if table not in tokens
+        or any((f"{TRACK_TRIGGER_PREFIX}{table}_{event}", table) not in triggers for event in ("insert", "update", "delete"))
+    ]
+
+
+def _tokens(conn: sqlite3.Connection) -> Dict[str, str]:
+    rows = conn.execute("SELECT k, v FROM __meta__ WHERE k GLOB ?", (f"{CHANGE_TOKEN_PREFIX}*",)).fetchall()
+    return {k[len(CHANGE_TOKEN_PREFIX) :]: v for k, v in rows}
+
+
+def _ensure_tracked(db_name: str) -> None:
+    conn = connect_reader(db_name)
+    try:
+        missing = _untracked(conn, sorted(_tables(conn)))
+    finally:
+        conn.close()
+    if missing:
+        try:
+            submit_write(db_name, lambda writer: track_changes(writer, missing))
+        except sqlite3.Error:
+            pass  # diffed by the whole-file stamp instead
+
+
+def _open(db_name: str) -> Tuple[sqlite3.Connection, Tuple[Any, ...], Dict[str, str]]:
+    """Read-only connection holding one snapshot, with the file stamp and the tracked tables' tokens."""
+    path = db_path(db_name)
+    # taken before opening: covers the WAL, where committed writes land first
+    stamp = data_version(db_name)
+    conn = sqlite3.connect(f"{path.as_uri()}?mode=ro", uri=True)
+    conn.row_factory = sqlite3.Row
+    conn.create_aggregate("_diff_hash", -1, _RowHash)
+    # tokens and the rows they describe must come from the same snapshot
+    conn.execute("BEGIN")
+    tracked = set(_tables(conn)) - set(_untracked(conn, sorted(_tables(conn))))
+    tokens = {table: token for table, token in _tokens(conn).items() if table in tracked}
+    return conn, (db_name, stamp), tokens
+
+
+def schema_diff(base: Dict[str, Any], target: Dict[str, Any]) -> Dict[str, Any]:
+    """Compare two ``sql_schema()`` snapshots table by table and column by column."""
+    base_tables = {t["name"]: t for t in base["types"]}
+    target_tables = {t["name"]: t for t in target["types"]}
+    changed = []
+    for name in sorted(base_tables.keys() & target_tables.keys()):
+        before = {c["name"]: c for c in base_tables[name]["columns"]}
+        after = {c["name"]: c for c in target_tables[name]["columns"]}
+        columns_changed = [
+            {"name": col, "before": before[col], "after": after[col]}
+            for col in sorted(before.keys() & after.keys())
+            if before[col] != after[col]
+        ]
+        added = sorted(after.keys() - before.keys())
+        removed = sorted(before.keys() - after.keys())
+        if added or removed or columns_changed:
+            changed.append(
+                {"name": name, "columnsAdded": added, "columnsRemoved": removed, "columnsChanged": columns_changed}
+            )
+    return {
+        "type": "schema",
+        "tablesAdded": sorted(target_tables.keys() - base_tables.keys()),
+        "tablesRemoved": sorted(base_tables.keys() - target_tables.keys()),
+        "tablesChanged": changed,
+    }
+
+
+def _tuples(conn: sqlite3.Connection) -> sqlite3.Cursor:
+    cur = conn.cursor()
+    # plain tuples: keys and rows are compared and hashed positionally
+    cur.row_factory = None
+    return cur
+
+
+def _range_clause(keys: Sequence[str], lo: Key | None, hi: Key | None) -> Tuple[str, List[Any]]:
+    cols = "(" + ", ".join(f'"{k}"' for k in keys) + ")"
+    marks = "(" + ", ".join("?" for _ in keys) + ")"
+    clauses: List[str] = []
+    params: List[Any] = []
+    if lo is not None:
+        clauses.append(f"{cols} >= {marks}")
+        params.extend(lo)
+    if hi is not None:
+        clauses.append(f"{cols} < {marks}")
+        params.extend(hi)
+    return (" WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+
+def _cached(cache_key: Tuple[Any, ...], compute) -> Any:
+    with _HASH_CACHE_LOCK:
+        cached = _HASH_CACHE.get(cache_key)
+    if cached is not None:
+        return cached
+    value = compute()
+    with _HASH_CACHE_LOCK:
+        if len(_HASH_CACHE) >= HASH_CACHE_LIMIT:
+            _HASH_CACHE.clear()
+        _HASH_CACHE[cache_key] = value
+    return value
+
+
+def _boundaries(conn: sqlite3.Connection, table: str, keys: Sequence[str], chunk_size: int) -> List[Key]:
+    """Every ``chunk_size``-th key of the table, read from the primary key index only."""
+    key_sql = ", ".join(f'"{k}"' for k in keys)
+    cur = _tuples(conn).execute(f'SELECT {key_sql} FROM "{table}" ORDER BY {key_sql}')
+    bounds: List[Key] = []
+    seen = 0
+    while True:
+        rows = cur.fetchmany(chunk_size)
+        if not rows:
+            break
+        if seen:
+            bounds.append(rows[0])
+        seen += len(rows)
+    return bounds
+
+
+def _chunk_digest(
+    conn: sqlite3.Connection,
+    version: Tuple[Any, ...],
+    table: str,
+    keys: Sequence[str],
+    columns: Sequence[str],
+    lo: Key | None,
+    hi: Key | None,
+) -> str:
+    where, params = _range_clause(keys, lo, hi)
+    col_sql = ", ".join(f'"{c}"' for c in columns)
+    return _cached(
+        ("digest", *version, tuple(keys), tuple(columns), lo, hi),
+        lambda: _tuples(conn).execute(f'SELECT _diff_hash({col_sql}) FROM "{table}"{where}', params).fetchone()[0],
+    )
+
+
+def _chunk_rows(
+    conn: sqlite3.Connection, table: str, keys: Sequence[str], columns: Sequence[str], lo: Key | None, hi: Key | None
+) -> Dict[Key, Tuple[Any, ...]]:
+    where, params = _range_clause(keys, lo, hi)
+    select = ", ".join(f'"{c}"' for c in (*keys, *columns))
+    rows = _tuples(conn).execute(f'SELECT {select} FROM "{table}"{where}', params).fetchall()
+    width = len(keys)
+    return {tuple(r[:width]): tuple(r[width:]) for r in rows}
+
+
+def _tables(conn: sqlite3.Connection) -> set:
+    # virtual tables and their shadow tables are derived from the content tables
+    names = {
+        r["name"]
+        for r in conn.execute(
+            "SELECT name FROM sqlite_master WHERE type='table' AND name NOT LIKE 'sqlite_%' AND name != '__meta__' "
+            "AND sql NOT LIKE 'CREATE VIRTUAL TABLE%'"
+        )
+    }
+    return names - shadow_tables(conn)
+
+
+def diff_databases(
+    base_name: str, target_name: str, chunk_size: int = CHUNK_SIZE, row_limit: int = DEFAULT_ROW_LIMIT
+) -> Iterator[Dict[str, Any]]:
+    """Yield the schema diff, then row-level changes per table, then a summary.
+
+    Tables whose change token is the same on both sides are identical and
+    skipped. The rest are split into primary-key ranges taken from the base
+    branch; both sides hash every range (cached per table token, so only
+    tables changed since an earlier diff are rehashed) and only ranges whose
+    digests differ are read in full and compared row by row.
+    """
+    start = time.perf_counter()
+    for name in (base_name, target_name):
+        _ensure_tracked(name)
+    base, base_stamp, base_tokens = _open(base_name)
+    target, target_stamp, target_tokens = _open(target_name)
+    totals = {"added": 0, "removed": 0, "changed": 0}
+    emitted = 0
+    truncated = False
+    try:
+        yield schema_diff(sql_schema(base), sql_schema(target))
+
+        for table in sorted(_tables(base) & _tables(target)):
+            base_info = table_schema(base, table)
+            target_info = table_schema(target, table)
+            # tables without a declared key are matched on rowid
+            keys = base_info["primaryKey"] or ["rowid"]
+            if keys != (target_info["primaryKey"] or ["rowid"]):
+                yield {"type": "table", "table": table, "skipped": "primary key differs between branches"}
+                continue
+            target_cols = {c["name"] for c in target_info["columns"]}
+            columns = [c["name"] for c in base_info["columns"] if c["name"] in target_cols and c["name"] not in keys]
+            base_version = (base_tokens[table],) if table in base_tokens else (*base_stamp, table)
+            target_version = (target_tokens[table],) if table in target_tokens else (*target_stamp, table)
+            if table in base_tokens and base_version == target_version:
+                yield {"type": "table", "table": table, "unchanged": True}
+                continue
+
+            bounds = _cached(
+                ("bounds", *base_version, tuple(keys), chunk_size),
+                lambda: _boundaries(base, table, keys, chunk_size),
+            )
+            ranges = list(zip([None, *bounds], [*bounds, None]))
+            differing = [
+                (lo, hi)
+                for lo, hi in ranges
+                if _chunk_digest(base, base_version, table, keys, columns, lo, hi)
+                != _chunk_digest(target, target_version, table, keys, columns, lo, hi)
+            ]
+            yield {"type": "table", "table": table, "chunks": len(ranges), "differingChunks": len(differing)}
+
+            for lo, hi in differing:
+                before = _chunk_rows(base, table, keys, columns, lo, hi)
+                after = _chunk_rows(target, table, keys, columns, lo, hi)
+                for key in sorted(before.keys() | after.keys(), key=repr):
+                    old, new = before.get(key), after.get(key)
+                    if old == new:
+                        continue
+                    op = "added" if old is None else "removed" if new is None else "changed"
+                    totals[op] += 1
+                    if emitted >= row_limit:
+                        truncated = True
+                        continue
+                    emitted += 1
+                    yield {
+                        "type": "row",
+                        "table": table,
+                        "op": op,
+                        "key": dict(zip(keys, key)),
+                        "before": dict(zip(columns, old)) if old is not None else None,
+                        "after": dict(zip(columns, new)) if new is not None else None,
+                    }
+
+        yield {
+            "type": "summary",
+            "base": base_name,
+            "target": target_name,
+            **totals,
+            "truncated": truncated,
+            "durationMs": (time.perf_counter() - start) * 1000,
+        }
+    finally:
+        base.close()
+        target.close()
@@ -0,0 +1,139 @@
+from __future__ import annotations
+
+import time
+import zlib
+from typing import Any, Iterable, Iterator
+
+from flask import Response, request
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # orjson is optional; the stdlib encoder is used instead
+    orjson = None
+
+MIN_COMPRESS_BYTES = 1024
+COMPRESS_LEVEL = 5
+COMPRESSIBLE_TYPES = ("application/json", "application/x-ndjson", "application/yaml", "text/")
+# content-coding -> zlib wbits
+ENCODINGS = {"gzip": 16 + zlib.MAX_WBITS, "deflate": zlib.MAX_WBITS}
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """Flask's JSON provider backed by orjson when it is installed.
+
+    Output matches the stdlib provider (sorted keys, compact outside debug)
+    except that non-ASCII text is emitted as UTF-8 rather than escaped.
+    Values orjson rejects (e.g. integers beyond 64 bits) fall back to the
+    stdlib encoder. Serialization time is reported in ``Server-Timing``.
+    """
+
+    def _orjson_options(self, indent: bool) -> int:
+        options = orjson.OPT_NON_STR_KEYS
+        if self.sort_keys:
+            options |= orjson.OPT_SORT_KEYS
+        if indent:
+            options |= orjson.OPT_INDENT_2
+        return options
+
+    def dumps(self, obj: Any, **kwargs: Any) -> str:
+        if orjson is None or kwargs:
+            return super().dumps(obj, **kwargs)
+        try:
+            return orjson.dumps(obj, default=self.default, option=self._orjson_options(False)).decode()
+        except TypeError:
+            return super().dumps(obj)
+
+    def response(self, *args: Any, **kwargs: Any) -> Response:
+        obj = self._prepare_response_obj(args, kwargs)
+        indent = (self.compact is None and self._app.debug) or self.compact is False
+        start = time.perf_counter()
+        body = None
+        if orjson is not None:
+            try:
+                body = orjson.dumps(obj, default=self.default, option=self._orjson_options(indent)) + b"\n"
+            except TypeError:
+                body = None
+        if body is None:
+            dump_args = {"indent": 2} if indent else {"separators": (",", ":")}
+            body = f"{super().dumps(obj, **dump_args)}\n".encode()
+        response = self._app.response_class(body, mimetype=self.mimetype)
+        add_timing(response, "serialize", (time.perf_counter() - start) * 1000)
+        return response
+
+
+def add_timing(response: Response, name: str, duration_ms: float) -> None:
+    metric = f"{name};dur={duration_ms:.2f}"
+    existing = response.headers.get("Server-Timing")
+    response.headers["Server-Timing"] = f"{existing}, {metric}" if existing else metric
+    response.headers["Timing-Allow-Origin"] = "*"
+
+
+def negotiate_encoding(accept_encoding: str | None) -> str | None:
+    """Pick gzip or deflate from an ``Accept-Encoding`` header, honouring q-values."""
+    best, best_q = None, 0.0
+    for item in (accept_encoding or "").split(","):
+        name, _, params = item.strip().partition(";")
+        name = name.strip().lower()
+        q = 1.0
+        for param in params.split(";"):
+            key, _, value = param.strip().partition("=")
+            if key == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        if q <= 0:
+            continue
+        candidates = ENCODINGS if name == "*" else (name,) if name in ENCODINGS else ()
+        for candidate in candidates:
+            if q > best_q or (q == best_q and candidate == "gzip"):
+                best, best_q = candidate, q
+    return best
+
+
+def _compress_stream(chunks: Iterable[bytes | str], wbits: int) -> Iterator[bytes]:
+    compressor = zlib.compressobj(COMPRESS_LEVEL, zlib.DEFLATED, wbits)
+    for chunk in chunks:
+        if isinstance(chunk, str):
+            chunk = chunk.encode()
+        if chunk:
+            # sync-flush so each streamed record reaches the client without waiting for more
+            yield compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+    yield compressor.flush()
+
+
+def compress_response(response: Response) -> Response:
+    """``after_request`` hook: gzip/deflate compressible bodies the client accepts.
+
+    Buffered bodies below ``MIN_COMPRESS_BYTES`` are left alone and larger
+    ones are compressed in one call, with the time added to
+    ``Server-Timing``. Streamed bodies are compressed chunk by chunk as
+    they are produced.
+    """
+    response.vary.add("Accept-Encoding")
+    if (
+        response.status_code < 200
+        or response.status_code in (204, 304)
+        or request.method == "HEAD"
+        or "Content-Encoding" in response.headers
+        or response.direct_passthrough
+        or not (response.mimetype or "").startswith(COMPRESSIBLE_TYPES)
+    ):
+        return response
+    encoding = negotiate_encoding(request.headers.get("Accept-Encoding"))
+    if encoding is None:
+        return response
+    if response.is_streamed:
+        response.response = _compress_stream(response.response, ENCODINGS[encoding])
+        response.headers.pop("Content-Length", None)
+    else:
+        body = response.get_data()
+        if len(body) < MIN_COMPRESS_BYTES:
+            return response
+        start = time.perf_counter()
+        compressor = zlib.compressobj(COMPRESS_LEVEL, zlib.DEFLATED, ENCODINGS[encoding])
+        response.set_data(compressor.compress(body) + compressor.flush())
+        add_timing(response, "compress", (time.perf_counter() - start) * 1000)
+    response.headers["Content-Encoding"] = encoding
+    return response
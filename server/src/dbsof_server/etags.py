@@ -0,0 +1,72 @@
+from __future__ import annotations
+
+import functools
+import hashlib
+from importlib import metadata
+from typing import Any, Callable, List
+
+from flask import current_app, request
+
+from .core import ONTOLOGY_VERSION, data_version, lineage_entry
+
+try:
+    _PACKAGE_VERSION = metadata.version("dbsof-server")
+except metadata.PackageNotFoundError:  # running from a source tree
+    _PACKAGE_VERSION = "dev"
+
+# response shapes change with the code and the ontology, not with the process,
+# so every worker of a deployment agrees on the tags
+_BOOT = f"{_PACKAGE_VERSION}-{ONTOLOGY_VERSION}"
+
+
+def _versions(db_name: str, lineage: bool) -> List[Any]:
+    versions: List[Any] = [(db_name, data_version(db_name))]
+    if lineage:
+        seen = {db_name}
+        entry = lineage_entry(db_name)
+        while entry and entry["parent"] and entry["parent"] not in seen:
+            parent = entry["parent"]
+            seen.add(parent)
+            versions.append((parent, data_version(parent)))
+            entry = lineage_entry(parent)
+    return versions
+
+
+def request_etag(db_name: str, lineage: bool = False) -> str:
+    """Tag the current request from the database's change stamp and the request's path and arguments.
+
+    Only file metadata is read, so a matching ``If-None-Match`` is answered
+    without opening the database.
+    """
+    parts = [_BOOT, request.path, sorted(request.args.items(multi=True)), _versions(db_name, lineage)]
+    return hashlib.blake2b(repr(parts).encode(), digest_size=12).hexdigest()
+
+
+def conditional(view: Callable | None = None, *, lineage: bool = False):
+    """Decorate a ``GET`` view taking ``db`` with ETag / ``If-None-Match`` handling.
+
+    ``lineage`` also folds in the parent branches, for views such as
+    migrations whose output depends on them. Tags are weak because the body
+    may be sent compressed.
+    """
+
+    def decorate(view: Callable):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            try:
+                etag = request_etag(kwargs["db"], lineage)
+            except ValueError:  # invalid database name; let the view report it
+                return view(*args, **kwargs)
+            if request.if_none_match.contains_weak(etag):
+                response = current_app.response_class(status=304)
+            else:
+                response = current_app.make_response(view(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+            response.set_etag(etag, weak=True)
+            response.headers["Cache-Control"] = "no-cache"
+            return response
+
+        return wrapper
+
+    return decorate(view) if view is not None else decorate
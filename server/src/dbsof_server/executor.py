@@ -0,0 +1,344 @@
+from __future__ import annotations
+
+import sqlite3
+import statistics
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, List, Tuple
+
+from .core import connect
+
+MAX_WORKERS = 4
+_POOL = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix="dbsof-dag")
+
+NodeHandler = Callable[[sqlite3.Connection, Dict[str, Any]], Dict[str, Any]]
+NodeUpdate = Callable[[str, str, float | None, str | None], None]
+
+# handlers are keyed by CFG node label and receive the results of finished nodes
+NODE_HANDLERS: Dict[str, NodeHandler] = {}
+
+SPIKE_Z_THRESHOLD = 3.0
+SPIKE_PCT_THRESHOLD = 0.5
+AUTO_ADJUST_CONFIDENCE = 0.8
+
+
+def node_handler(label: str):
+    def register(fn: NodeHandler) -> NodeHandler:
+        NODE_HANDLERS[label] = fn
+        return fn
+
+    return register
+
+
+def _run_node(db: str, label: str, results: Dict[str, Any]) -> Tuple[Dict[str, Any] | None, str | None, float]:
+    start = time.perf_counter()
+    conn = connect(db)
+    try:
+        handler = NODE_HANDLERS.get(label)
+        value = handler(conn, results) if handler else {}
+        return value, None, (time.perf_counter() - start) * 1000
+    except Exception as exc:
+        return None, str(exc), (time.perf_counter() - start) * 1000
+    finally:
+        conn.close()
+
+
+def run_graph(
+    db: str,
+    nodes: List[Dict[str, Any]],
+    edges: List[Dict[str, Any]],
+    on_update: NodeUpdate,
+) -> Dict[str, Any]:
+    """Execute a CFG as a DAG, running every node whose inputs are ready in parallel.
+
+    A node runs once all its predecessors are resolved and at least one
+    incoming edge was taken. Labelled edges out of a node are only taken
+    when they match the ``branch`` its handler returned; nodes left without
+    a taken incoming edge are skipped.
+    """
+    start = time.perf_counter()
+    labels = {n["id"]: n["label"] for n in nodes}
+    incoming: Dict[str, List[Dict[str, Any]]] = {n["id"]: [] for n in nodes}
+    outgoing: Dict[str, List[Dict[str, Any]]] = {n["id"]: [] for n in nodes}
+    for edge in edges:
+        outgoing[edge["from"]].append(edge)
+        incoming[edge["to"]].append(edge)
+
+    results: Dict[str, Any] = {}
+    resolved: Dict[str, str] = {}
+    taken: set[Tuple[str, str]] = set()
+    running: Dict[Future, str] = {}
+
+    def submit(node_id: str):
+        on_update(node_id, "in-progress", None, None)
+        running[_POOL.submit(_run_node, db, labels[node_id], dict(results))] = node_id
+
+    def resolve(node_id: str, status: str, value: Dict[str, Any] | None):
+        pending = [(node_id, status, value)]
+        while pending:
+            current, current_status, current_value = pending.pop()
+            resolved[current] = current_status
+            branch = (current_value or {}).get("branch")
+            for edge in outgoing[current]:
+                if current_status == "done" and (not edge.get("label") or branch is None or edge["label"] == branch):
+                    taken.add((edge["from"], edge["to"]))
+            for edge in outgoing[current]:
+                nxt = edge["to"]
+                if nxt in resolved or nxt in running.values():
+                    continue
+                if any(e["from"] not in resolved for e in incoming[nxt]):
+                    continue
+                if any((e["from"], nxt) in taken for e in incoming[nxt]):
+                    submit(nxt)
+                else:
+                    on_update(nxt, "skipped", None, None)
+                    pending.append((nxt, "skipped", None))
+
+    for node_id, preds in incoming.items():
+        if not preds:
+            submit(node_id)
+
+    while running:
+        finished, _ = wait(list(running), return_when=FIRST_COMPLETED)
+        for future in finished:
+            node_id = running.pop(future)
+            value, error, duration = future.result()
+            if error is None:
+                results[labels[node_id]] = value
+                on_update(node_id, "done", duration, None)
+                resolve(node_id, "done", value)
+            else:
+                on_update(node_id, "failed", duration, error)
+                resolve(node_id, "failed", None)
+
+    # anything never reached (e.g. cut off by a cycle) is reported as skipped
+    for node_id in labels:
+        if node_id not in resolved:
+            on_update(node_id, "skipped", None, None)
+            resolved[node_id] = "skipped"
+
+    failed = [n for n, status in resolved.items() if status == "failed"]
+    return {
+        "status": "failed" if failed else "completed",
+        "durationMs": (time.perf_counter() - start) * 1000,
+        "results": results,
+    }
+
+
+def _rows(conn: sqlite3.Connection, sql: str) -> List[Dict[str, Any]]:
+    return [dict(r) for r in conn.execute(sql).fetchall()]
+
+
+@node_handler("Start")
+def _start(conn: sqlite3.Connection, results: Dict[str, Any]) -> Dict[str, Any]:
+    return {}
+
+
+@node_handler("LoadBillingCycleData")
+def _load_billing_cycles(conn: sqlite3.Connection, results: Dict[str, Any]) -> Dict[str, Any]:
+    cycles = _rows(
+        conn,
+        "SELECT id, contract_id, period_start, period_end, status FROM BillingCycle ORDER BY period_start",
+    )
+    return {"cycles": cycles}
+
+
+@node_handler("LoadRegulations")
+def _load_regulations(conn: sqlite3.Connection, results: Dict[str, Any]) -> Dict[str, Any]:
+    rules = _rows(conn, "SELECT id, jurisdiction, rule_type, rule_text FROM RegulatoryRule")
+    return {"rules": rules}
+
+
+@node_handler("LoadHistoryAndReads")
+def _load_history(conn: sqlite3.Connection, results: Dict[str, Any]) -> Dict[str, Any]:
+    reads: Dict[str, List[Tuple[str, float, str]]] = {}
+    cur = conn.execute(
+        "SELECT meter_id, read_timestamp, value, read_type FROM MeterRead "
+        "WHERE value IS NOT NULL ORDER BY meter_id, read_timestamp"
+    )
+    for meter_id, ts, value, read_type in cur:
+        reads.setdefault(meter_id, []).append((ts, float(value), read_type))
+    return {"reads": reads}
+
+
+@node_handler("ComputeBaseline")
+def _compute_baseline(conn: sqlite3.Connection, results: Dict[str, Any]) -> Dict[str, Any]:
+    baselines: Dict[str, Dict[str, float]] = {}
+    for meter_id, reads in results["LoadHistoryAndReads"]["reads"].items():
+        history = [value for _, value, _ in reads[:-1]]
+        if not history:
+            continue
+        baselines[meter_id] = {
+            "mean": statistics.fmean(history),
+            "std": statistics.pstdev(history),
+            "count": len(history),
+        }
+    return {"baselines": baselines}
+
+
+@node_handler("DetectSpike")
+def _detect_spike(conn: sqlite3.Connection, results: Dict[str, Any]) -> Dict[str, Any]:
+    reads = results["LoadHistoryAndReads"]["reads"]
+    spikes = []
+    for meter_id, base in results["ComputeBaseline"]["baselines"].items():
+        ts, latest, read_type = reads[meter_id][-1]
+        z = (latest - base["mean"]) / base["std"] if base["std"] > 0 else 0.0
+        pct = (latest - base["mean"]) / abs(base["mean"]) if base["mean"] else 0.0
+        if z >= SPIKE_Z_THRESHOLD or pct >= SPIKE_PCT_THRESHOLD:
+            spikes.append(
+                {"meter_id": meter_id, "read_timestamp": ts, "value": latest, "zScore": z, "pctChange": pct}
+            )
+    return {"spikes": spikes, "branch": "spike" if spikes else "no spike"}
+
+
+@node_handler("ClassifyRootCause")
+def _classify_cause(conn: sqlite3.Connection, results: Dict[str, Any]) -> Dict[str, Any]:
+    reads = results["LoadHistoryAndReads"]["reads"]
+    causes = {}
+    for spike in results["DetectSpike"]["spikes"]:
+        history = reads[spike["meter_id"]]
+        previous_type = history[-2][2] if len(history) > 1 else None
+        causes[spike["meter_id"]] = (
+            "estimated_to_actual_reconciliation" if previous_type == "estimated" else "consumption_increase"
+        )
+    return {"causes": causes}
+
+
+@node_handler("ScoreConfidence")
+def _score_confidence(conn: sqlite3.Connection, results: Dict[str, Any]) -> Dict[str, Any]:
+    scores = {}
+    for spike in results["DetectSpike"]["spikes"]:
+        cause = results["ClassifyRootCause"]["causes"].get(spike["meter_id"])
+        score = 0.5 + min(abs(spike["zScore"]), 5.0) * 0.08
+        if cause == "estimated_to_actual_reconciliation":
+            score += 0.1
+        scores[spike["meter_id"]] = round(min(score, 0.99), 2)
+    return {"confidence": scores}
+
+
+@node_handler("BuildJustification")
+def _build_justification(conn: sqlite3.Connection, results: Dict[str, Any]) -> Dict[str, Any]:
+    causes = results["ClassifyRootCause"]["causes"]
+    scores = results["ScoreConfidence"]["confidence"]
+    justifications = {
+        spike["meter_id"]: (
+            f"Read of {spike['value']:.2f} is {spike['pctChange']:.0%} above baseline; "
+            f"likely {causes.get(spike['meter_id'], 'unknown').replace('_', ' ')} "
+            f"(confidence {scores.get(spike['meter_id'], 0):.2f})"
+        )
+        for spike in results["DetectSpike"]["spikes"]
+    }
+    return {"justifications": justifications}
+
+
+@node_handler("CheckRegulation")
+def _check_regulation(conn: sqlite3.Connection, results: Dict[str, Any]) -> Dict[str, Any]:
+    rules = results.get("LoadRegulations", {}).get("rules", [])
+    billing_rules = [r["id"] for r in rules if "bill" in (r.get("rule_type") or "").lower()]
+    return {"applicableRules": billing_rules or [r["id"] for r in rules]}
+
+
+@node_handler("DecidePath")
+def _decide_path(conn: sqlite3.Connection, results: Dict[str, Any]) -> Dict[str, Any]:
+    scores = results["ScoreConfidence"]["confidence"]
+    auto = bool(scores) and all(score >= AUTO_ADJUST_CONFIDENCE for score in scores.values())
+    return {"branch": "auto" if auto else "escalate"}
+
+
+@node_handler("AutoAdjust")
+def _auto_adjust(conn: sqlite3.Connection, results: Dict[str, Any]) -> Dict[str, Any]:
+    rules = results["CheckRegulation"]["applicableRules"]
+    proposals = [
+        {
+            "meter_id": spike["meter_id"],
+            "adjustment_type": "credit",
+            "reason": results["BuildJustification"]["justifications"][spike["meter_id"]],
+            "regulatory_basis": rules[0] if rules else None,
+        }
+        for spike in results["DetectSpike"]["spikes"]
+    ]
+    return {"adjustments": proposals}
+
+
+@node_handler("ComposeMessages")
+def _compose_messages(conn: sqlite3.Connection, results: Dict[str, Any]) -> Dict[str, Any]:
+    messages = [
+        f"We have applied a credit for meter {a['meter_id']}: {a['reason']}."
+        for a in results["AutoAdjust"]["adjustments"]
+    ]
+    return {"messages": messages}
+
+
+@node_handler("Escalate")
+def _escalate(conn: sqlite3.Connection, results: Dict[str, Any]) -> Dict[str, Any]:
+    return {"escalated": [s["meter_id"] for s in results["DetectSpike"]["spikes"]]}
+
+
+@node_handler("LoadComplaints")
+def _load_complaints(conn: sqlite3.Connection, results: Dict[str, Any]) -> Dict[str, Any]:
+    complaints = _rows(
+        conn, "SELECT id, customer_id, raw_text, inferred_issue, linked_exception_id, status FROM Complaint"
+    )
+    return {"complaints": complaints}
+
+
+@node_handler("LoadBillingExceptions")
+def _load_exceptions(conn: sqlite3.Connection, results: Dict[str, Any]) -> Dict[str, Any]:
+    exceptions = _rows(conn, "SELECT id, exception_type, severity, llm_classification FROM BillingException")
+    return {"exceptions": exceptions}
+
+
+@node_handler("ForEach(complaint)")
+def _for_complaint(conn: sqlite3.Connection, results: Dict[str, Any]) -> Dict[str, Any]:
+    return {"items": results["LoadComplaints"]["complaints"]}
+
+
+@node_handler("If(linked_exception)")
+def _if_linked(conn: sqlite3.Connection, results: Dict[str, Any]) -> Dict[str, Any]:
+    known = {e["id"] for e in results["LoadBillingExceptions"]["exceptions"]}
+    items = results["ForEach(complaint)"]["items"]
+    linked = [c["id"] for c in items if c["linked_exception_id"] in known]
+    unlinked = [c["id"] for c in items if c["linked_exception_id"] not in known]
+    return {"linked": linked, "unlinked": unlinked, "branch": "no" if unlinked else "yes"}
+
+
+@node_handler("LLMClassify")
+def _llm_classify(conn: sqlite3.Connection, results: Dict[str, Any]) -> Dict[str, Any]:
+    unlinked = set(results["If(linked_exception)"]["unlinked"])
+    keywords = (
+        ("estimate", "estimated_read"),
+        ("spike", "usage_spike"),
+        ("high", "usage_spike"),
+        ("tariff", "tariff_dispute"),
+        ("meter", "meter_fault"),
+    )
+    classified = {}
+    for complaint in results["ForEach(complaint)"]["items"]:
+        if complaint["id"] not in unlinked:
+            continue
+        text = (complaint["raw_text"] or "").lower()
+        classified[complaint["id"]] = next((issue for word, issue in keywords if word in text), "other")
+    return {"classified": classified}
+
+
+@node_handler("AttachWorkflow")
+def _attach_workflow(conn: sqlite3.Connection, results: Dict[str, Any]) -> Dict[str, Any]:
+    linked = results["If(linked_exception)"]["linked"]
+    classified = results.get("LLMClassify", {}).get("classified", {})
+    return {"attached": len(linked) + len(classified)}
+
+
+@node_handler("Finalize")
+def _finalize(conn: sqlite3.Connection, results: Dict[str, Any]) -> Dict[str, Any]:
+    summary: Dict[str, Any] = {"completedNodes": len(results)}
+    for label, key in (
+        ("DetectSpike", "spikes"),
+        ("AutoAdjust", "adjustments"),
+        ("Escalate", "escalated"),
+        ("LLMClassify", "classified"),
+    ):
+        if label in results:
+            summary[key] = len(results[label][key])
+    if "AttachWorkflow" in results:
+        summary["attached"] = results["AttachWorkflow"]["attached"]
+    return summary
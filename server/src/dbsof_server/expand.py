@@ -0,0 +1,160 @@
+from __future__ import annotations
+
+import json
+import sqlite3
+from typing import Any, Dict, List, Sequence, Tuple
+
+DEFAULT_DEPTH = 2
+MAX_DEPTH = 4
+DEFAULT_PER_PARENT = 20
+MAX_PER_PARENT = 200
+MAX_RELATIONS = 12
+# ``SELECT *`` leaves out the rowid, so tables keyed by it select it under this name
+ROWID_COLUMN = "__rowid"
+
+
+def parse_expand(raw: str | None, max_depth: int) -> List[List[str]]:
+    """``"customer_id,Meter.MeterRead"`` -> ``[["customer_id"], ["Meter", "MeterRead"]]``."""
+    paths = [[part.strip() for part in item.split(".")] for item in (raw or "").split(",") if item.strip()]
+    for path in paths:
+        if not all(path):
+            raise ValueError("expand paths must not contain empty segments")
+        if len(path) > max_depth:
+            raise ValueError(f"expand path {'.'.join(path)} is deeper than {max_depth}")
+    return paths
+
+
+def _trie(paths: Sequence[Sequence[str]]) -> Dict[str, Any]:
+    root: Dict[str, Any] = {}
+    for path in paths:
+        node = root
+        for name in path:
+            node = node.setdefault(name, {})
+    return root
+
+
+def _primary_key(conn: sqlite3.Connection, table: str) -> str:
+    pk = [r[1] for r in sorted(conn.execute(f"PRAGMA table_info('{table}')").fetchall(), key=lambda r: r[5]) if r[5]]
+    return pk[0] if len(pk) == 1 else "rowid"
+
+
+def _resolve(
+    conn: sqlite3.Connection, table: str, name: str, fk_cache: Dict[str, list]
+) -> Tuple[str, str, str, str]:
+    """Find relation ``name`` on ``table``: (kind, parent column, target table, target column).
+
+    A name that is one of the table's foreign-key columns follows the
+    reference; a table name (optionally ``Table:column``) follows a foreign
+    key pointing back at ``table``.
+    """
+
+    def fks(t: str) -> list:
+        if t not in fk_cache:
+            fk_cache[t] = conn.execute(f"PRAGMA foreign_key_list('{t}')").fetchall()
+        return fk_cache[t]
+
+    for fk in fks(table):
+        if fk[3] == name:
+            target = fk[2]
+            return "one", name, target, fk[4] or _primary_key(conn, target)
+    child, _, via = name.partition(":")
+    exists = conn.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name = ?", (child,)).fetchone()
+    if exists:
+        links = [fk for fk in fks(child) if fk[2] == table and (not via or fk[3] == via)]
+        if len(links) > 1:
+            columns = ", ".join(f"{child}:{fk[3]}" for fk in links)
+            raise ValueError(f"{child} references {table} more than once; use one of {columns}")
+        if links:
+            fk = links[0]
+            return "many", fk[4] or _primary_key(conn, table), child, fk[3]
+    raise ValueError(f"{table} has no relation named {name}")
+
+
+def _fetch(
+    conn: sqlite3.Connection,
+    kind: str,
+    table: str,
+    column: str,
+    keys: List[Any],
+    per_parent: int,
+    with_rowid: bool = False,
+) -> Tuple[List[str], List[tuple], bool]:
+    cur = conn.cursor()
+    cur.row_factory = None
+    selected = f"rowid AS {ROWID_COLUMN}, *" if with_rowid else "*"
+    # one bound JSON array whatever the number of keys
+    if kind == "one":
+        cur.execute(
+            f'SELECT {selected} FROM "{table}" WHERE "{column}" IN (SELECT value FROM json_each(?))', (json.dumps(keys),)
+        )
+        return [d[0] for d in cur.description], cur.fetchall(), False
+    cur.execute(
+        f"""
+        SELECT * FROM (
+          SELECT {selected}, ROW_NUMBER() OVER (PARTITION BY "{column}" ORDER BY rowid) AS __rank
+          FROM "{table}" WHERE "{column}" IN (SELECT value FROM json_each(?))
+        ) WHERE __rank <= ?
+        """,
+        (json.dumps(keys), per_parent + 1),
+    )
+    columns = [d[0] for d in cur.description][:-1]
+    rows = cur.fetchall()
+    kept = [row[:-1] for row in rows if row[-1] <= per_parent]
+    return columns, kept, len(kept) < len(rows)
+
+
+def expand_rows(
+    conn: sqlite3.Connection,
+    table: str,
+    columns: Sequence[str],
+    rows: Sequence[Sequence[Any]],
+    paths: Sequence[Sequence[str]],
+    per_parent: int = DEFAULT_PER_PARENT,
+) -> List[Dict[str, Any]]:
+    """Resolve related rows for a whole page with one batched query per relation.
+
+    Each expansion lists its rows once and ``links`` maps the parent's join
+    value to indexes into those rows, so shared parents are not repeated.
+    Reverse relations keep at most ``per_parent`` children per parent.
+    """
+    fk_cache: Dict[str, list] = {}
+    expansions: List[Dict[str, Any]] = []
+    pending = [(None, table, list(columns), list(rows), _trie(paths))]
+    while pending:
+        parent_path, parent_table, parent_columns, parent_rows, children = pending.pop(0)
+        for name, grandchildren in children.items():
+            if len(expansions) >= MAX_RELATIONS:
+                raise ValueError(f"at most {MAX_RELATIONS} relations can be expanded at once")
+            kind, parent_column, target, target_column = _resolve(conn, parent_table, name, fk_cache)
+            path = f"{parent_path}.{name}" if parent_path else name
+            parent_key = ROWID_COLUMN if parent_column == "rowid" else parent_column
+            if parent_key not in parent_columns:
+                raise ValueError(f"{path} needs column {parent_column} in the parent rows")
+            key_at = parent_columns.index(parent_key)
+            keys = list(dict.fromkeys(row[key_at] for row in parent_rows if row[key_at] is not None))
+            # nested reverse relations may join on the target's rowid too
+            with_rowid = target_column == "rowid" or bool(grandchildren) and _primary_key(conn, target) == "rowid"
+            target_columns, target_rows, truncated = _fetch(
+                conn, kind, target, target_column, keys, per_parent, with_rowid
+            )
+            links: Dict[str, List[int]] = {}
+            if target_rows:
+                link_at = target_columns.index(ROWID_COLUMN if target_column == "rowid" else target_column)
+                for idx, row in enumerate(target_rows):
+                    links.setdefault(str(row[link_at]), []).append(idx)
+            expansions.append(
+                {
+                    "path": path,
+                    "parent": parent_path,
+                    "kind": kind,
+                    "table": target,
+                    "on": {"parent": parent_column, "child": target_column},
+                    "columns": target_columns,
+                    "rows": [list(r) for r in target_rows],
+                    "links": links,
+                    "truncated": truncated,
+                }
+            )
+            if grandchildren:
+                pending.append((path, target, target_columns, target_rows, grandchildren))
+    return expansions
@@ -0,0 +1,196 @@
+from __future__ import annotations
+
+import json
+import re
+from functools import lru_cache
+from typing import Any, Dict, List, Sequence, Tuple
+
+# DSL operator -> SQL template; {c} is the quoted column
+COMPARISONS: Dict[str, str] = {
+    "eq": "{c} = ?",
+    "ne": "{c} IS NOT ?",
+    "lt": "{c} < ?",
+    "lte": "{c} <= ?",
+    "gt": "{c} > ?",
+    "gte": "{c} >= ?",
+    "like": "{c} LIKE ?",
+    "glob": "{c} GLOB ?",
+    "contains": "{c} LIKE ? ESCAPE '\\'",
+    "startsWith": "{c} LIKE ? ESCAPE '\\'",
+    "endsWith": "{c} LIKE ? ESCAPE '\\'",
+    # one parameter whatever the list length, so every IN filter shares a statement shape
+    "in": "{c} IN (SELECT value FROM json_each(?))",
+    "nin": "{c} NOT IN (SELECT value FROM json_each(?))",
+    "between": "{c} BETWEEN ? AND ?",
+    "isNull": "{c} IS NULL",
+    "notNull": "{c} IS NOT NULL",
+}
+NO_VALUE = ("isNull", "notNull")
+SORT_DIRECTIONS = ("asc", "desc")
+MAX_DEPTH = 16
+SHAPE_CACHE_SIZE = 512
+# one term of a legacy ``orderBy`` fragment: a bare or double-quoted column, direction, nulls placement
+ORDER_TERM_RE = re.compile(
+    r'^\s*(?:"((?:[^"]|"")+)"|([A-Za-z_][A-Za-z0-9_]*))(?:\s+(asc|desc))?(?:\s+nulls\s+(first|last))?\s*$',
+    re.IGNORECASE,
+)
+
+
+def _escape_like(value: Any) -> str:
+    return str(value).replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def _bind(op: str, value: Any) -> List[Any]:
+    if op in NO_VALUE:
+        return []
+    if op in ("in", "nin"):
+        if not isinstance(value, list):
+            raise ValueError(f"'{op}' needs a list value")
+        return [json.dumps(value)]
+    if op == "between":
+        if not isinstance(value, list) or len(value) != 2:
+            raise ValueError("'between' needs a [low, high] value")
+        return list(value)
+    if isinstance(value, (list, dict)):
+        raise ValueError(f"'{op}' needs a scalar value")
+    if op == "contains":
+        return [f"%{_escape_like(value)}%"]
+    if op == "startsWith":
+        return [f"{_escape_like(value)}%"]
+    if op == "endsWith":
+        return [f"%{_escape_like(value)}"]
+    return [value]
+
+
+def _split(node: Any, columns: Sequence[str], depth: int = 0) -> Tuple[Any, List[Any]]:
+    """Separate a filter tree into a hashable shape and its bound values, validating as it goes."""
+    if depth > MAX_DEPTH:
+        raise ValueError("filter is nested too deeply")
+    if isinstance(node, list):
+        node = {"and": node}
+    if not isinstance(node, dict):
+        raise ValueError("filter nodes must be objects")
+    for group in ("and", "or"):
+        if group in node:
+            children = node[group]
+            if not isinstance(children, list):
+                raise ValueError(f"'{group}' needs a list of filters")
+            shapes, values = [], []
+            for child in children:
+                shape, bound = _split(child, columns, depth + 1)
+                shapes.append(shape)
+                values.extend(bound)
+            return (group, tuple(shapes)), values
+    if "not" in node:
+        shape, values = _split(node["not"], columns, depth + 1)
+        return ("not", shape), values
+    column = node.get("column")
+    op = node.get("op", "eq")
+    if column not in columns:
+        raise ValueError(f"unknown column: {column}")
+    if op not in COMPARISONS:
+        raise ValueError(f"unknown operator: {op}")
+    return ("cmp", column, op), _bind(op, node.get("value"))
+
+
+def _where(shape: Any) -> str:
+    kind = shape[0]
+    if kind in ("and", "or"):
+        parts = [_where(child) for child in shape[1]]
+        if not parts:
+            return "1" if kind == "and" else "0"
+        return "(" + f" {kind.upper()} ".join(parts) + ")"
+    if kind == "not":
+        return f"NOT {_where(shape[1])}"
+    _, column, op = shape
+    return COMPARISONS[op].format(c=f'"{column}"')
+
+
+def parse_sort(raw: Any, columns: Sequence[str]) -> Tuple[Tuple[str, str, str | None], ...]:
+    """Accept ``[{"column", "dir", "nulls"}]`` or the shorthand ``"col,-other"``."""
+    if raw is None or raw == "":
+        return ()
+    if isinstance(raw, str):
+        raw = [
+            {"column": term.strip().lstrip("-"), "dir": "desc" if term.strip().startswith("-") else "asc"}
+            for term in raw.split(",")
+            if term.strip()
+        ]
+    if not isinstance(raw, list):
+        raise ValueError("sort must be a list")
+    terms = []
+    for term in raw:
+        if not isinstance(term, dict):
+            raise ValueError("sort terms must be objects")
+        column = term.get("column")
+        direction = str(term.get("dir", "asc")).lower()
+        nulls = term.get("nulls")
+        if column not in columns:
+            raise ValueError(f"unknown sort column: {column}")
+        if direction not in SORT_DIRECTIONS:
+            raise ValueError(f"unknown sort direction: {direction}")
+        if nulls not in (None, "first", "last"):
+            raise ValueError(f"unknown nulls placement: {nulls}")
+        terms.append((column, direction, nulls))
+    return tuple(terms)
+
+
+@lru_cache(maxsize=SHAPE_CACHE_SIZE)
+def _compile_shape(table: str, shape: Any, sort: Tuple[Tuple[str, str, str | None], ...]) -> Tuple[str, str]:
+    where = f" WHERE {_where(shape)}" if shape is not None else ""
+    order = ""
+    if sort:
+        order = " ORDER BY " + ", ".join(
+            f'"{c}" {d.upper()}' + (f" NULLS {n.upper()}" if n else "") for c, d, n in sort
+        )
+    return (
+        f'SELECT * FROM "{table}"{where}{order} LIMIT ? OFFSET ?',
+        f'SELECT COUNT(*) FROM "{table}"{where}',
+    )
+
+
+def compile_rows_query(
+    table: str, columns: Sequence[str], filter_spec: Any = None, sort_spec: Any = None
+) -> Dict[str, Any]:
+    """Compile a filter/sort spec against ``columns`` into parameterized row and count queries.
+
+    Only the shape of the filter (columns, operators, nesting) selects the
+    SQL text, so repeated grid filters with new values produce identical
+    statements and hit the compile cache and SQLite's statement cache.
+    """
+    allowed = (*columns, "rowid")
+    shape, params = _split(filter_spec, allowed) if filter_spec not in (None, {}, []) else (None, [])
+    sort = parse_sort(sort_spec, allowed)
+    select_sql, count_sql = _compile_shape(table, shape, sort)
+    return {"sql": select_sql, "countSql": count_sql, "params": params}
+
+
+def parse_json_param(raw: str | None, name: str) -> Any:
+    if raw is None or raw == "":
+        return None
+    try:
+        return json.loads(raw)
+    except ValueError:
+        raise ValueError(f"{name} must be JSON") from None
+
+
+def parse_order_by(raw: str) -> List[Dict[str, Any]]:
+    """Translate a legacy ``orderBy`` fragment (``col DESC, "other" NULLS LAST``) into sort terms.
+
+    Anything beyond columns, directions and nulls placement is rejected
+    rather than spliced into SQL; ``parse_sort`` then checks the columns.
+    """
+    terms = []
+    for part in raw.split(","):
+        match = ORDER_TERM_RE.match(part)
+        if match is None:
+            raise ValueError(f"unsupported orderBy term: {part.strip()!r}; use sort")
+        quoted, bare, direction, nulls = match.groups()
+        terms.append(
+            {
+                "column": quoted.replace('""', '"') if quoted is not None else bare,
+                "dir": (direction or "asc").lower(),
+                "nulls": nulls.lower() if nulls else None,
+            }
+        )
+    return terms
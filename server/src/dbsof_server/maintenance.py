@@ -0,0 +1,231 @@
+from __future__ import annotations
+
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List
+
+from flask import Flask
+
+from .core import (
+    CATALOG,
+    CATALOG_LOCK,
+    WRITE_CHURN,
+    close_idle_readers,
+    connect_reader,
+    data_version,
+    refresh_catalog,
+    storage_profile,
+    submit_write,
+)
+
+MAINTENANCE_INTERVAL = 300.0  # seconds between passes; DBSOF_MAINTENANCE_INTERVAL, 0 disables
+ANALYZE_CHURN = 0.1  # re-ANALYZE once this share of the analysed rows has changed
+MIN_ANALYZE_CHANGES = 1000
+ANALYSIS_LIMIT = 1000  # rows ANALYZE samples per index
+VACUUM_FREE_RATIO = 0.1  # reclaim once this share of the file is free pages
+MIN_FREE_BYTES = 1024 * 1024  # below this, free pages are not worth a pass
+VACUUM_STEP_PAGES = 1024  # pages per incremental_vacuum unit, so writes interleave
+
+SCHEDULER: Dict[str, Any] = {"pid": None, "interval": None, "passes": 0, "lastPassAt": None, "lastPassMs": None}
+DB_STATUS: Dict[str, Dict[str, Any]] = {}
+STATUS_LOCK = threading.Lock()
+# one pass at a time per process, whether scheduled or requested
+_PASS_LOCK = threading.Lock()
+
+
+def _now_iso() -> str:
+    return time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
+
+
+def inspect_file(db_name: str) -> Dict[str, Any]:
+    """Page layout and ANALYZE coverage of ``db_name``, read from a pooled reader."""
+    conn = connect_reader(db_name)
+    try:
+        pragma = {
+            name: conn.execute(f"PRAGMA {name}").fetchone()[0]
+            for name in ("page_size", "page_count", "freelist_count", "auto_vacuum", "journal_mode")
+        }
+        analyzed = None
+        if conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'sqlite_stat1'").fetchone():
+            # the first number of each table's stat row is its row count
+            rows = conn.execute("SELECT tbl, MAX(CAST(stat AS INTEGER)) FROM sqlite_stat1 GROUP BY tbl").fetchall()
+            analyzed = sum(count or 0 for _, count in rows)
+    finally:
+        conn.close()
+    return {
+        "pageSize": pragma["page_size"],
+        "pageCount": pragma["page_count"],
+        "freelistCount": pragma["freelist_count"],
+        "autoVacuum": ("none", "full", "incremental")[pragma["auto_vacuum"]],
+        "journalMode": pragma["journal_mode"],
+        "analyzedRows": analyzed,
+    }
+
+
+def _rebuild(page_size: int):
+    def rebuild(conn: sqlite3.Connection) -> None:
+        # WAL files keep their page size, so leave WAL for the VACUUM
+        if conn.execute("PRAGMA journal_mode = DELETE").fetchone()[0].lower() != "delete":
+            raise sqlite3.OperationalError("database is busy; page size change retried next pass")
+        try:
+            conn.execute(f"PRAGMA page_size = {page_size}")
+            conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+            conn.execute("VACUUM")
+        finally:
+            conn.execute("PRAGMA journal_mode = WAL").fetchall()
+
+    return rebuild
+
+
+def _vacuum(conn: sqlite3.Connection) -> None:
+    # switching auto_vacuum on an existing file only takes effect through VACUUM
+    conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+    conn.execute("VACUUM")
+
+
+def _incremental_vacuum(conn: sqlite3.Connection) -> int:
+    conn.execute(f"PRAGMA incremental_vacuum({VACUUM_STEP_PAGES})").fetchall()
+    return conn.execute("PRAGMA freelist_count").fetchone()[0]
+
+
+def _analyze(conn: sqlite3.Connection) -> None:
+    conn.execute(f"PRAGMA analysis_limit = {ANALYSIS_LIMIT}").fetchall()
+    conn.execute("ANALYZE")
+
+
+def _optimize(conn: sqlite3.Connection) -> None:
+    conn.execute("PRAGMA optimize").fetchall()
+
+
+def maintain(db_name: str) -> Dict[str, Any]:
+    """Run the maintenance ``db_name`` is due for and return its status.
+
+    Page size changes rebuild the file; a file without incremental
+    auto-vacuum gets one full VACUUM once enough of it is free, and free
+    pages are returned in steps afterwards. ANALYZE runs when the writer
+    has changed enough rows since the last one, and ``PRAGMA optimize``
+    after any change. Every step is queued to the database's writer, so it
+    never races application writes and readers carry on under WAL.
+    """
+    with STATUS_LOCK:
+        state = DB_STATUS.setdefault(
+            db_name,
+            {"stamp": None, "changesSinceAnalyze": 0, "runs": 0, "lastRunAt": None, "lastActions": [], "lastError": None},
+        )
+        state["changesSinceAnalyze"] += WRITE_CHURN.pop(db_name, 0)
+    start = time.perf_counter()
+    actions: List[str] = []
+    error = None
+    try:
+        settings = storage_profile(db_name)["settings"]
+        info = inspect_file(db_name)
+        free_ratio = info["freelistCount"] / max(info["pageCount"], 1)
+        reclaimable = info["freelistCount"] * info["pageSize"] >= MIN_FREE_BYTES
+        if info["pageSize"] != settings["page_size"]:
+            close_idle_readers(db_name)
+            submit_write(db_name, _rebuild(settings["page_size"]), transactional=False)
+            actions.append("rebuild")
+        elif reclaimable and info["autoVacuum"] != "incremental":
+            if free_ratio >= VACUUM_FREE_RATIO:
+                submit_write(db_name, _vacuum, transactional=False)
+                actions.append("vacuum")
+        elif reclaimable:
+            remaining = info["freelistCount"]
+            while remaining:
+                left = submit_write(db_name, _incremental_vacuum, transactional=False)
+                if left >= remaining:
+                    break
+                remaining = left
+            actions.append("incrementalVacuum")
+        analyzed = info["analyzedRows"]
+        changes = state["changesSinceAnalyze"]
+        if changes and (analyzed is None or changes >= max(MIN_ANALYZE_CHANGES, ANALYZE_CHURN * analyzed)):
+            submit_write(db_name, _analyze, transactional=False)
+            actions.append("analyze")
+            state["changesSinceAnalyze"] = 0
+            state["lastAnalyzeAt"] = _now_iso()
+        if actions or data_version(db_name) != state["stamp"]:
+            submit_write(db_name, _optimize, transactional=False)
+            actions.append("optimize")
+    except (sqlite3.Error, OSError, ValueError) as exc:
+        error = str(exc)
+    with STATUS_LOCK:
+        state.update(
+            {
+                # taken after our own changes so they do not count as new activity
+                "stamp": data_version(db_name),
+                "runs": state["runs"] + 1,
+                "lastRunAt": _now_iso(),
+                "lastDurationMs": round((time.perf_counter() - start) * 1000, 3),
+                "lastActions": actions,
+                "lastError": error,
+            }
+        )
+        if "vacuum" in actions or "rebuild" in actions or "incrementalVacuum" in actions:
+            state["lastVacuumAt"] = state["lastRunAt"]
+        result = {key: value for key, value in state.items() if key != "stamp"}
+    if error is None:
+        try:
+            result["file"] = inspect_file(db_name)
+        except sqlite3.Error:
+            pass
+    return result
+
+
+def run_pass() -> None:
+    """Maintain every database in the catalog."""
+    with _PASS_LOCK:
+        start = time.perf_counter()
+        refresh_catalog()
+        with CATALOG_LOCK:
+            names = sorted(CATALOG)
+        for name in names:
+            maintain(name)
+        with STATUS_LOCK:
+            SCHEDULER["passes"] += 1
+            SCHEDULER["lastPassAt"] = _now_iso()
+            SCHEDULER["lastPassMs"] = round((time.perf_counter() - start) * 1000, 3)
+
+
+def maintain_now(db_name: str) -> Dict[str, Any]:
+    with _PASS_LOCK:
+        return maintain(db_name)
+
+
+def status() -> Dict[str, Any]:
+    with STATUS_LOCK:
+        return {
+            "scheduler": {key: value for key, value in SCHEDULER.items() if key != "pid"},
+            "databases": {
+                name: {key: value for key, value in state.items() if key != "stamp"} for name, state in DB_STATUS.items()
+            },
+        }
+
+
+def _scheduler_loop(interval: float) -> None:
+    while True:
+        time.sleep(interval)
+        try:
+            run_pass()
+        except Exception as exc:  # keep the scheduler alive; the error shows in the status
+            with STATUS_LOCK:
+                SCHEDULER["lastError"] = str(exc)
+
+
+def init_app(app: Flask) -> None:
+    """Start the maintenance scheduler with the first request of each worker process."""
+    interval = float(app.config.get("MAINTENANCE_INTERVAL", MAINTENANCE_INTERVAL))
+
+    @app.before_request
+    def _start_scheduler():
+        # threads do not survive a pre-fork, so check the pid rather than a flag
+        if interval <= 0 or SCHEDULER["pid"] == os.getpid():
+            return
+        with STATUS_LOCK:
+            if SCHEDULER["pid"] == os.getpid():
+                return
+            SCHEDULER["pid"] = os.getpid()
+            SCHEDULER["interval"] = interval
+        threading.Thread(target=_scheduler_loop, args=(interval,), name="dbsof-maintenance", daemon=True).start()
@@ -0,0 +1,196 @@
+from __future__ import annotations
+
+import sqlite3
+import threading
+import time
+import weakref
+from bisect import bisect_left
+from typing import Any, Callable, Dict, Iterable, List, Tuple
+
+from flask import Flask, g, request
+
+# seconds; the Prometheus client defaults
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# name -> (type, help)
+METRICS: Dict[str, Tuple[str, str]] = {
+    "dbsof_http_requests_total": ("counter", "HTTP requests by blueprint, route, method and status."),
+    "dbsof_http_request_duration_seconds": ("histogram", "Time to produce response headers, by route."),
+    "dbsof_http_requests_in_flight": ("gauge", "Requests currently being handled, by blueprint."),
+    "dbsof_sqlite_connections_opened_total": ("counter", "SQLite connections opened, by mode (rw, pooled ro reader, writer)."),
+    "dbsof_sqlite_errors_total": ("counter", "SQLite busy/locked errors seen while handling requests."),
+    "dbsof_sqlite_group_commits_total": ("counter", "Transactions committed by the per-database writers."),
+    "dbsof_sqlite_write_units_total": ("counter", "Write units committed in group transactions by the per-database writers."),
+}
+
+Labels = Tuple[Tuple[str, str], ...]
+
+# Every thread records into its own shard, so the hot path takes no lock;
+# a scrape sums the shards. When a thread exits its shard is folded into
+# ``_base`` and dropped, so counters stay monotonic under thread-per-request
+# servers without the shard list growing.
+_local = threading.local()
+_shards: List[Dict[Tuple[str, Labels], Any]] = []
+_base: Dict[Tuple[str, Labels], Any] = {}
+_shards_lock = threading.Lock()
+
+_gauge_callbacks: List[Callable[[], Iterable[Tuple[str, Dict[str, str], float]]]] = []
+
+
+class _Owner:
+    """Lives in the thread-local next to a shard; collected when its thread exits."""
+
+    __slots__ = ("__weakref__",)
+
+
+def _fold(into: Dict[Tuple[str, Labels], Any], shard: Dict[Tuple[str, Labels], Any]) -> None:
+    # a dict copy is atomic under the GIL even while its thread keeps writing
+    for key, value in shard.copy().items():
+        if isinstance(value, list):
+            total = into.setdefault(key, [0] * len(value))
+            for index, part in enumerate(value):
+                total[index] += part
+        else:
+            into[key] = into.get(key, 0) + value
+
+
+def _retire(shard: Dict[Tuple[str, Labels], Any]) -> None:
+    with _shards_lock:
+        _fold(_base, shard)
+        _shards.remove(shard)
+
+
+def _shard() -> Dict[Tuple[str, Labels], Any]:
+    shard = getattr(_local, "shard", None)
+    if shard is None:
+        shard = _local.shard = {}
+        _local.owner = _Owner()
+        with _shards_lock:
+            _shards.append(shard)
+        weakref.finalize(_local.owner, _retire, shard)
+    return shard
+
+
+def inc(name: str, value: float = 1, **labels: str) -> None:
+    shard = _shard()
+    key = (name, tuple(sorted(labels.items())))
+    shard[key] = shard.get(key, 0) + value
+
+
+def observe(name: str, value: float, **labels: str) -> None:
+    shard = _shard()
+    key = (name, tuple(sorted(labels.items())))
+    state = shard.get(key)
+    if state is None:
+        # per-bucket counts (last is +Inf), then sum
+        state = shard[key] = [0] * (len(LATENCY_BUCKETS) + 1) + [0.0]
+    state[bisect_left(LATENCY_BUCKETS, value)] += 1
+    state[-1] += value
+
+
+def register_gauge(name: str, help_text: str, callback: Callable[[], Iterable[Tuple[Dict[str, str], float]]]) -> None:
+    """Add a gauge computed at scrape time; ``callback`` yields ``(labels, value)`` pairs."""
+    METRICS[name] = ("gauge", help_text)
+    _gauge_callbacks.append(lambda: ((name, labels, value) for labels, value in callback()))
+
+
+def record_sqlite_error(exc: BaseException) -> None:
+    """Count ``exc`` if SQLite reported it as busy or locked."""
+    if not isinstance(exc, sqlite3.Error):
+        return
+    code = getattr(exc, "sqlite_errorname", None) or ""
+    if not code:
+        # "database is locked" is SQLITE_BUSY; "database table is locked" is SQLITE_LOCKED
+        message = str(exc).lower()
+        if "table is locked" in message:
+            code = "SQLITE_LOCKED"
+        elif "busy" in message or "locked" in message:
+            code = "SQLITE_BUSY"
+    if code.startswith(("SQLITE_BUSY", "SQLITE_LOCKED")):
+        inc("dbsof_sqlite_errors_total", code=code)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labels: Iterable[Tuple[str, str]]) -> str:
+    parts = [f'{key}="{_escape(str(value))}"' for key, value in labels]
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def render() -> str:
+    """Render every metric in the Prometheus text exposition format."""
+    merged: Dict[Tuple[str, Labels], Any] = {}
+    # under the lock, so a retiring shard is counted either in its own right or in _base
+    with _shards_lock:
+        _fold(merged, _base)
+        for shard in _shards:
+            _fold(merged, shard)
+    for callback in list(_gauge_callbacks):
+        for name, labels, value in callback():
+            merged[(name, tuple(sorted(labels.items())))] = value
+
+    lines: List[str] = []
+    for name, (kind, help_text) in sorted(METRICS.items()):
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+        for (metric, labels), value in sorted(merged.items()):
+            if metric != name:
+                continue
+            if kind != "histogram":
+                lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+                continue
+            cumulative = 0
+            for bound, count in zip(LATENCY_BUCKETS + (float("inf"),), value[:-1]):
+                cumulative += count
+                bucket_labels = labels + (("le", _format_value(float(bound))),)
+                lines.append(f"{name}_bucket{_format_labels(bucket_labels)} {cumulative}")
+            lines.append(f"{name}_sum{_format_labels(labels)} {_format_value(value[-1])}")
+            lines.append(f"{name}_count{_format_labels(labels)} {cumulative}")
+    return "\n".join(lines) + "\n"
+
+
+def _route() -> Tuple[str, str]:
+    rule = request.url_rule
+    return request.blueprint or "", rule.rule if rule is not None else "unmatched"
+
+
+def init_app(app: Flask) -> None:
+    """Record request counts, latency and in-flight requests for every route of ``app``."""
+
+    @app.before_request
+    def _start_timer():
+        g.metrics_start = time.perf_counter()
+        g.metrics_blueprint = request.blueprint or ""
+        inc("dbsof_http_requests_in_flight", blueprint=g.metrics_blueprint)
+
+    @app.after_request
+    def _record_request(response):
+        start = g.pop("metrics_start", None)
+        if start is not None:
+            blueprint, route = _route()
+            observe("dbsof_http_request_duration_seconds", time.perf_counter() - start, blueprint=blueprint, route=route)
+            inc(
+                "dbsof_http_requests_total",
+                blueprint=blueprint,
+                route=route,
+                method=request.method,
+                status=str(response.status_code),
+            )
+        return response
+
+    @app.teardown_request
+    def _end_request(exc):
+        blueprint = g.pop("metrics_blueprint", None)
+        if blueprint is not None:
+            inc("dbsof_http_requests_in_flight", -1, blueprint=blueprint)
+        if exc is not None:
+            record_sqlite_error(exc)
@@ -0,0 +1,250 @@
+from __future__ import annotations
+
+import itertools
+import sys
+import threading
+import time
+import uuid
+from collections import Counter, OrderedDict
+from typing import Any, Dict, List
+
+from flask import Flask, current_app, g, request
+
+MODES = ("sample", "trace")
+SAMPLE_INTERVAL = 0.001  # seconds between stack samples
+PROFILE_STORE_SIZE = 200
+PROFILE_HEADER = "X-Dbsof-Profile"
+TOKEN_HEADER = "X-Dbsof-Admin-Token"
+LOOPBACK = ("127.0.0.1", "::1")
+FORWARDED_HEADERS = ("Forwarded", "X-Forwarded-For", "X-Real-IP")
+
+# id -> profile, oldest first
+PROFILES: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+PROFILE_LOCK = threading.Lock()
+
+_route_counters: Dict[str, Any] = {}
+
+# thread id -> (stacks, frames to drop from the outermost end)
+_sampled: Dict[int, Any] = {}
+_sampler_lock = threading.Lock()
+_sampler: threading.Thread | None = None
+
+
+def _label(frame) -> str:
+    code = frame.f_code
+    # co_qualname is new in 3.11; older interpreters only have the bare name
+    name = f"{frame.f_globals.get('__name__', '?')}:{getattr(code, 'co_qualname', code.co_name)}"
+    return name.replace(";", ",")
+
+
+def _builtin_label(func) -> str:
+    owner = getattr(func, "__self__", None)
+    module = getattr(func, "__module__", None) or type(owner).__module__
+    return f"{module}:{getattr(func, '__qualname__', repr(func))}".replace(";", ",")
+
+
+def _depth(frame) -> int:
+    depth = 0
+    while frame is not None:
+        depth += 1
+        frame = frame.f_back
+    return depth
+
+
+def _dispatch_depth(frame) -> int:
+    """Depth of the frames below Flask's request dispatch, so samples omit the server's own stack."""
+    target = Flask.full_dispatch_request.__code__
+    probe = frame
+    while probe is not None:
+        if probe.f_code is target:
+            return _depth(probe)
+        probe = probe.f_back
+    return 0
+
+
+def _sample_loop():
+    global _sampler
+    while True:
+        with _sampler_lock:
+            if not _sampled:
+                _sampler = None
+                return
+            targets = dict(_sampled)
+        frames = sys._current_frames()
+        for thread_id, (stacks, skip) in targets.items():
+            frame = frames.get(thread_id)
+            labels: List[str] = []
+            while frame is not None:
+                labels.append(_label(frame))
+                frame = frame.f_back
+            labels.reverse()
+            if labels[skip:]:
+                stacks[";".join(labels[skip:])] += 1
+        del frames
+        time.sleep(SAMPLE_INTERVAL)
+
+
+class _Tracer:
+    """Deterministic profiler: every Python and C call, weighted by self time in microseconds."""
+
+    def __init__(self):
+        self.stacks: Counter = Counter()
+        self.names: List[str] = []
+        # per open call: [start, time spent in children]
+        self.timings: List[List[float]] = []
+
+    def __call__(self, frame, event, arg):
+        now = time.perf_counter()
+        if event in ("call", "c_call"):
+            self.names.append(_label(frame) if event == "call" else _builtin_label(arg))
+            self.timings.append([now, 0.0])
+        elif self.names and event in ("return", "c_return", "c_exception"):
+            start, children = self.timings.pop()
+            elapsed = now - start
+            self.stacks[";".join(self.names)] += int((elapsed - children) * 1e6)
+            self.names.pop()
+            if self.timings:
+                self.timings[-1][1] += elapsed
+
+    def close(self):
+        """Stop and credit the calls still open (the hooks that stopped it) with their time so far."""
+        sys.setprofile(None)
+        while self.names:
+            self("", "c_return", None)
+
+
+def _start(mode: str) -> Dict[str, Any]:
+    global _sampler
+    profile = {"mode": mode, "stacks": Counter(), "start": time.perf_counter()}
+    if mode == "trace":
+        tracer = profile["tracer"] = _Tracer()
+        profile["stacks"] = tracer.stacks
+        sys.setprofile(tracer)
+        return profile
+    with _sampler_lock:
+        _sampled[threading.get_ident()] = (profile["stacks"], _dispatch_depth(sys._getframe()))
+        if _sampler is None:
+            _sampler = threading.Thread(target=_sample_loop, name="dbsof-profiler", daemon=True)
+            _sampler.start()
+    return profile
+
+
+def _stop(profile: Dict[str, Any]) -> None:
+    if profile["mode"] == "trace":
+        profile["tracer"].close()
+    else:
+        with _sampler_lock:
+            _sampled.pop(threading.get_ident(), None)
+
+
+def is_admin() -> bool:
+    """Whether the request may profile: it carries the configured admin token, or comes from loopback if none is set.
+
+    The loopback fallback is off with ``PROFILE_LOOPBACK = False`` (``dbsof-server``
+    sets that when bound beyond localhost), and requests forwarded by a proxy
+    never count as loopback, since behind one every peer is 127.0.0.1.
+    """
+    token = current_app.config.get("PROFILE_TOKEN")
+    if token:
+        return request.headers.get(TOKEN_HEADER) == str(token)
+    if not current_app.config.get("PROFILE_LOOPBACK", True):
+        return False
+    return request.remote_addr in LOOPBACK and not any(h in request.headers for h in FORWARDED_HEADERS)
+
+
+def _requested_mode() -> str | None:
+    mode = request.headers.get(PROFILE_HEADER) or request.args.get("profile")
+    if mode is None:
+        return None
+    mode = mode.strip().lower()
+    if mode in ("1", "true", ""):
+        mode = "sample"
+    return mode if mode in MODES and is_admin() else None
+
+
+def _sampled_route(route: str) -> bool:
+    every = int(current_app.config.get("PROFILE_EVERY") or 0)
+    if every <= 0:
+        return False
+    counter = _route_counters.get(route)
+    if counter is None:
+        counter = _route_counters.setdefault(route, itertools.count())
+    return next(counter) % every == 0
+
+
+def _route() -> str:
+    rule = request.url_rule
+    return rule.rule if rule is not None else "unmatched"
+
+
+def list_profiles(route: str | None = None) -> List[Dict[str, Any]]:
+    with PROFILE_LOCK:
+        entries = list(reversed(PROFILES.values()))
+    return [
+        {key: value for key, value in entry.items() if key != "stacks"}
+        for entry in entries
+        if route is None or entry["route"] == route
+    ]
+
+
+def get_profile(profile_id: str) -> Dict[str, Any] | None:
+    with PROFILE_LOCK:
+        return PROFILES.get(profile_id)
+
+
+def clear_profiles() -> None:
+    with PROFILE_LOCK:
+        PROFILES.clear()
+
+
+def collapsed(entry: Dict[str, Any]) -> str:
+    """Render a profile as collapsed stacks (``frame;frame;frame weight``), ready for flamegraph tools."""
+    lines = [f"{stack} {weight}" for stack, weight in sorted(entry["stacks"].items()) if weight > 0]
+    return "\n".join(lines) + "\n" if lines else ""
+
+
+def init_app(app: Flask) -> None:
+    """Profile requests that ask for it (admins only) and, with ``PROFILE_EVERY`` set, 1 in N per route."""
+
+    @app.before_request
+    def _start_profile():
+        mode = _requested_mode()
+        if mode is None and _sampled_route(_route()):
+            mode = "sample"
+        if mode is not None:
+            g.profile = _start(mode)
+
+    @app.after_request
+    def _store_profile(response):
+        profile = g.pop("profile", None)
+        if profile is None:
+            return response
+        _stop(profile)
+        duration = (time.perf_counter() - profile["start"]) * 1000
+        stacks = dict(profile["stacks"])
+        entry = {
+            "id": uuid.uuid4().hex[:12],
+            "mode": profile["mode"],
+            "method": request.method,
+            "path": request.full_path.rstrip("?"),
+            "route": _route(),
+            "status": response.status_code,
+            "durationMs": round(duration, 3),
+            # samples for "sample", microseconds for "trace"
+            "weight": sum(stacks.values()),
+            "createdAt": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "stacks": stacks,
+        }
+        with PROFILE_LOCK:
+            PROFILES[entry["id"]] = entry
+            while len(PROFILES) > PROFILE_STORE_SIZE:
+                PROFILES.popitem(last=False)
+        response.headers[PROFILE_HEADER] = entry["id"]
+        return response
+
+    @app.teardown_request
+    def _abandon_profile(exc):
+        # after_request did not run (e.g. it raised); never leave a profiler attached
+        profile = g.pop("profile", None)
+        if profile is not None:
+            _stop(profile)
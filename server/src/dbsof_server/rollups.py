@@ -0,0 +1,279 @@
+from __future__ import annotations
+
+import sqlite3
+from typing import Any, Dict
+
+from .sqlscript import run_script
+
+ROLLUP_TABLE = "MeterReadRollup"
+# bumped whenever a trigger body changes, so ensure_rollups replaces triggers left by older versions
+ROLLUP_TRIGGER_VERSION = 3
+ROLLUP_TRIGGERS = tuple(
+    f"MeterRead_rollup_{kind}_v{ROLLUP_TRIGGER_VERSION}" for kind in ("insert", "delete", "update_old", "update_new")
+)
+
+# bucket label format and nominal width in seconds, finest first
+RESOLUTIONS: Dict[str, tuple[str, int]] = {
+    "hour": ("%Y-%m-%dT%H:00:00Z", 3600),
+    "day": ("%Y-%m-%d", 86400),
+    "month": ("%Y-%m", 86400 * 30),
+}
+
+DEFAULT_POINTS = 500
+MAX_POINTS = 5000
+
+
+def _bucket(resolution: str, column: str) -> str:
+    return f"strftime('{RESOLUTIONS[resolution][0]}', {column})"
+
+
+def _upsert_sql(resolution: str) -> str:
+    return f"""
+  INSERT INTO {ROLLUP_TABLE} (meter_id, resolution, bucket, count, sum, min, max, last_ts, last_value)
+  VALUES (NEW.meter_id, '{resolution}', {_bucket(resolution, "NEW.read_timestamp")}, 1, NEW.value, NEW.value, NEW.value, NEW.read_timestamp, NEW.value)
+  ON CONFLICT(meter_id, resolution, bucket) DO UPDATE SET
+    count = count + 1,
+    sum = sum + excluded.sum,
+    min = min(min, excluded.min),
+    max = max(max, excluded.max),
+    last_value = CASE WHEN julianday(excluded.last_ts) >= julianday(last_ts) THEN excluded.last_value ELSE last_value END,
+    last_ts = CASE WHEN julianday(excluded.last_ts) >= julianday(last_ts) THEN excluded.last_ts ELSE last_ts END;"""
+
+
+def _aggregate_sql(resolution: str, where: str) -> str:
+    """INSERT ... SELECT that aggregates the raw reads matching ``where`` into buckets."""
+    bucket = _bucket(resolution, "read_timestamp")
+    return f"""
+  INSERT INTO {ROLLUP_TABLE} (meter_id, resolution, bucket, count, sum, min, max, last_ts, last_value)
+  SELECT meter_id, '{resolution}', b, COUNT(*), SUM(value), MIN(value), MAX(value), MAX(lt), MAX(lv)
+  FROM (
+    SELECT meter_id, b, value, LAST_VALUE(read_timestamp) OVER w AS lt, LAST_VALUE(value) OVER w AS lv
+    FROM (
+      SELECT meter_id, {bucket} AS b, read_timestamp, value FROM MeterRead
+      WHERE meter_id IS NOT NULL AND typeof(value) IN ('integer', 'real') AND {bucket} IS NOT NULL AND {where}
+    )
+    WINDOW w AS (
+      PARTITION BY meter_id, b ORDER BY julianday(read_timestamp)
+      ROWS BETWEEN UNBOUNDED PRECEDING AND UNBOUNDED FOLLOWING
+    )
+  )
+  GROUP BY meter_id, b;"""
+
+
+def _subtract_sql(resolution: str) -> str:
+    """Take the OLD read out of its bucket without rescanning the bucket's reads.
+
+    Count and sum are exact; min, max and last can only be recomputed from
+    the raw reads, so the bucket is flagged stale when the read could have
+    been one of them and ``refresh_rollups`` recomputes it once later.
+    """
+    where = f"meter_id = OLD.meter_id AND resolution = '{resolution}' AND bucket = {_bucket(resolution, 'OLD.read_timestamp')}"
+    return f"""
+  UPDATE {ROLLUP_TABLE} SET
+    count = count - 1,
+    sum = sum - OLD.value,
+    stale = stale OR OLD.value <= min OR OLD.value >= max OR julianday(OLD.read_timestamp) >= julianday(last_ts)
+  WHERE {where};
+  DELETE FROM {ROLLUP_TABLE} WHERE {where} AND count <= 0;"""
+
+
+def _valid(row: str) -> str:
+    # REAL affinity keeps text that does not parse as a number; it has no place in sums
+    return f"{row}.meter_id IS NOT NULL AND typeof({row}.value) IN ('integer', 'real') AND julianday({row}.read_timestamp) IS NOT NULL"
+
+
+def _rollup_script() -> str:
+    insert_body = "".join(_upsert_sql(r) for r in RESOLUTIONS)
+    delete_body = "".join(_subtract_sql(r) for r in RESOLUTIONS)
+    insert, delete, update_old, update_new = ROLLUP_TRIGGERS
+    return f"""
+CREATE TABLE IF NOT EXISTS {ROLLUP_TABLE} (
+  meter_id TEXT NOT NULL,
+  resolution TEXT NOT NULL,
+  bucket TEXT NOT NULL,
+  count INTEGER NOT NULL,
+  sum REAL NOT NULL,
+  min REAL,
+  max REAL,
+  last_ts TEXT,
+  last_value REAL,
+  stale INTEGER NOT NULL DEFAULT 0,
+  PRIMARY KEY (meter_id, resolution, bucket)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS {ROLLUP_TABLE}_stale ON {ROLLUP_TABLE} (meter_id) WHERE stale;
+CREATE INDEX IF NOT EXISTS MeterRead_meter_ts ON MeterRead (meter_id, read_timestamp);
+CREATE TRIGGER IF NOT EXISTS {insert} AFTER INSERT ON MeterRead
+WHEN {_valid("NEW")}
+BEGIN{insert_body}
+END;
+CREATE TRIGGER IF NOT EXISTS {delete} AFTER DELETE ON MeterRead
+WHEN {_valid("OLD")}
+BEGIN{delete_body}
+END;
+CREATE TRIGGER IF NOT EXISTS {update_old} AFTER UPDATE OF meter_id, read_timestamp, value ON MeterRead
+WHEN {_valid("OLD")}
+BEGIN{delete_body}
+END;
+CREATE TRIGGER IF NOT EXISTS {update_new} AFTER UPDATE OF meter_id, read_timestamp, value ON MeterRead
+WHEN {_valid("NEW")}
+BEGIN{insert_body}
+END;
+"""
+
+
+# part of the ontology template version, so trigger changes rebuild the template
+ROLLUP_SCRIPT = _rollup_script()
+
+
+def _rollup_objects(conn: sqlite3.Connection) -> set[str]:
+    """``MeterRead``, the rollup table and every rollup trigger present, current or not."""
+    return {
+        r[0]
+        for r in conn.execute(
+            "SELECT name FROM sqlite_master WHERE name IN ('MeterRead', ?) "
+            "OR (type = 'trigger' AND name GLOB 'MeterRead_rollup_*')",
+            (ROLLUP_TABLE,),
+        ).fetchall()
+    }
+
+
+def rollups_installed(conn: sqlite3.Connection) -> bool:
+    """Whether ``ensure_rollups`` would have nothing to do; safe on a read-only connection."""
+    names = _rollup_objects(conn)
+    return "MeterRead" not in names or names == {"MeterRead", ROLLUP_TABLE, *ROLLUP_TRIGGERS}
+
+
+def ensure_rollups(conn: sqlite3.Connection) -> bool:
+    """Install the rollup table and its maintenance triggers on ``MeterRead``.
+
+    Returns True when the rollup table was created (and backfilled) by this call.
+    Triggers from older versions are replaced. Does nothing if the database
+    has no ``MeterRead`` table. Never commits, so it can run as a writer
+    unit; the caller commits.
+    """
+    names = _rollup_objects(conn)
+    if "MeterRead" not in names:
+        return False
+    if names == {"MeterRead", ROLLUP_TABLE, *ROLLUP_TRIGGERS}:
+        return False
+    created = ROLLUP_TABLE not in names
+    for name in sorted(names - {"MeterRead", ROLLUP_TABLE, *ROLLUP_TRIGGERS}):
+        conn.execute(f'DROP TRIGGER "{name}"')
+    if not created and "stale" not in {row[1] for row in conn.execute(f"PRAGMA table_info({ROLLUP_TABLE})")}:
+        conn.execute(f"ALTER TABLE {ROLLUP_TABLE} ADD COLUMN stale INTEGER NOT NULL DEFAULT 0")
+    run_script(conn, ROLLUP_SCRIPT)
+    if created:
+        rebuild_rollups(conn)
+    else:
+        # older triggers aggregated non-numeric values; recompute the meters that have any
+        conn.execute(
+            f"UPDATE {ROLLUP_TABLE} SET stale = 1 WHERE meter_id IN "
+            "(SELECT DISTINCT meter_id FROM MeterRead WHERE typeof(value) NOT IN ('integer', 'real', 'null'))"
+        )
+    return created
+
+
+def rebuild_rollups(conn: sqlite3.Connection) -> Dict[str, int]:
+    """Recompute every rollup bucket from the raw reads. The caller commits."""
+    conn.execute(f"DELETE FROM {ROLLUP_TABLE}")
+    counts: Dict[str, int] = {}
+    for resolution in RESOLUTIONS:
+        before = conn.total_changes
+        conn.execute(_aggregate_sql(resolution, "1"))
+        counts[resolution] = conn.total_changes - before
+    return counts
+
+
+def rollups_stale(conn: sqlite3.Connection, meter_id: str) -> bool:
+    """Whether any of the meter's buckets waits for ``refresh_rollups``; safe on a read-only connection."""
+    return conn.execute(
+        f"SELECT 1 FROM {ROLLUP_TABLE} WHERE meter_id = ? AND stale LIMIT 1", (meter_id,)
+    ).fetchone() is not None
+
+
+def refresh_rollups(conn: sqlite3.Connection, meter_id: str | None = None) -> int:
+    """Recompute the stale buckets (of one meter, or all), one scan per meter and resolution.
+
+    Returns the number of buckets recomputed. The caller commits.
+    """
+    sql = f"SELECT meter_id, resolution, json_group_array(bucket) FROM {ROLLUP_TABLE} WHERE stale"
+    params: tuple = ()
+    if meter_id is not None:
+        sql += " AND meter_id = ?"
+        params = (meter_id,)
+    groups = conn.execute(sql + " GROUP BY meter_id, resolution", params).fetchall()
+    refreshed = 0
+    for meter, resolution, buckets in groups:
+        refreshed += conn.execute(
+            f"DELETE FROM {ROLLUP_TABLE} WHERE meter_id = ? AND resolution = ? AND bucket IN (SELECT value FROM json_each(?))",
+            (meter, resolution, buckets),
+        ).rowcount
+        where = f"meter_id = ? AND {_bucket(resolution, 'read_timestamp')} IN (SELECT value FROM json_each(?))"
+        conn.execute(_aggregate_sql(resolution, where), (meter, buckets))
+    return refreshed
+
+
+def _point(t: str, count: int, total: float, lo: float, hi: float, last: float) -> Dict[str, Any]:
+    return {"t": t, "count": count, "sum": total, "min": lo, "max": hi, "last": last, "avg": total / count}
+
+
+def query_series(
+    conn: sqlite3.Connection,
+    meter_id: str,
+    start: str | None = None,
+    end: str | None = None,
+    points: int = DEFAULT_POINTS,
+) -> Dict[str, Any]:
+    """Return a meter's series at the finest resolution that fits ``points``.
+
+    Raw reads are returned when the range holds no more than ``points`` of
+    them; otherwise the finest rollup whose bucket count fits is used,
+    falling back to monthly buckets. Only reads, so ``conn`` may be a
+    read-only connection; run ``ensure_rollups`` and, for buckets left stale
+    by deletes, ``refresh_rollups`` through the writer first.
+    """
+    points = max(1, min(points, MAX_POINTS))
+    bounds = conn.execute(
+        f"SELECT MIN(bucket), MAX(last_ts) FROM {ROLLUP_TABLE} WHERE meter_id = ? AND resolution = 'day'",
+        (meter_id,),
+    ).fetchone()
+    if bounds[0] is None:
+        return {"meterId": meter_id, "resolution": "raw", "from": start, "to": end, "points": []}
+    start = start or bounds[0]
+    end = end or bounds[1]
+    span_seconds, raw_estimate = conn.execute(
+        f"""
+        SELECT (julianday(?) - julianday(?)) * 86400,
+               (SELECT SUM(count) FROM {ROLLUP_TABLE}
+                WHERE meter_id = ? AND resolution = 'day' AND bucket BETWEEN {_bucket("day", "?")} AND {_bucket("day", "?")})
+        """,
+        (end, start, meter_id, start, end),
+    ).fetchone()
+    if span_seconds is None:
+        raise ValueError("from and to must be ISO-8601 timestamps")
+
+    if (raw_estimate or 0) <= points:
+        rows = conn.execute(
+            "SELECT read_timestamp, value FROM MeterRead "
+            "WHERE meter_id = ? AND typeof(value) IN ('integer', 'real') AND julianday(read_timestamp) BETWEEN julianday(?) AND julianday(?) "
+            "ORDER BY read_timestamp",
+            (meter_id, start, end),
+        ).fetchall()
+        series = [_point(ts, 1, value, value, value, value) for ts, value in rows]
+        return {"meterId": meter_id, "resolution": "raw", "from": start, "to": end, "points": series}
+
+    resolution = next(
+        (name for name, (_, width) in RESOLUTIONS.items() if span_seconds / width <= points),
+        "month",
+    )
+    rows = conn.execute(
+        f"""
+        SELECT bucket, count, sum, min, max, last_value FROM {ROLLUP_TABLE}
+        WHERE meter_id = ? AND resolution = ?
+          AND bucket BETWEEN {_bucket(resolution, "?")} AND {_bucket(resolution, "?")}
+        ORDER BY bucket
+        """,
+        (meter_id, resolution, start, end),
+    ).fetchall()
+    series = [_point(*row) for row in rows]
+    return {"meterId": meter_id, "resolution": resolution, "from": start, "to": end, "points": series}
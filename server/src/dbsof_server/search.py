@@ -0,0 +1,180 @@
+from __future__ import annotations
+
+import json
+import re
+import sqlite3
+from typing import Any, Dict, List, Sequence
+
+from .sqlscript import run_script
+
+# text columns indexed per table; each gets an external-content FTS5 table
+SEARCH_COLUMNS: Dict[str, tuple[str, ...]] = {
+    "Complaint": ("raw_text",),
+    "Contract": ("terms_text",),
+    "RegulatoryRule": ("rule_text",),
+    "BillingException": ("llm_classification",),
+}
+FTS_SUFFIX = "_fts"
+
+DEFAULT_LIMIT = 20
+MAX_LIMIT = 200
+SNIPPET_TOKENS = 12
+
+TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def fts_table(table: str) -> str:
+    return f"{table}{FTS_SUFFIX}"
+
+
+def _index_script(table: str, columns: Sequence[str]) -> str:
+    fts = fts_table(table)
+    cols = ", ".join(columns)
+    new = ", ".join(f"NEW.{c}" for c in columns)
+    old = ", ".join(f"OLD.{c}" for c in columns)
+    return f"""
+CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5({cols}, content='{table}', content_rowid='rowid');
+CREATE TRIGGER IF NOT EXISTS {fts}_insert AFTER INSERT ON {table} BEGIN
+  INSERT INTO {fts} (rowid, {cols}) VALUES (NEW.rowid, {new});
+END;
+CREATE TRIGGER IF NOT EXISTS {fts}_delete AFTER DELETE ON {table} BEGIN
+  INSERT INTO {fts} ({fts}, rowid, {cols}) VALUES ('delete', OLD.rowid, {old});
+END;
+CREATE TRIGGER IF NOT EXISTS {fts}_update AFTER UPDATE OF {cols} ON {table} BEGIN
+  INSERT INTO {fts} ({fts}, rowid, {cols}) VALUES ('delete', OLD.rowid, {old});
+  INSERT INTO {fts} (rowid, {cols}) VALUES (NEW.rowid, {new});
+END;"""
+
+
+# part of the ontology template version, so index changes rebuild the template
+SEARCH_SCRIPT = "".join(_index_script(t, cols) for t, cols in SEARCH_COLUMNS.items())
+
+
+def fts5_available(conn: sqlite3.Connection) -> bool:
+    return any(row[0] == "ENABLE_FTS5" for row in conn.execute("PRAGMA compile_options").fetchall())
+
+
+def _missing_indexes(conn: sqlite3.Connection) -> List[str]:
+    """Configured tables present in ``conn`` whose index or sync triggers are missing."""
+    names = {r[0] for r in conn.execute("SELECT name FROM sqlite_master").fetchall()}
+    missing = []
+    for table in SEARCH_COLUMNS:
+        fts = fts_table(table)
+        if table in names and not names.issuperset((fts, f"{fts}_insert", f"{fts}_delete", f"{fts}_update")):
+            missing.append(table)
+    return missing
+
+
+def search_installed(conn: sqlite3.Connection) -> bool:
+    """Whether ``ensure_search`` would have nothing to do; safe on a read-only connection."""
+    return not fts5_available(conn) or not _missing_indexes(conn)
+
+
+def ensure_search(conn: sqlite3.Connection) -> List[str]:
+    """Install the FTS5 indexes and sync triggers for every configured table present.
+
+    Returns the tables whose index was created (and populated) by this call.
+    Does nothing when SQLite was built without FTS5. Never commits, so it
+    can run as a writer unit; the caller commits.
+    """
+    if not fts5_available(conn):
+        return []
+    names = {r[0] for r in conn.execute("SELECT name FROM sqlite_master WHERE type='table'").fetchall()}
+    created: List[str] = []
+    for table in _missing_indexes(conn):
+        fts = fts_table(table)
+        run_script(conn, _index_script(table, SEARCH_COLUMNS[table]))
+        if fts not in names:
+            conn.execute(f"INSERT INTO {fts} ({fts}) VALUES ('rebuild')")
+            created.append(table)
+    return created
+
+
+def rebuild_search(conn: sqlite3.Connection) -> List[str]:
+    """Repopulate every FTS index from its content table. The caller commits."""
+    ensure_search(conn)
+    names = {r[0] for r in conn.execute("SELECT name FROM sqlite_master WHERE type='table'").fetchall()}
+    rebuilt = []
+    for table in SEARCH_COLUMNS:
+        fts = fts_table(table)
+        if fts in names:
+            conn.execute(f"INSERT INTO {fts} ({fts}) VALUES ('rebuild')")
+            rebuilt.append(table)
+    return rebuilt
+
+
+def match_expression(query: str) -> str:
+    """Turn free text into an FTS5 query: every word must match, the last one as a prefix."""
+    tokens = TOKEN_RE.findall(query)
+    if not tokens:
+        raise ValueError("q must contain at least one word")
+    terms = [f'"{t}"' for t in tokens]
+    terms[-1] += "*"
+    return " ".join(terms)
+
+
+def search(
+    conn: sqlite3.Connection,
+    query: str,
+    tables: Sequence[str] | None = None,
+    limit: int = DEFAULT_LIMIT,
+    offset: int = 0,
+    raw: bool = False,
+) -> Dict[str, Any]:
+    """Rank hits across the indexed tables by bm25 and return one page with snippets.
+
+    ``raw`` passes ``query`` to FTS5 unchanged so callers can use its full
+    syntax (phrases, NEAR, column filters, boolean operators). Only reads,
+    so ``conn`` may be a read-only connection; run ``ensure_search`` through
+    the writer first.
+    """
+    expression = query if raw else match_expression(query)
+    unknown = [t for t in (tables or []) if t not in SEARCH_COLUMNS]
+    if unknown:
+        raise ValueError(f"not a searchable table: {unknown[0]}")
+    names = {r[0] for r in conn.execute("SELECT name FROM sqlite_master WHERE type='table'").fetchall()}
+    selected = [t for t in (tables or SEARCH_COLUMNS) if fts_table(t) in names]
+    limit = max(1, min(limit, MAX_LIMIT))
+    offset = max(0, offset)
+    if not selected:
+        return {"query": query, "total": 0, "counts": {}, "limit": limit, "offset": offset, "hits": []}
+
+    counts: Dict[str, int] = {}
+    parts: List[str] = []
+    params: List[Any] = []
+    for table in selected:
+        fts = fts_table(table)
+        counts[table] = conn.execute(f"SELECT COUNT(*) FROM {fts} WHERE {fts} MATCH ?", (expression,)).fetchone()[0]
+        if not counts[table]:
+            continue
+        columns = SEARCH_COLUMNS[table]
+        snippets = ", ".join(
+            f"snippet({fts}, {i}, '<mark>', '</mark>', '…', {SNIPPET_TOKENS})" for i in range(len(columns))
+        )
+        parts.append(
+            f"SELECT ? AS tbl, c.id AS id, bm25({fts}) AS rank, json_array({snippets}) AS snippets "
+            f"FROM {fts} JOIN {table} c ON c.rowid = {fts}.rowid WHERE {fts} MATCH ?"
+        )
+        params.extend((table, expression))
+
+    hits: List[Dict[str, Any]] = []
+    if parts:
+        rows = conn.execute(
+            " UNION ALL ".join(parts) + " ORDER BY rank LIMIT ? OFFSET ?", (*params, limit, offset)
+        ).fetchall()
+        for tbl, row_id, rank, snippets in rows:
+            columns = SEARCH_COLUMNS[tbl]
+            highlighted = dict(zip(columns, json.loads(snippets)))
+            # report the first column that actually carries a highlighted match
+            column = next((c for c in columns if "<mark>" in (highlighted.get(c) or "")), columns[0])
+            hits.append(
+                {"table": tbl, "id": row_id, "column": column, "snippet": highlighted.get(column), "score": -rank}
+            )
+    return {
+        "query": query,
+        "total": sum(counts.values()),
+        "counts": counts,
+        "limit": limit,
+        "offset": offset,
+        "hits": hits,
+    }
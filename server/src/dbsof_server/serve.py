@@ -0,0 +1,238 @@
+from __future__ import annotations
+
+import argparse
+import os
+import signal
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import List
+
+from werkzeug.serving import BaseWSGIServer, WSGIRequestHandler
+
+from .core import refresh_catalog
+
+DEFAULT_HOST = "0.0.0.0"
+DEFAULT_PORT = 5757
+DEFAULT_THREADS = 8
+DEFAULT_KEEP_ALIVE = 5
+DEFAULT_GRACEFUL_TIMEOUT = 30
+LISTEN_BACKLOG = 2048
+SERVERS = ("auto", "gunicorn", "waitress", "werkzeug", "uvicorn")
+LOOPBACK_HOSTS = ("127.0.0.1", "::1", "localhost")
+
+
+def _available(module: str) -> bool:
+    try:
+        __import__(module)
+    except ImportError:
+        return False
+    return True
+
+
+def parse_args(argv: List[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(prog="dbsof-server", description="Serve the dbsof API.")
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument(
+        "--server",
+        choices=SERVERS,
+        default="auto",
+        help="auto picks gunicorn, then waitress, then the built-in werkzeug pool; "
+        "uvicorn serves the asyncio variant with long-poll and server-sent events.",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Pre-forked worker processes (gunicorn only). AI tasks, import jobs and query "
+        "history live in process memory, so pollers may see a different worker's view.",
+    )
+    parser.add_argument("--threads", type=int, default=DEFAULT_THREADS, help="Request threads per worker.")
+    parser.add_argument(
+        "--keep-alive", type=int, default=DEFAULT_KEEP_ALIVE, help="Seconds an idle keep-alive connection is held."
+    )
+    parser.add_argument(
+        "--graceful-timeout",
+        type=int,
+        default=DEFAULT_GRACEFUL_TIMEOUT,
+        help="Seconds in-flight requests get to finish after SIGTERM/SIGINT.",
+    )
+    parser.add_argument(
+        "--no-preload",
+        dest="preload",
+        action="store_false",
+        help="Build the app and its caches in each worker instead of once before forking.",
+    )
+    parser.add_argument("--access-log", action="store_true", help="Log every request.")
+    parser.add_argument("--debug", action="store_true", help="Run Flask's development server with the reloader.")
+    args = parser.parse_args(argv)
+    if args.workers < 1 or args.threads < 1:
+        parser.error("--workers and --threads must be at least 1")
+    if args.server == "auto":
+        if _available("gunicorn"):
+            args.server = "gunicorn"
+        elif _available("waitress"):
+            args.server = "waitress"
+        else:
+            args.server = "werkzeug"
+    elif args.server != "werkzeug" and not _available(args.server):
+        extra = "asgi" if args.server == "uvicorn" else "production"
+        parser.error(f"{args.server} is not installed; pip install 'dbsof-server[{extra}]'")
+    if args.workers > 1 and args.server != "gunicorn":
+        parser.error("--workers > 1 needs gunicorn; use --threads with the other servers")
+    return args
+
+
+def _load_app():
+    """Build the app and warm the shared caches (lineage, catalog, ontology template)."""
+    from .app import create_app
+
+    app = create_app()
+    refresh_catalog(force=True)
+    return app
+
+
+def _run_gunicorn(args: argparse.Namespace) -> None:
+    from gunicorn.app.base import BaseApplication
+
+    class _Application(BaseApplication):
+        def load_config(self):
+            options = {
+                "bind": f"{args.host}:{args.port}",
+                "workers": args.workers,
+                "worker_class": "gthread",
+                "threads": args.threads,
+                "keepalive": args.keep_alive,
+                "graceful_timeout": args.graceful_timeout,
+                "preload_app": args.preload,
+                "backlog": LISTEN_BACKLOG,
+                "accesslog": "-" if args.access_log else None,
+            }
+            for key, value in options.items():
+                self.cfg.set(key, value)
+
+        def load(self):
+            return _load_app()
+
+    _Application().run()
+
+
+def _run_waitress(args: argparse.Namespace) -> None:
+    from waitress import serve
+
+    # waitress shuts down cleanly on SystemExit but leaves SIGTERM at the default
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    serve(
+        _load_app(),
+        host=args.host,
+        port=args.port,
+        threads=args.threads,
+        channel_timeout=args.keep_alive,
+        backlog=LISTEN_BACKLOG,
+        ident="dbsof-server",
+        _quiet=not args.access_log,
+    )
+
+
+def _run_uvicorn(args: argparse.Namespace) -> None:
+    import uvicorn
+
+    from .asgi import create_asgi_app
+
+    uvicorn.run(
+        create_asgi_app(args.threads),
+        host=args.host,
+        port=args.port,
+        backlog=LISTEN_BACKLOG,
+        timeout_keep_alive=args.keep_alive,
+        timeout_graceful_shutdown=args.graceful_timeout,
+        access_log=args.access_log,
+    )
+
+
+class _RequestHandler(WSGIRequestHandler):
+    access_log = False
+
+    def log_request(self, code="-", size="-"):
+        if self.access_log:
+            super().log_request(code, size)
+
+
+class _PooledWSGIServer(BaseWSGIServer):
+    """Werkzeug's server with requests handed to a fixed-size thread pool.
+
+    Unlike ``threaded=True`` (a new thread per connection) the pool bounds
+    concurrency; werkzeug closes every connection, so there is no keep-alive.
+    """
+
+    multithread = True
+    request_queue_size = LISTEN_BACKLOG
+
+    def __init__(self, host: str, port: int, app, handler, threads: int):
+        super().__init__(host, port, app, handler=handler)
+        self.pool = ThreadPoolExecutor(max_workers=threads, thread_name_prefix="dbsof-worker")
+
+    def process_request(self, request, client_address):
+        self.pool.submit(self._process, request, client_address)
+
+    def _process(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+
+def _run_werkzeug(args: argparse.Namespace) -> None:
+    handler = type("RequestHandler", (_RequestHandler,), {"access_log": args.access_log})
+    server = _PooledWSGIServer(args.host, args.port, _load_app(), handler, args.threads)
+
+    def stop(signum, frame):
+        # shutdown() blocks until serve_forever returns, so it cannot run on this thread
+        threading.Thread(target=server.shutdown, daemon=True).start()
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    print(f"dbsof-server on http://{args.host}:{server.port} ({args.threads} threads)", file=sys.stderr)
+    server.serve_forever()
+    # no new connections are accepted now; give in-flight requests the grace period
+    drained = threading.Thread(target=server.pool.shutdown, daemon=True)
+    drained.start()
+    drained.join(args.graceful_timeout)
+
+
+def _guard_profiling(host: str) -> None:
+    """Without DBSOF_PROFILE_TOKEN profiling falls back to loopback clients; only allow that on a localhost bind."""
+    if os.environ.get("DBSOF_PROFILE_TOKEN"):
+        return
+    if host in LOOPBACK_HOSTS:
+        print(
+            "dbsof-server: DBSOF_PROFILE_TOKEN is not set; any local client, including a reverse proxy "
+            "that does not send X-Forwarded-For, can profile requests and read /profiles",
+            file=sys.stderr,
+        )
+        return
+    # read by create_app in every worker through DBSOF_* config
+    os.environ.setdefault("DBSOF_PROFILE_LOOPBACK", "false")
+    print(f"dbsof-server: DBSOF_PROFILE_TOKEN is not set; profiling is disabled on {host}", file=sys.stderr)
+
+
+def main(argv: List[str] | None = None) -> None:
+    args = parse_args(argv)
+    _guard_profiling(args.host)
+    if args.debug:
+        _load_app().run(host=args.host, port=args.port, debug=True)
+    elif args.server == "gunicorn":
+        _run_gunicorn(args)
+    elif args.server == "waitress":
+        _run_waitress(args)
+    elif args.server == "uvicorn":
+        _run_uvicorn(args)
+    else:
+        _run_werkzeug(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,25 @@
+from __future__ import annotations
+
+import sqlite3
+from typing import Iterator
+
+
+def statements(script: str) -> Iterator[str]:
+    """Split ``script`` into complete statements, keeping trigger bodies and string literals whole."""
+    pending = ""
+    for part in script.split(";"):
+        pending += part + ";"
+        if sqlite3.complete_statement(pending):
+            if pending.strip(" \t\r\n;"):
+                yield pending
+            pending = ""
+
+
+def run_script(conn: sqlite3.Connection, script: str) -> None:
+    """Execute ``script`` one statement at a time.
+
+    Unlike ``executescript`` this never commits, so DDL can run inside a
+    writer unit's savepoint and roll back with the rest of the unit.
+    """
+    for statement in statements(script):
+        conn.execute(statement)
@@ -0,0 +1,298 @@
+from __future__ import annotations
+
+import math
+import sqlite3
+import threading
+import time
+from collections import Counter
+from typing import Any, Dict, List, Sequence, Tuple
+
+try:
+    import numpy as np
+except ImportError:  # numpy is optional; the pure-Python path is used instead
+    np = None
+
+from .core import data_version, table_schema
+
+FETCH_SIZE = 5000
+DEFAULT_SAMPLE_ROWS = 100_000
+DEFAULT_TOP_K = 10
+MAX_TOP_K = 100
+DEFAULT_BINS = 20
+MAX_BINS = 100
+HISTOGRAM_VALUES = 200_000
+CACHE_LIMIT = 64
+
+# HyperLogLog: 2^12 registers, ~1.6% standard error
+HLL_BITS = 12
+HLL_REGISTERS = 1 << HLL_BITS
+HLL_TAIL = 64 - HLL_BITS
+# count-min sketch: 4 rows of 2^12 counters, multiply-shift hashed
+CMS_BITS = 12
+CMS_WIDTH = 1 << CMS_BITS
+CMS_SEEDS = (0x9E3779B97F4A7C15, 0xC2B2AE3D27D4EB4F, 0x165667B19E3779F9, 0xD6E8FEB86659FD93)
+CANDIDATE_FACTOR = 8
+
+M64 = (1 << 64) - 1
+MIX1 = 0xFF51AFD7ED558CCD
+MIX2 = 0xC4CEB9FE1A85EC53
+
+_STATS_CACHE: Dict[Tuple[Any, ...], Tuple[Tuple[int, ...], Dict[str, Any]]] = {}
+_STATS_CACHE_LOCK = threading.Lock()
+
+
+def _mix(h: int) -> int:
+    """murmur3 finalizer; spreads Python's ``hash()`` (identity for small ints) over 64 bits."""
+    h &= M64
+    h ^= h >> 33
+    h = (h * MIX1) & M64
+    h ^= h >> 33
+    h = (h * MIX2) & M64
+    return h ^ (h >> 33)
+
+
+def _mix_array(hashes: List[int]):
+    h = np.array(hashes, dtype=np.int64).view(np.uint64)
+    with np.errstate(over="ignore"):
+        h ^= h >> np.uint64(33)
+        h *= np.uint64(MIX1)
+        h ^= h >> np.uint64(33)
+        h *= np.uint64(MIX2)
+        h ^= h >> np.uint64(33)
+    return h
+
+
+def _new_column(name: str, declared: str | None) -> Dict[str, Any]:
+    return {
+        "name": name,
+        "type": declared,
+        "nulls": 0,
+        "count": 0,
+        "numbers": 0,
+        "sum": 0.0,
+        "sumSquares": 0.0,
+        "min": {},
+        "max": {},
+        "registers": np.zeros(HLL_REGISTERS, dtype=np.uint8) if np is not None else [0] * HLL_REGISTERS,
+        "sketch": (
+            np.zeros((len(CMS_SEEDS), CMS_WIDTH), dtype=np.int64)
+            if np is not None
+            else [[0] * CMS_WIDTH for _ in CMS_SEEDS]
+        ),
+        "candidates": set(),
+        "histogram": [],
+        "stride": 1,
+    }
+
+
+def _sketch_estimate(state: Dict[str, Any], value: Any) -> int:
+    h = _mix(hash(value))
+    return int(min(row[((h * seed) & M64) >> (64 - CMS_BITS)] for row, seed in zip(state["sketch"], CMS_SEEDS)))
+
+
+def _update_sketches(state: Dict[str, Any], present: List[Any]) -> None:
+    """Fold one chunk of non-null values into the HyperLogLog registers and count-min sketch."""
+    hashes = [hash(v) for v in present]
+    if np is not None:
+        h = _mix_array(hashes)
+        index = (h >> np.uint64(HLL_TAIL)).astype(np.intp)
+        tail = (h & np.uint64((1 << HLL_TAIL) - 1)).astype(np.float64)
+        bits = np.frexp(tail)[1]  # exact bit length: the tail fits a float64 mantissa
+        np.maximum.at(state["registers"], index, (HLL_TAIL + 1 - bits).astype(np.uint8))
+        with np.errstate(over="ignore"):
+            for row, seed in zip(state["sketch"], CMS_SEEDS):
+                np.add.at(row, ((h * np.uint64(seed)) >> np.uint64(64 - CMS_BITS)).astype(np.intp), 1)
+        return
+    registers = state["registers"]
+    sketch = state["sketch"]
+    for raw in hashes:
+        h = _mix(raw)
+        index = h >> HLL_TAIL
+        rank = HLL_TAIL + 1 - (h & ((1 << HLL_TAIL) - 1)).bit_length()
+        if rank > registers[index]:
+            registers[index] = rank
+        for row, seed in zip(sketch, CMS_SEEDS):
+            row[((h * seed) & M64) >> (64 - CMS_BITS)] += 1
+
+
+def _hll_estimate(registers: Sequence[int]) -> int:
+    m = HLL_REGISTERS
+    alpha = 0.7213 / (1 + 1.079 / m)
+    if np is not None:
+        total = float(np.sum(np.ldexp(1.0, -registers.astype(np.int32))))
+        zeros = int(np.count_nonzero(registers == 0))
+    else:
+        total = sum(2.0 ** -r for r in registers)
+        zeros = registers.count(0)
+    estimate = alpha * m * m / total
+    if estimate <= 2.5 * m and zeros:
+        estimate = m * math.log(m / zeros)
+    return int(round(estimate))
+
+
+def _observe(state: Dict[str, Any], values: Sequence[Any], top_k: int) -> None:
+    present = [v for v in values if v is not None]
+    state["nulls"] += len(values) - len(present)
+    if not present:
+        return
+    state["count"] += len(present)
+    by_type: Dict[str, List[Any]] = {}
+    for v in present:
+        by_type.setdefault("number" if isinstance(v, (int, float)) else type(v).__name__, []).append(v)
+    for kind, items in by_type.items():
+        if kind == "bytes":
+            continue
+        low, high = min(items), max(items)
+        if kind not in state["min"] or low < state["min"][kind]:
+            state["min"][kind] = low
+        if kind not in state["max"] or high > state["max"][kind]:
+            state["max"][kind] = high
+    numbers = by_type.get("number", [])
+    if numbers:
+        state["numbers"] += len(numbers)
+        state["sum"] += math.fsum(numbers)
+        state["sumSquares"] += math.fsum(float(v) * v for v in numbers)
+        # keep a bounded, evenly thinned sample of numbers for the histogram
+        state["histogram"].extend(numbers[:: state["stride"]])
+        if len(state["histogram"]) > HISTOGRAM_VALUES:
+            state["histogram"] = state["histogram"][::2]
+            state["stride"] *= 2
+    _update_sketches(state, present)
+    hashable = [v for v in present if not isinstance(v, bytes)]
+    state["candidates"].update(v for v, _ in Counter(hashable).most_common(top_k))
+    if len(state["candidates"]) > top_k * CANDIDATE_FACTOR:
+        ranked = sorted(state["candidates"], key=lambda v: _sketch_estimate(state, v), reverse=True)
+        state["candidates"] = set(ranked[: top_k * 2])
+
+
+def _histogram(values: List[Any], total: int, bins: int) -> Dict[str, Any] | None:
+    if not values:
+        return None
+    low, high = min(values), max(values)
+    scale = total / len(values)
+    if low == high:
+        return {"edges": [low, high], "counts": [total]}
+    if np is not None:
+        counts, edges = np.histogram(np.asarray(values, dtype=np.float64), bins=bins, range=(low, high))
+        counts, edges = counts.tolist(), edges.tolist()
+    else:
+        width = (high - low) / bins
+        counts = [0] * bins
+        for v in values:
+            counts[min(int((v - low) / width), bins - 1)] += 1
+        edges = [low + width * i for i in range(bins)] + [high]
+    return {"edges": edges, "counts": [int(round(c * scale)) for c in counts]}
+
+
+def _summary(state: Dict[str, Any], rows: int, top_k: int, bins: int) -> Dict[str, Any]:
+    # SQLite's cross-type ordering: NULL < numbers < text < blob
+    order = ("number", "str")
+    low = next((state["min"][k] for k in order if k in state["min"]), None)
+    high = next((state["max"][k] for k in reversed(order) if k in state["max"]), None)
+    # estimates within the sketch's error bound (e * N / width) are indistinguishable from noise
+    noise = math.e * state["count"] / CMS_WIDTH
+    top = sorted(
+        ((v, c) for v in state["candidates"] if (c := _sketch_estimate(state, v)) > noise),
+        key=lambda item: item[1],
+        reverse=True,
+    )[:top_k]
+    numbers = state["numbers"]
+    mean = state["sum"] / numbers if numbers else None
+    stddev = math.sqrt(max(state["sumSquares"] / numbers - mean * mean, 0.0)) if numbers else None
+    return {
+        "name": state["name"],
+        "type": state["type"],
+        "count": state["count"],
+        "nulls": state["nulls"],
+        "nullFraction": state["nulls"] / rows if rows else 0.0,
+        "distinct": min(_hll_estimate(state["registers"]), state["count"]) if state["count"] else 0,
+        "min": low,
+        "max": high,
+        "mean": mean,
+        "stddev": stddev,
+        "topK": [{"value": v, "count": c} for v, c in top],
+        "histogram": _histogram(state["histogram"], numbers, bins),
+    }
+
+
+def _estimate_rows(conn: sqlite3.Connection, table: str) -> int:
+    try:
+        low, high = conn.execute(f'SELECT MIN(rowid), MAX(rowid) FROM "{table}"').fetchone()
+        return (high - low + 1) if high is not None else 0
+    except sqlite3.OperationalError:  # WITHOUT ROWID
+        return conn.execute(f'SELECT COUNT(*) FROM "{table}"').fetchone()[0]
+
+
+def table_stats(
+    conn: sqlite3.Connection,
+    table: str,
+    sample_rows: int = DEFAULT_SAMPLE_ROWS,
+    top_k: int = DEFAULT_TOP_K,
+    bins: int = DEFAULT_BINS,
+) -> Dict[str, Any]:
+    """Profile every column of ``table`` in a single streaming scan.
+
+    Null counts, min/max and moments are exact over the scanned rows;
+    distinct counts come from HyperLogLog and top-k counts from a count-min
+    sketch. When the table looks larger than ``sample_rows`` (0 disables
+    sampling) SQLite keeps a Bernoulli sample so only that many rows reach
+    Python; counts then describe the sample and ``sampleRate`` says how to
+    scale them.
+    """
+    columns = table_schema(conn, table)["columns"]
+    if not columns:
+        raise LookupError(f"table not found: {table}")
+    start = time.perf_counter()
+    estimated = _estimate_rows(conn, table)
+    rate = min(1.0, sample_rows / estimated) if sample_rows and estimated else 1.0
+    names = ", ".join(f'"{c["name"]}"' for c in columns)
+    sql = f'SELECT {names} FROM "{table}"'
+    params: List[Any] = []
+    if rate < 1.0:
+        sql += " WHERE abs(random() % 1000000) < ?"
+        params.append(int(rate * 1_000_000))
+    states = [_new_column(c["name"], c["type"]) for c in columns]
+    cur = conn.cursor()
+    cur.row_factory = None
+    cur.execute(sql, params)
+    rows = 0
+    while True:
+        chunk = cur.fetchmany(FETCH_SIZE)
+        if not chunk:
+            break
+        rows += len(chunk)
+        for state, values in zip(states, zip(*chunk)):
+            _observe(state, values, top_k)
+    return {
+        "table": table,
+        "rows": rows,
+        "estimatedRows": estimated if rate < 1.0 else rows,
+        "sampled": rate < 1.0,
+        "sampleRate": rate,
+        "columns": [_summary(state, rows, top_k, bins) for state in states],
+        "durationMs": round((time.perf_counter() - start) * 1000, 2),
+    }
+
+
+def cached_table_stats(
+    conn: sqlite3.Connection,
+    db_name: str,
+    table: str,
+    sample_rows: int = DEFAULT_SAMPLE_ROWS,
+    top_k: int = DEFAULT_TOP_K,
+    bins: int = DEFAULT_BINS,
+) -> Dict[str, Any]:
+    """``table_stats`` reused until the database's ``data_version`` stamp moves."""
+    key = (db_name, table, sample_rows, top_k, bins)
+    version = data_version(db_name)
+    with _STATS_CACHE_LOCK:
+        hit = _STATS_CACHE.get(key)
+    if hit is not None and hit[0] == version:
+        return {**hit[1], "cached": True}
+    result = table_stats(conn, table, sample_rows, top_k, bins)
+    with _STATS_CACHE_LOCK:
+        _STATS_CACHE.pop(key, None)
+        while len(_STATS_CACHE) >= CACHE_LIMIT:
+            _STATS_CACHE.pop(next(iter(_STATS_CACHE)))
+        _STATS_CACHE[key] = (version, result)
+    return {**result, "cached": False}
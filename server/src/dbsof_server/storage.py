@@ -0,0 +1,103 @@
+from __future__ import annotations
+
+import json
+import sqlite3
+from typing import Any, Dict
+
+MIB = 1024 * 1024
+
+# Named storage profiles. cache_size follows SQLite: negative values are KiB.
+STORAGE_PROFILES: Dict[str, Dict[str, Any]] = {
+    "balanced": {
+        "mmap_size": 256 * MIB,
+        "cache_size": -16384,
+        "page_size": 4096,
+        "synchronous": "NORMAL",
+        "temp_store": "MEMORY",
+    },
+    # every commit is fsynced, so a power cut loses nothing that was acknowledged
+    "durable": {
+        "mmap_size": 256 * MIB,
+        "cache_size": -16384,
+        "page_size": 4096,
+        "synchronous": "FULL",
+        "temp_store": "MEMORY",
+    },
+    # large scans: bigger pages, cache and map
+    "analytics": {
+        "mmap_size": 1024 * MIB,
+        "cache_size": -65536,
+        "page_size": 16384,
+        "synchronous": "NORMAL",
+        "temp_store": "MEMORY",
+    },
+    "compact": {
+        "mmap_size": 0,
+        "cache_size": -2000,
+        "page_size": 4096,
+        "synchronous": "NORMAL",
+        "temp_store": "DEFAULT",
+    },
+}
+DEFAULT_PROFILE = "balanced"
+META_KEY = "storage_profile"
+
+SYNCHRONOUS = ("OFF", "NORMAL", "FULL", "EXTRA")
+TEMP_STORE = ("DEFAULT", "FILE", "MEMORY")
+PAGE_SIZES = tuple(2**n for n in range(9, 17))
+# applied to every connection; page_size belongs to the file and is changed by maintenance
+CONNECTION_PRAGMAS = ("mmap_size", "cache_size", "synchronous", "temp_store")
+
+
+def _check_setting(name: str, value: Any) -> Any:
+    if name in ("synchronous", "temp_store"):
+        allowed = SYNCHRONOUS if name == "synchronous" else TEMP_STORE
+        if not isinstance(value, str) or value.upper() not in allowed:
+            raise ValueError(f"{name} must be one of {', '.join(allowed)}")
+        return value.upper()
+    if not isinstance(value, int) or isinstance(value, bool):
+        raise ValueError(f"{name} must be an integer")
+    if name == "page_size" and value not in PAGE_SIZES:
+        raise ValueError("page_size must be a power of two from 512 to 65536")
+    if name == "mmap_size" and value < 0:
+        raise ValueError("mmap_size must not be negative")
+    return value
+
+
+def parse_profile(payload: Any) -> Dict[str, Any]:
+    """Validate a ``{"profile": name, "overrides": {...}}`` request; raises ValueError."""
+    if not isinstance(payload, dict):
+        raise ValueError("expected a JSON object")
+    name = payload.get("profile") or DEFAULT_PROFILE
+    if name not in STORAGE_PROFILES:
+        raise ValueError(f"unknown profile: {name}; expected one of {', '.join(STORAGE_PROFILES)}")
+    overrides = payload.get("overrides") or {}
+    if not isinstance(overrides, dict):
+        raise ValueError("overrides must be an object")
+    unknown = set(overrides) - set(STORAGE_PROFILES[name])
+    if unknown:
+        raise ValueError(f"unknown setting: {sorted(unknown)[0]}")
+    return {"profile": name, "overrides": {key: _check_setting(key, value) for key, value in overrides.items()}}
+
+
+def resolve_profile(stored: str | None) -> Dict[str, Any]:
+    """Expand the JSON kept in ``__meta__`` into profile, overrides and effective settings."""
+    try:
+        spec = parse_profile(json.loads(stored)) if stored else parse_profile({})
+    except ValueError:  # also covers malformed JSON; fall back rather than refuse to open
+        spec = parse_profile({})
+    return {**spec, "settings": {**STORAGE_PROFILES[spec["profile"]], **spec["overrides"]}}
+
+
+def read_profile(conn: sqlite3.Connection) -> Dict[str, Any]:
+    try:
+        row = conn.execute("SELECT v FROM __meta__ WHERE k = ?", (META_KEY,)).fetchone()
+    except sqlite3.OperationalError:  # no __meta__ table
+        row = None
+    return resolve_profile(row[0] if row else None)
+
+
+def apply_pragmas(conn: sqlite3.Connection, settings: Dict[str, Any]) -> None:
+    """Apply the per-connection settings of a profile to ``conn``."""
+    for name in CONNECTION_PRAGMAS:
+        conn.execute(f"PRAGMA {name} = {settings[name]}").fetchall()